@@ -0,0 +1 @@
+from QTube.pipeline import RunResult, run
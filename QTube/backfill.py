@@ -0,0 +1,441 @@
+import datetime as dt
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+from QTube import pipeline
+from QTube.pipeline import RouteResult, RunResult
+from QTube.utils import checks, helpers
+from QTube.utils.metrics import Metrics
+from QTube.utils.priorities import get_configured_weights, order_channels
+from QTube.utils.records import VideoRecord, VideoRecords
+from QTube.utils.youtube import playlists, resource
+from QTube.utils.youtube.http_cache import HttpCache
+from QTube.utils.youtube.store import VideoStore
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS channels (
+    playlist_id TEXT PRIMARY KEY,
+    page_token TEXT,
+    done INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS accepted (
+    route TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    upload_datetime TEXT NOT NULL,
+    record TEXT NOT NULL,
+    processed INTEGER NOT NULL,
+    PRIMARY KEY (route, video_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS accepted_order ON accepted (route, processed, upload_datetime);
+"""
+
+
+class BackfillCheckpoint:
+    """Progress of a backfill, in a SQLite database, so that it can span several runs (e.g. several quota days).
+
+    The page token each upload playlist is paged back from is saved along with the videos
+    of the previous pages that every filter accepted, in a single transaction once the videos
+    have been filtered, so that an interrupted backfill resumes from the first page whose
+    videos were not filtered yet. The accepted videos are then marked as processed as soon
+    as they are inserted (or cannot be).
+
+    Args:
+        path (str): Path of the database file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+
+        with self._lock, self._connection:
+            self._connection.executescript(_SCHEMA)
+
+    @classmethod
+    def for_job(
+        cls, since: dt.datetime, playlist_IDs: list[str]
+    ) -> "BackfillCheckpoint":
+        """Opens the checkpoint of a backfill in the QTube cache directory, keyed by its cutoff and playlists.
+
+        Args:
+            since (datetime): Cutoff of the backfill.
+            playlist_IDs (list[str]): IDs of the playlists the videos are added to.
+
+        Returns:
+            (BackfillCheckpoint): Checkpoint of the backfill.
+        """
+        key = json.dumps([since.isoformat(), sorted(set(playlist_IDs))])
+        job_ID = hashlib.sha256(key.encode("utf-8")).hexdigest()[:12]
+        return cls(os.path.join(helpers.get_cache_dir(), f"backfill-{job_ID}.sqlite3"))
+
+    def get_channel(self, playlist_ID: str) -> tuple[str | None, bool]:
+        """Retrieves the progress of an upload playlist.
+
+        Args:
+            playlist_ID (str): ID of the upload playlist.
+
+        Returns:
+            page_token (str|None): Token of the next page to retrieve (first page if None).
+            done (bool): Whether the playlist has been paged back to the cutoff.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT page_token, done FROM channels WHERE playlist_id = ?",
+                (playlist_ID,),
+            ).fetchone()
+        return (None, False) if row is None else (row[0], bool(row[1]))
+
+    def save_pages(self, pages: dict, accepted: list[tuple[str, str, dict]]) -> None:
+        """Saves the progress of upload playlists along with the videos accepted from their pages.
+
+        Args:
+            pages (dict): Upload playlist IDs (keys) and their next page token and whether they are done (values).
+            accepted (list[tuple[str, str, VideoRecord]]): Name of the rule set, ID and record of each accepted video.
+
+        Returns:
+            None
+        """
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO channels VALUES (?, ?, ?)",
+                [
+                    (playlist_ID, page_token, int(done))
+                    for playlist_ID, (page_token, done) in pages.items()
+                ],
+            )
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO accepted VALUES (?, ?, ?, ?, 0)",
+                [
+                    (
+                        route,
+                        vid_ID,
+                        vid_info.upload_datetime.isoformat(),
+                        json.dumps(
+                            {
+                                "title": vid_info.title,
+                                "original title": vid_info.original_title,
+                                "channel name": vid_info.channel_name,
+                                "upload playlist": vid_info.upload_playlist,
+                            }
+                        ),
+                    )
+                    for route, vid_ID, vid_info in accepted
+                ],
+            )
+
+    def get_accepted(self, route: str) -> VideoRecords:
+        """Retrieves the accepted videos of a rule set that are not processed yet, in publish order.
+
+        Args:
+            route (str): Name of the rule set.
+
+        Returns:
+            (VideoRecords): Video IDs (keys) and records (values), the oldest first.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT video_id, upload_datetime, record FROM accepted WHERE route = ? AND processed = 0 ORDER BY upload_datetime",
+                (route,),
+            ).fetchall()
+
+        accepted = VideoRecords()
+        for vid_ID, upload_datetime, record in rows:
+            record = json.loads(record)
+            accepted[vid_ID] = VideoRecord(
+                upload_datetime=dt.datetime.fromisoformat(upload_datetime),
+                title=record["title"],
+                original_title=record["original title"],
+                channel_name=record["channel name"],
+                upload_playlist=record["upload playlist"],
+            )
+        return accepted
+
+    def mark_processed(self, route: str, video_IDs: list[str]) -> None:
+        """Marks accepted videos of a rule set as inserted (or rejected at insertion).
+
+        Args:
+            route (str): Name of the rule set.
+            video_IDs (list[str]): List of video IDs.
+
+        Returns:
+            None
+        """
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "UPDATE accepted SET processed = 1 WHERE route = ? AND video_id = ?",
+                [(route, vid_ID) for vid_ID in video_IDs],
+            )
+
+    def clear(self) -> None:
+        """Empties the checkpoint."""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM channels")
+            self._connection.execute("DELETE FROM accepted")
+
+    def close(self) -> None:
+        """Closes the database."""
+        with self._lock:
+            self._connection.close()
+
+
+def iter_playlist_pages(
+    youtube,
+    upload_playlists,
+    since: dt.datetime,
+    checkpoint: BackfillCheckpoint,
+    fancy: bool,
+    verb: list[str],
+    metrics: Metrics,
+):
+    """Pages the upload playlists of channels back to a cutoff, resuming from their checkpointed page.
+    Upload playlists are ordered from the newest video, so a playlist is done once a page reaches the cutoff.
+
+    Args:
+        youtube (Resource): YT API resource.
+        upload_playlists (iterable[tuple[str, str]]): Channel names and upload playlist IDs.
+        since (datetime): Cutoff, videos uploaded before it are not retrieved.
+        checkpoint (BackfillCheckpoint): Progress of the backfill.
+        fancy (bool): Determines wether the text is fancyfied (emoji+color).
+        verb (list[str]): User defined verbosity.
+        metrics (Metrics): Instrumentation of the run.
+
+    Yields:
+        (tuple[str, str|None, bool, VideoRecords]): Upload playlist ID, token of its next page, whether it is done, and the videos of the page uploaded after the cutoff.
+    """
+    for ch_name, playlist_ID in upload_playlists:
+        page_token, done = checkpoint.get_channel(playlist_ID)
+        while not done:
+            with metrics.stage("backfill pages"):
+                page = helpers.handle_http_errors(
+                    verb,
+                    fancy,
+                    playlists.get_videos_page,
+                    youtube,
+                    playlist_ID,
+                    page_token,
+                )
+                if page == "ignore":
+                    helpers.print2(
+                        f"Channel {ch_name} has no public videos.",
+                        fancy,
+                        "warning",
+                        ["all", "func"],
+                        verb,
+                    )
+                    yield playlist_ID, None, True, VideoRecords()
+                    break
+
+                videos, page_token = page
+                recent_videos = VideoRecords(
+                    (
+                        vid_ID,
+                        VideoRecord(
+                            upload_datetime=vid_info["upload datetime"],
+                            channel_name=ch_name,
+                            upload_playlist=playlist_ID,
+                        ),
+                    )
+                    for vid_ID, vid_info in videos.items()
+                    if vid_info["upload datetime"] >= since
+                )
+                done = page_token is None or len(recent_videos) < len(videos)
+
+            yield playlist_ID, page_token, done, recent_videos
+
+
+def run_backfill(
+    params: dict,
+    since: dt.datetime,
+    youtube=None,
+    credentials=None,
+    middlewares: list = None,
+    store: VideoStore = None,
+    http_cache: HttpCache = None,
+    checkpoint: BackfillCheckpoint = None,
+    metrics: Metrics = None,
+    now: dt.datetime = None,
+) -> RunResult:
+    """Adds the videos uploaded since a date that pass the filters of each rule set to its playlist, e.g. to fill a new playlist.
+
+    The upload playlist of each channel is paged back to the cutoff (see iter_playlist_pages),
+    and its videos are streamed into batches of 50 videos whose details, enrichment and
+    filtering are the ones of a regular run (the run frequency is replaced by the cutoff).
+    Once every channel has been paged, the accepted videos are inserted in publish order,
+    the oldest first. Progress is checkpointed (see BackfillCheckpoint), so a backfill stopped
+    by the quota limit resumes where it stopped when run again with the same cutoff.
+
+    Args:
+        params (dict): Dictionary of the user-defined parameters (same format as the user_params.json file).
+        since (datetime): Cutoff, the videos uploaded before it are not retrieved.
+        youtube (Resource): YT API resource, or any object with the same interface (built from the credentials if None).
+        credentials (Credentials): Credentials used to build the YT API resource (loaded from token.pickle if None).
+        middlewares (list): Middlewares every API request goes through (see QTube.utils.youtube.resource).
+        store (VideoStore): Persistent store of the video details, kept between runs (optional).
+        http_cache (HttpCache): Cache of the subscriptions and playlists responses, revalidated with their ETags (optional).
+        checkpoint (BackfillCheckpoint): Progress of the backfill (the one of the cutoff and playlists in the QTube cache directory if None).
+        metrics (Metrics): Instrumentation of the run (a new one is created if None).
+        now (datetime): End of the backfilled timeframe (defaults to now).
+
+    Returns:
+        result (RunResult): Added and rejected videos of each rule set, timings and quota used.
+
+    Raises (with the partial RunResult as their result attribute once the run started):
+        InvalidParamsError: If the parameters are not correctly formatted or a playlist cannot be used.
+        QuotaExceededError: If the YT API quota limit has been reached (run it again to resume).
+        APIError: If a YT API query still fails after every retry.
+    """
+    rule_sets = pipeline.get_rule_sets(params)
+    if not all(checks.check_user_params(rule_set) is True for rule_set in rule_sets):
+        raise helpers.InvalidParamsError(
+            "User defined parameters are not correctly formatted. Check the template and retry."
+        )
+
+    if now is None:
+        now = dt.datetime.now(dt.timezone.utc)
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=dt.timezone.utc)
+    if since >= now:
+        raise helpers.InvalidParamsError("The backfill cutoff must be in the past.")
+
+    # The upload date filters keep the whole backfilled timeframe
+    rule_sets = [
+        dict(rule_set, run_frequency=(now - since).days + 1) for rule_set in rule_sets
+    ]
+
+    fancy = params["fancy_mode"]
+    verb = params["verbosity"]
+
+    result = RunResult(
+        routes=[
+            RouteResult(
+                rule_set.get("name", rule_set["upload_playlist_ID"]),
+                rule_set["upload_playlist_ID"],
+            )
+            for rule_set in rule_sets
+        ],
+        metrics=metrics if metrics is not None else Metrics(),
+    )
+    metrics = result.metrics
+    quota_counter = resource.QuotaCounter()
+
+    owned_checkpoint = checkpoint is None
+    if owned_checkpoint:
+        checkpoint = BackfillCheckpoint.for_job(
+            since, [route.playlist_ID for route in result.routes]
+        )
+
+    with metrics.stage("auth"):
+        youtube = pipeline.build_youtube(
+            youtube,
+            credentials,
+            quota_counter,
+            metrics,
+            middlewares,
+            None,
+            store,
+            http_cache,
+            fancy,
+            verb,
+        )
+
+    try:
+        with metrics.stage("playlist check"):
+            playlist_states = pipeline.get_playlist_states(
+                youtube, rule_sets, result.routes, fancy, verb
+            )
+
+        with metrics.stage("subscriptions"):
+            rule_sets_channels = pipeline.get_channels(youtube, rule_sets, fancy, verb)
+            channels_info = order_channels(
+                helpers.merge_dicts(rule_sets_channels),
+                get_configured_weights(rule_sets),
+            )
+        rule_sets_channels = [set(wanted) for wanted in rule_sets_channels]
+
+        upload_playlists = pipeline.iter_upload_playlists(
+            youtube, channels_info, fancy, verb, metrics
+        )
+
+        ## Paging, details, enrichment and filtering, checkpointed every few pages
+        def flush(pages: dict, videos_info: VideoRecords) -> None:
+            accepted = []
+            for batch in pipeline.iter_video_batches(videos_info.items()):
+                videos_to_enrich = batch.to_add()
+                if videos_to_enrich:
+                    pipeline.get_video_details(
+                        youtube,
+                        videos_to_enrich,
+                        rule_sets,
+                        fancy,
+                        verb,
+                        metrics=metrics,
+                        now=now,
+                    )
+                routes_candidates = pipeline.filter_batch(
+                    batch,
+                    rule_sets,
+                    rule_sets_channels,
+                    result.routes,
+                    playlist_states,
+                    metrics,
+                    now,
+                )
+                for route, candidates in zip(result.routes, routes_candidates):
+                    route.rejected.update(candidates.rejected())
+                    accepted.extend(
+                        (route.name, vid_ID, vid_info)
+                        for vid_ID, vid_info in candidates.to_add().items()
+                    )
+            checkpoint.save_pages(pages, accepted)
+
+        pages, videos_info = {}, VideoRecords()
+        for playlist_ID, page_token, done, recent_videos in iter_playlist_pages(
+            youtube, upload_playlists, since, checkpoint, fancy, verb, metrics
+        ):
+            pages[playlist_ID] = (page_token, done)
+            videos_info.update(recent_videos)
+            if len(videos_info) >= pipeline.DETAILS_BATCH_SIZE:
+                flush(pages, videos_info)
+                pages, videos_info = {}, VideoRecords()
+        if pages:
+            flush(pages, videos_info)
+
+        ## Insertion in publish order, each video being checkpointed once processed
+        empty = [VideoRecords() for _ in result.routes]
+        for index, route in enumerate(result.routes):
+            for vid_ID, vid_info in checkpoint.get_accepted(route.name).items():
+                routes_candidates = list(empty)
+                routes_candidates[index] = VideoRecords([(vid_ID, vid_info)])
+                pipeline.insert_batch(
+                    youtube,
+                    routes_candidates,
+                    rule_sets,
+                    result.routes,
+                    playlist_states,
+                    fancy,
+                    verb,
+                    metrics,
+                )
+                checkpoint.mark_processed(route.name, [vid_ID])
+
+        helpers.print2(
+            f"Backfill since {since:%Y-%m-%d} completed: {sum(len(route.added) for route in result.routes)} videos added.",
+            fancy,
+            "success",
+            ["all", "func"],
+            verb,
+        )
+    except helpers.QTubeError as err:
+        err.result = result  # Partial outcome, e.g. to report the failed run
+        raise
+    finally:
+        result.timings = metrics.timings
+        result.quota_used = quota_counter.quota_used
+        result.api_calls = dict(quota_counter.calls)
+        if owned_checkpoint:
+            checkpoint.close()
+
+    return result
@@ -0,0 +1,141 @@
+import concurrent.futures
+import json
+
+from QTube import pipeline
+from QTube.utils import auth
+from QTube.utils.youtube.cache import PublicCache
+
+
+def load_profile_params(profile: dict) -> dict:
+    """Retrieves the user-defined parameters of an account profile.
+
+    Args:
+        profile (dict): Account profile, whose params entry is either a parameters dictionary or the path of a parameters JSON file.
+
+    Returns:
+        (dict): Dictionary of the user-defined parameters.
+    """
+    params = profile["params"]
+    if isinstance(params, dict):
+        return params
+
+    with open(params) as f:
+        return json.load(f)
+
+
+def load_profile_credentials(profile: dict, params: dict = None):
+    """Loads the credentials of an account profile, refreshing them or logging in if needed.
+
+    Args:
+        profile (dict): Account profile (name, params, token and optionally client_secrets).
+        params (dict): User-defined parameters of the profile (loaded from the profile if None).
+
+    Returns:
+        credentials (Credentials): Valid credentials of the account.
+    """
+    if params is None:
+        params = load_profile_params(profile)
+
+    return auth.load_credentials(
+        token_path=profile.get("token", "token.pickle"),
+        client_secrets_path=profile.get("client_secrets", "client_secrets.json"),
+        fancy=params["fancy_mode"],
+        verb=params["verbosity"],
+    )
+
+
+def run_profile(
+    profile: dict,
+    credentials=None,
+    cache: PublicCache = None,
+    middlewares: list = None,
+) -> pipeline.RunResult:
+    """Runs QTube for one account profile.
+
+    Args:
+        profile (dict): Account profile (name, params, token and optionally client_secrets).
+        credentials (Credentials): Credentials of the account (loaded from the profile if None).
+        cache (PublicCache): Cache of public data shared with the other profiles (optional).
+        middlewares (list): Middlewares every API request goes through (optional).
+
+    Returns:
+        (RunResult): Outcome of the run.
+    """
+    params = load_profile_params(profile)
+    if credentials is None:
+        credentials = load_profile_credentials(profile, params)
+
+    return pipeline.run(
+        params, credentials=credentials, middlewares=middlewares, cache=cache
+    )
+
+
+def run_batch(
+    profiles: list[dict],
+    max_workers: int = 4,
+    cache: PublicCache = None,
+    middlewares: list = None,
+) -> dict:
+    """Runs QTube for several accounts in one process.
+    The public data (channel uploads, video details, captions and shorts status) is shared
+    between the accounts through a single cache, while subscriptions and playlists stay
+    specific to each account. The credentials of the accounts are loaded one after another
+    before the runs start, since logging in opens a local server on a fixed port and a
+    consent screen in the browser.
+
+    Args:
+        profiles (list[dict]): Account profiles, each with a name, params (dictionary or JSON file path), token (pickle file path) and optionally client_secrets (JSON file path).
+        max_workers (int): Number of accounts processed at the same time.
+        cache (PublicCache): Cache of public data (a new one is created if None).
+        middlewares (list): Middlewares every API request of every account goes through (optional).
+
+    Returns:
+        results (dict): Profile names (keys) and their RunResult, or the exception that stopped them (values).
+
+    Raises:
+        ValueError: If several profiles have the same name.
+    """
+    names = [profile["name"] for profile in profiles]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(
+            f"Profile names must be unique, found several {', '.join(duplicates)} profiles."
+        )
+
+    if cache is None:
+        cache = PublicCache()
+
+    results, credentials = {}, {}
+    for profile in profiles:
+        try:
+            credentials[profile["name"]] = load_profile_credentials(profile)
+        except Exception as e:  # A failing account does not stop the others
+            results[profile["name"]] = e
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="qtube-batch"
+    ) as pool:
+        futures = {
+            pool.submit(
+                run_profile,
+                profile,
+                credentials[profile["name"]],
+                cache,
+                middlewares,
+            ): profile["name"]
+            for profile in profiles
+            if profile["name"] in credentials
+        }
+
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                results[futures[future]] = future.result()
+            except Exception as e:  # A failing account does not stop the others
+                results[futures[future]] = e
+
+    # Same order as the profiles
+    return {
+        profile["name"]: results[profile["name"]]
+        for profile in profiles
+        if profile["name"] in results
+    }
@@ -0,0 +1,1321 @@
+import contextlib
+import dataclasses
+import datetime as dt
+import time
+
+from collections import Counter
+
+from QTube.utils import auth, checks, executor, filters, helpers
+from QTube.utils.deadline import Deadline
+from QTube.utils.metrics import Metrics
+from QTube.utils.negative_cache import NegativeCache
+from QTube.utils.pending import PendingQueue
+from QTube.utils.priorities import (
+    ChannelPriorities,
+    get_configured_weights,
+    order_channels,
+)
+from QTube.utils.records import FIELDS, VideoRecord, VideoRecords
+from QTube.utils.snapshots import SnapshotStore, set_view_rates
+from QTube.utils.youtube import captions, channels, playlists, resource, videos
+from QTube.utils.youtube.cache import PublicCache
+from QTube.utils.youtube.http_cache import HttpCache
+from QTube.utils.youtube.store import VideoStore
+
+# Number of videos to add enriched, filtered and inserted at a time (videos.list maximum)
+DETAILS_BATCH_SIZE = 50
+
+# Extractors of the video information read as is from the videos.list responses
+EXTRACTORS = {
+    "title": videos.get_titles,
+    "duration": videos.get_durations,
+    "language": videos.get_languages,
+    "description": videos.get_descriptions,
+    "tags": videos.get_tags,
+    "definition": videos.get_definitions,
+    "dimension": videos.get_dimensions,
+    "live status": videos.is_live,
+    "views": videos.get_view_counts,
+    "likes": videos.get_like_counts,
+    "comments": videos.get_comment_counts,
+    "has_paid_ad": videos.has_paid_advertising,
+    "made_for_kids": videos.is_made_for_kids,
+}
+
+# Video information that is not kept in the run result once a video has been added
+HEAVY_FIELDS = {"description", "tags", "captions", "resolutions", "framerates"}
+
+
+@dataclasses.dataclass
+class RouteResult:
+    """Outcome of a rule set of a QTube run.
+
+    Attributes:
+        name (str): Name of the rule set (its playlist ID if it is not named).
+        playlist_ID (str): ID of the playlist the videos were added to.
+        added (dict[str, VideoRecord]): Video IDs (keys) and records (values) of the added videos, without the heavy fields (descriptions, tags, captions and streams). Records can be read as dictionaries.
+        rejected (dict[str, str]): Video IDs (keys) and name of the filter that rejected them (values).
+    """
+
+    name: str
+    playlist_ID: str
+    added: dict = dataclasses.field(default_factory=dict)
+    rejected: dict = dataclasses.field(default_factory=dict)
+
+
+@dataclasses.dataclass
+class RunResult:
+    """Outcome of a QTube run.
+
+    Attributes:
+        routes (list[RouteResult]): Outcome of each rule set, in the order they were defined.
+        timings (dict[str, float]): Wall time, in seconds, spent in each stage of the run.
+        quota_used (int): Number of YT API quota units used by the run.
+        api_calls (dict[str, int]): Number of calls made to each YT API method.
+        metrics (Metrics): Instrumentation of the run (stage CPU times, API latencies, retries and filter counts).
+        skipped (dict[str, int]): Work skipped to meet the deadline of the run: stages (keys) and number of videos or channels they skipped (values).
+    """
+
+    routes: list = dataclasses.field(default_factory=list)
+    timings: dict = dataclasses.field(default_factory=dict)
+    quota_used: int = 0
+    api_calls: dict = dataclasses.field(default_factory=dict)
+    metrics: Metrics = dataclasses.field(default_factory=Metrics, repr=False)
+    skipped: dict = dataclasses.field(default_factory=dict)
+
+    @property
+    def playlist_ID(self) -> str:
+        """ID of the playlist of the first rule set."""
+        return self.routes[0].playlist_ID
+
+    @property
+    def added(self) -> dict:
+        """Video IDs (keys) and video information (values) of the videos added to any playlist."""
+        return helpers.merge_dicts([route.added for route in self.routes])
+
+    @property
+    def rejected(self) -> dict:
+        """Video IDs (keys) and rejection reason (values) of the videos rejected by every rule set.
+        The reason given is the one of the first rule set."""
+        first_route, *other_routes = self.routes
+        return {
+            vid_ID: reason
+            for vid_ID, reason in first_route.rejected.items()
+            if all(vid_ID in route.rejected for route in other_routes)
+        }
+
+    def report(self) -> dict:
+        """Builds a machine-readable report of the run (see QTube.utils.metrics to write it).
+
+        Returns:
+            (dict): Outcome of each rule set, quota, API calls, skipped work and the recorded metrics.
+        """
+        return {
+            "timestamp": time.time(),
+            "quota_used": self.quota_used,
+            "api_calls": self.api_calls,
+            "skipped": self.skipped,
+            "routes": [
+                {
+                    "name": route.name,
+                    "playlist_ID": route.playlist_ID,
+                    "added": len(route.added),
+                    "rejected": len(route.rejected),
+                    "rejected_by": dict(Counter(route.rejected.values())),
+                }
+                for route in self.routes
+            ],
+            **self.metrics.to_dict(),
+        }
+
+
+def get_rule_sets(params: dict) -> list[dict]:
+    """Retrieves the rule sets of the user parameters.
+    Each rule set of the rule_sets parameter is merged over the other parameters, which act as defaults.
+    Without rule_sets, the parameters form a single rule set.
+
+    Args:
+        params (dict): Dictionary of the user-defined parameters.
+
+    Returns:
+        (list[dict]): Complete parameters of each rule set.
+    """
+    if not params.get("rule_sets"):
+        return [params]
+
+    base_params = {k: v for k, v in params.items() if k != "rule_sets"}
+    return [{**base_params, **rule_set} for rule_set in params["rule_sets"]]
+
+
+def get_channels(
+    youtube, rule_sets: list[dict], fancy: bool, verb: list[str]
+) -> list[dict]:
+    """Retrieves the subscribed and extra channels of each rule set, filtered on their names.
+    Subscriptions and extra channels are only retrieved once, whatever the number of rule sets.
+
+    Args:
+        youtube (Resource): YT API resource.
+        rule_sets (list[dict]): Complete parameters of each rule set.
+        fancy (bool): Determines wether the text is fancyfied (emoji+color).
+        verb (list[str]): User defined verbosity.
+
+    Returns:
+        (list[dict]): Dictionaries of the wanted channel names (keys) and channel IDs (values), one per rule set.
+    """
+    ## Dictionnary of subscribed channels names and IDs
+    subbed_channels_info = helpers.handle_http_errors(
+        verb, fancy, channels.get_subscriptions, youtube
+    )
+
+    ## Dictionnaries of extra channels names and IDs
+    extra_handles = {
+        handle
+        for rule_set in rule_sets
+        if rule_set["include_extra_channels"]
+        for handle in rule_set.get("extra_channel_handles")
+    }
+    extra_channels_info = {
+        handle: helpers.handle_http_errors(
+            verb, fancy, channels.get_channel_info, youtube, handle
+        )
+        for handle in sorted(extra_handles)
+    }
+
+    wanted_channels_info = []
+    for rule_set in rule_sets:
+        ## Merging subbed and extra channel dictionnaries
+        channels_info = helpers.merge_dicts(
+            [subbed_channels_info]
+            + [
+                extra_channels_info[handle]
+                for handle in (
+                    rule_set.get("extra_channel_handles")
+                    if rule_set["include_extra_channels"]
+                    else []
+                )
+            ]
+        )
+
+        ## Filtering on channel names
+        wanted_channels_info.append(
+            filters.filter_channels(
+                channels_info,
+                rule_set.get("required_in_channel_name"),
+                rule_set.get("banned_in_channel_name"),
+            )
+        )
+
+    return wanted_channels_info
+
+
+def iter_upload_playlists(
+    youtube, channels_info: dict, fancy: bool, verb: list[str], metrics: Metrics
+):
+    """Retrieves the upload playlists of channels, 50 channels per API call, as they are needed.
+
+    Args:
+        youtube (Resource): YT API resource.
+        channels_info (dict): Dictionary of channel names (keys) and channel IDs (values).
+        fancy (bool): Determines wether the text is fancyfied (emoji+color).
+        verb (list[str]): User defined verbosity.
+        metrics (Metrics): Instrumentation of the run.
+
+    Yields:
+        (tuple[str, str]): Channel name and upload playlist ID.
+    """
+    for sub_dict in helpers.split_dict(channels_info, 50):
+        with metrics.stage("uploads"):
+            partial = helpers.handle_http_errors(
+                verb,
+                fancy,
+                channels.get_uploads_playlists,
+                youtube,
+                list(sub_dict.values()),
+            )
+        yield from zip(sub_dict.keys(), partial)
+
+
+def iter_recent_videos(
+    youtube,
+    upload_playlists,
+    run_freq: str | int,
+    fancy: bool,
+    verb: list[str],
+    metrics: Metrics,
+    now: dt.datetime = None,
+):
+    """Retrieves the latest videos of channels, one channel at a time.
+    Videos uploaded outside of the run frequency timeframe are rejected right away.
+
+    Args:
+        youtube (Resource): YT API resource.
+        upload_playlists (iterable[tuple[str, str]]): Channel names and upload playlist IDs.
+        run_freq (str|int): Widest run frequency of the rule sets.
+        fancy (bool): Determines wether the text is fancyfied (emoji+color).
+        verb (list[str]): User defined verbosity.
+        metrics (Metrics): Instrumentation of the run.
+        now (datetime): Reference datetime of the upload date filter (defaults to now).
+
+    Yields:
+        (tuple[str, VideoRecord]): Video ID and record.
+    """
+    for ch_name, playlist_Id in upload_playlists:
+        with metrics.stage("recent videos"):
+            latest_partial = helpers.handle_http_errors(
+                verb, fancy, playlists.get_recent_videos, youtube, playlist_Id
+            )
+
+            if latest_partial == "ignore":
+                helpers.print2(
+                    f"Channel {ch_name} has no public videos.",
+                    fancy,
+                    "warning",
+                    ["all", "func"],
+                    verb,
+                )
+                continue
+
+            recent_videos = VideoRecords(
+                (
+                    vid_id,
+                    VideoRecord(
+                        upload_datetime=vid_info["upload datetime"],
+                        channel_name=ch_name,
+                        upload_playlist=playlist_Id,
+                    ),
+                )
+                for vid_id, vid_info in latest_partial.items()
+            )
+            filters.filter_upload_dates(recent_videos, run_freq, now)
+
+        yield from recent_videos.items()
+
+
+def iter_screened_videos(
+    videos_iter,
+    rule_sets: list[dict],
+    negative_cache: NegativeCache,
+    screened: set,
+    metrics: Metrics,
+    chunk_size: int = DETAILS_BATCH_SIZE,
+):
+    """Rejects the videos that every rule set rejected in a previous run, before their details are retrieved (see NegativeCache).
+    Videos are looked up chunk_size videos still to be added at a time. The rejected videos
+    are rejected for the reasons of every rule set (the first one being reported).
+
+    Args:
+        videos_iter (iterable[tuple[str, VideoRecord]]): Video IDs and records.
+        rule_sets (list[dict]): Complete parameters of each rule set.
+        negative_cache (NegativeCache): Rejections of the previous runs.
+        screened (set): IDs of the videos rejected from the cache, filled.
+        metrics (Metrics): Instrumentation of the run.
+        chunk_size (int): Number of videos to be added looked up at once.
+
+    Yields:
+        (tuple[str, VideoRecord]): Video ID and record.
+    """
+
+    def screen(chunk: list):
+        with metrics.stage("negative cache"):
+            rejections = negative_cache.get_rejections(
+                [vid_ID for vid_ID, vid_info in chunk if not vid_info.rejections],
+                rule_sets,
+            )
+            for vid_ID, reasons in rejections.items():
+                vid_info = next(record for ID, record in chunk if ID == vid_ID)
+                for reason in reasons:
+                    vid_info.reject(reason)
+            screened.update(rejections)
+        return chunk
+
+    chunk, to_add = [], 0
+    for vid_ID, vid_info in videos_iter:
+        chunk.append((vid_ID, vid_info))
+        to_add += not vid_info.rejections
+        if to_add == chunk_size:
+            yield from screen(chunk)
+            chunk, to_add = [], 0
+
+    if chunk:
+        yield from screen(chunk)
+
+
+def iter_within_deadline(items, deadline: Deadline, stage: str, count: int, name: str):
+    """Stops an iteration once a stage no longer fits in the time left before the deadline.
+
+    Args:
+        items (iterable): Items to iterate over.
+        deadline (Deadline): Time budget of the run.
+        stage (str): Stage each item goes through next (see Deadline.fits).
+        count (int): Number of items.
+        name (str): Name under which the items left are counted as skipped.
+
+    Yields:
+        (any): Items, as long as the stage fits.
+    """
+    for index, item in enumerate(items):
+        if not deadline.fits(stage):
+            deadline.skip(name, count - index)
+            return
+        yield item
+
+
+def iter_video_batches(videos_iter, batch_size: int = DETAILS_BATCH_SIZE):
+    """Groups videos in batches holding batch_size videos still to be added.
+    Rejected videos are kept in the batch they were met in.
+
+    Args:
+        videos_iter (iterable[tuple[str, VideoRecord]]): Video IDs and records.
+        batch_size (int): Number of videos to be added per batch.
+
+    Yields:
+        (VideoRecords): Video IDs (keys) and records (values).
+    """
+    batch, to_add = VideoRecords(), 0
+    for vid_ID, vid_info in videos_iter:
+        batch[vid_ID] = vid_info
+        to_add += not vid_info.rejections
+        if to_add == batch_size:
+            yield batch
+            batch, to_add = VideoRecords(), 0
+
+    if batch:
+        yield batch
+
+
+def fetch_video_details(
+    youtube,
+    videos_info: dict,
+    fancy: bool,
+    verb: list[str],
+    metrics: Metrics = None,
+    information: set[str] = None,
+) -> dict:
+    """Retrieves the information of videos from the YT API, 50 videos per call, and adds it to the videos' information, in place.
+    Videos the API returns no information on (private or deleted videos) are rejected.
+
+    Args:
+        youtube (Resource): YT API resource.
+        videos_info (VideoRecords): Video IDs (keys) and records (values).
+        fancy (bool): Determines wether the text is fancyfied (emoji+color).
+        verb (list[str]): User defined verbosity.
+        metrics (Metrics): Instrumentation of the run, timing the details (optional).
+        information (set[str]): Video information needed by the filters, the only one requested and extracted (see filters.get_needed_information, everything if None).
+
+    Returns:
+        responses (dict): YT API responses, merged, to be given to enrich_videos.
+    """
+    if metrics is None:
+        metrics = Metrics()
+    if information is None:
+        information = set(videos.VIDEO_FIELDS) & set(FIELDS)
+
+    with metrics.stage("details"):
+        responses = {"items": []}
+        for sub_dict in helpers.split_dict(videos_info, 50):
+            partial = helpers.handle_http_errors(
+                verb,
+                fancy,
+                videos.make_video_requests,
+                youtube,
+                list(sub_dict.keys()),
+                sorted(information),
+            )
+            responses["items"].extend(partial.get("items", []))
+
+        video_IDs_lst = [vid["id"] for vid in responses["items"]]
+
+        fields = {
+            key: extractor(response=responses)
+            for key, extractor in EXTRACTORS.items()
+            if key in information
+        }
+        if "title" in fields:
+            fields["original title"] = fields["title"]
+        if "likes_to_views_ratio" in information:
+            fields["likes_to_views_ratio"] = videos.get_likes_to_views_ratio(
+                fields.get("likes") or videos.get_like_counts(response=responses),
+                fields.get("views") or videos.get_view_counts(response=responses),
+            )
+        if "comments_to_views_ratio" in information:
+            fields["comments_to_views_ratio"] = videos.get_comments_to_views_ratio(
+                fields.get("comments") or videos.get_comment_counts(response=responses),
+                fields.get("views") or videos.get_view_counts(response=responses),
+            )
+
+        records = [videos_info[vid_ID] for vid_ID in video_IDs_lst]
+        for key, values in fields.items():
+            attribute = FIELDS[key]
+            for record, value in zip(records, values):
+                setattr(record, attribute, value)
+
+        returned_IDs = set(video_IDs_lst)
+        for vid_ID, vid_info in videos_info.items():
+            if vid_ID not in returned_IDs:
+                filters.reject(vid_info, "unavailable")
+
+    return responses
+
+
+def enrich_videos(
+    youtube,
+    videos_info: dict,
+    responses: dict,
+    rule_sets: list[dict],
+    fancy: bool,
+    verb: list[str],
+    cache: PublicCache = None,
+    metrics: Metrics = None,
+    deadline: Deadline = None,
+) -> None:
+    """Retrieves the information that is not in the videos.list responses (shorts, streams and captions), when the filters of a rule set need it, and adds it to the videos' information, in place.
+    With a deadline, each enrichment is only given the videos it has time for, and the other videos are rejected.
+
+    Args:
+        youtube (Resource): YT API resource.
+        videos_info (VideoRecords): Video IDs (keys) and records (values).
+        responses (dict): YT API responses returned by fetch_video_details.
+        rule_sets (list[dict]): Complete parameters of each rule set.
+        fancy (bool): Determines wether the text is fancyfied (emoji+color).
+        verb (list[str]): User defined verbosity.
+        cache (PublicCache): Cache of public data shared with other runs (optional).
+        metrics (Metrics): Instrumentation of the run, timing each enrichment (optional).
+        deadline (Deadline): Time budget of the run, shrinking the enrichments as its end approaches (optional).
+
+    Returns:
+        None
+    """
+    if metrics is None:
+        metrics = Metrics()
+
+    items = {vid["id"]: vid for vid in responses["items"]}
+
+    def budget(stage: str) -> tuple[list[str], contextlib.AbstractContextManager]:
+        """Videos an enrichment has time for, the other ones being rejected, and the context measuring it."""
+        video_IDs = [vid_ID for vid_ID in items if not videos_info[vid_ID].rejections]
+        if deadline is None:
+            return video_IDs, contextlib.nullcontext()
+        kept = deadline.shrink(stage, video_IDs)
+        for vid_ID in video_IDs[len(kept) :]:
+            filters.reject(videos_info[vid_ID], "deadline")
+        return kept, deadline.measure(stage, len(kept))
+
+    # Shorts retrieving (probes youtube.com, so only done when shorts are filtered)
+    if any(rule_set["keep_shorts"] is False for rule_set in rule_sets):
+        video_IDs_lst, measure = budget("enrichment shorts")
+        with metrics.stage("enrichment shorts"), measure:
+            shorts = videos.is_short(
+                response={"items": [items[vid_ID] for vid_ID in video_IDs_lst]},
+                video_IDs=video_IDs_lst,
+                probe_cache=cache.shorts if cache is not None else None,
+            )
+            for vid_ID, is_a_short in zip(video_IDs_lst, shorts):
+                videos_info[vid_ID].is_short = is_a_short
+
+    # Resolutions retrieving (does not use YT API)
+    if any(rule_set.get("lowest_resolution") is not None for rule_set in rule_sets):
+        video_IDs_lst, measure = budget("enrichment resolutions")
+        with metrics.stage("enrichment resolutions"), measure:
+            resolutions = videos.get_resolutions(video_IDs=video_IDs_lst)
+            for vid_ID in video_IDs_lst:
+                videos_info[vid_ID].resolutions = resolutions.get(vid_ID, [])
+
+    # Framerates retrieving (does not use YT API)
+    if any(rule_set.get("lowest_framerate") is not None for rule_set in rule_sets):
+        video_IDs_lst, measure = budget("enrichment framerates")
+        with metrics.stage("enrichment framerates"), measure:
+            framerates = videos.get_framerates(video_IDs=video_IDs_lst)
+            for vid_ID in video_IDs_lst:
+                videos_info[vid_ID].framerates = framerates.get(vid_ID, [])
+
+    ## Caption information retrieving
+    if any(rule_set["require_captions"] for rule_set in rule_sets):
+        video_IDs_lst, measure = budget("enrichment captions")
+        with metrics.stage("enrichment captions"), measure:
+            captions_responses = helpers.handle_http_errors(
+                verb, fancy, captions.make_caption_requests, youtube, video_IDs_lst
+            )
+            captions_dict = captions.get_captions(response=captions_responses)
+            for vid_ID in video_IDs_lst:
+                videos_info[vid_ID].captions = captions_dict[vid_ID]
+
+
+def get_video_details(
+    youtube,
+    videos_info: dict,
+    rule_sets: list[dict],
+    fancy: bool,
+    verb: list[str],
+    cache: PublicCache = None,
+    metrics: Metrics = None,
+    snapshots: SnapshotStore = None,
+    now: dt.datetime = None,
+) -> None:
+    """Retrieves the additional information needed by the filters of any rule set and adds it to the videos' information, in place.
+    Videos the API returns no information on (private or deleted videos) are rejected.
+
+    Args:
+        youtube (Resource): YT API resource.
+        videos_info (VideoRecords): Video IDs (keys) and records (values).
+        rule_sets (list[dict]): Complete parameters of each rule set.
+        fancy (bool): Determines wether the text is fancyfied (emoji+color).
+        verb (list[str]): User defined verbosity.
+        cache (PublicCache): Cache of public data shared with other runs (optional).
+        metrics (Metrics): Instrumentation of the run, timing the details and each enrichment (optional).
+        snapshots (SnapshotStore): Statistics of the videos in previous runs, for the views growth (optional).
+        now (datetime): Reference datetime of the view rates (defaults to now).
+
+    Returns:
+        None
+    """
+    responses = fetch_video_details(
+        youtube,
+        videos_info,
+        fancy,
+        verb,
+        metrics,
+        set().union(*map(filters.get_needed_information, rule_sets)),
+    )
+    if any(map(filters.needs_view_rates, rule_sets)):
+        set_view_rates(videos_info, snapshots, now)
+    enrich_videos(
+        youtube, videos_info, responses, rule_sets, fancy, verb, cache, metrics
+    )
+
+
+@dataclasses.dataclass
+class PlaylistState:
+    """State of a playlist videos are added to during a run.
+
+    Attributes:
+        title (str): Title of the playlist.
+        video_count (int): Number of videos in the playlist.
+        content (set[str]): IDs of the videos in the playlist (None if duplicates are not checked).
+        announced (bool): Whether the list of added videos has been introduced.
+        limit_reached (bool): Whether the 5000 videos limit has been reached.
+    """
+
+    title: str
+    video_count: int
+    content: set = None
+    announced: bool = False
+    limit_reached: bool = False
+
+
+def get_playlist_state(
+    youtube, playlist_ID: str, check_duplicates: bool, fancy: bool, verb: list[str]
+) -> PlaylistState:
+    """Retrieves the title, video count and, if needed, content of a playlist.
+
+    Args:
+        youtube (Resource): YT API resource.
+        playlist_ID (str): Playlist ID.
+        check_duplicates (bool): Determines whether the content of the playlist is retrieved.
+        fancy (bool): Determines wether the text is fancyfied (emoji+color).
+        verb (list[str]): User defined verbosity.
+
+    Returns:
+        (PlaylistState): State of the playlist.
+    """
+    title = helpers.handle_http_errors(
+        verb, fancy, playlists.get_playlists_titles, youtube, [playlist_ID]
+    )[0]
+    video_count = helpers.handle_http_errors(
+        verb, fancy, playlists.get_playlists_video_counts, youtube, [playlist_ID]
+    )[0]
+
+    content = None
+    if check_duplicates:
+        content = set(
+            helpers.handle_http_errors(
+                verb, fancy, playlists.get_playlist_content, youtube, playlist_ID
+            )
+        )
+
+    return PlaylistState(title, video_count, content)
+
+
+def add_videos(
+    youtube,
+    playlist_ID: str,
+    videos_to_add: dict,
+    state: PlaylistState,
+    fancy: bool,
+    verb: list[str],
+) -> dict:
+    """Adds videos to a playlist, as long as the playlist stays under YT's 5000 videos limit.
+
+    Args:
+        youtube (Resource): YT API resource.
+        playlist_ID (str): Playlist ID.
+        videos_to_add (VideoRecords): Video IDs (keys) and records (values) of the videos to add.
+        state (PlaylistState): State of the playlist, updated with the added videos.
+        fancy (bool): Determines wether the text is fancyfied (emoji+color).
+        verb (list[str]): User defined verbosity.
+
+    Returns:
+        added (dict): Video IDs (keys) and records (values) of the added videos.
+    """
+    added = {}
+    for vid_ID, vid_info in videos_to_add.items():
+        if state.video_count >= 5000:  # YT playlist size limit
+            if not state.limit_reached:
+                state.limit_reached = True
+                helpers.print2(
+                    f"The {state.title} playlist reached the 5000 size limit, the following videos could not be added to it:",
+                    fancy,
+                    "fail",
+                    ["all", "videos"],
+                    verb,
+                )
+            helpers.print2(
+                f"From {vid_info['channel name']}, the video named: {vid_info['original title']} would have been added.\n It is available at: https://www.youtube.com/watch?v={vid_ID}",
+                fancy,
+                "video",
+                ["all", "videos"],
+                verb,
+            )
+            continue
+
+        if not state.announced:
+            state.announced = True
+            helpers.print2(
+                f"The following videos will be added to the {state.title} playlist:",
+                fancy,
+                "info",
+                ["all", "videos"],
+                verb,
+            )
+
+        helpers.handle_http_errors(
+            verb, fancy, playlists.add_to_playlist, youtube, playlist_ID, vid_ID
+        )
+        added[vid_ID] = vid_info
+        state.video_count += 1
+        if state.content is not None:
+            state.content.add(vid_ID)
+
+        helpers.print2(
+            f"From {vid_info['channel name']}, the video named: {vid_info['original title']} has been added.",
+            fancy,
+            "video",
+            ["all", "videos"],
+            verb,
+        )
+
+    return added
+
+
+def filter_batch(
+    batch: dict,
+    rule_sets: list[dict],
+    rule_sets_channels: list[set],
+    routes: list[RouteResult],
+    playlist_states: dict,
+    metrics: Metrics = None,
+    now: dt.datetime = None,
+) -> list[dict]:
+    """Applies the filters of each rule set to an enriched batch of videos.
+
+    Args:
+        batch (VideoRecords): Video IDs (keys) and records (values).
+        rule_sets (list[dict]): Complete parameters of each rule set.
+        rule_sets_channels (list[set]): Wanted channel names of each rule set.
+        routes (list[RouteResult]): Outcome of each rule set.
+        playlist_states (dict): Playlist IDs (keys) and PlaylistState (values).
+        metrics (Metrics): Instrumentation of the run (optional).
+        now (datetime): Reference datetime of the upload date filters (defaults to now).
+
+    Returns:
+        (list[dict]): Filtered copy of the batch, one per rule set.
+    """
+    if metrics is None:
+        metrics = Metrics()
+
+    routes_candidates = []
+    for rule_set, wanted_channels, route in zip(rule_sets, rule_sets_channels, routes):
+        state = playlist_states[route.playlist_ID]
+
+        with metrics.stage("filters"):
+            candidates = batch.copy()
+            with metrics.filter("upload date", candidates, route.name):
+                filters.filter_upload_dates(candidates, rule_set["run_frequency"], now)
+            with metrics.filter("channel name", candidates, route.name):
+                filters.filter_channel_names(candidates, wanted_channels)
+
+            filters.apply_filters(
+                candidates.to_add(),
+                rule_set,
+                state.content if rule_set["keep_duplicates"] is False else None,
+                metrics,
+                route.name,
+            )
+        routes_candidates.append(candidates)
+
+    return routes_candidates
+
+
+def insert_batch(
+    youtube,
+    routes_candidates: list[dict],
+    rule_sets: list[dict],
+    routes: list[RouteResult],
+    playlist_states: dict,
+    fancy: bool,
+    verb: list[str],
+    metrics: Metrics = None,
+) -> None:
+    """Adds the videos selected by each rule set to its playlist, and records the outcome in its route.
+
+    Args:
+        youtube (Resource): YT API resource.
+        routes_candidates (list[VideoRecords]): Filtered batch of videos, one per rule set (see filter_batch).
+        rule_sets (list[dict]): Complete parameters of each rule set.
+        routes (list[RouteResult]): Outcome of each rule set, updated in place.
+        playlist_states (dict): Playlist IDs (keys) and PlaylistState (values).
+        fancy (bool): Determines wether the text is fancyfied (emoji+color).
+        verb (list[str]): User defined verbosity.
+        metrics (Metrics): Instrumentation of the run (optional).
+
+    Returns:
+        None
+    """
+    if metrics is None:
+        metrics = Metrics()
+
+    for candidates, rule_set, route in zip(routes_candidates, rule_sets, routes):
+        state = playlist_states[route.playlist_ID]
+
+        with metrics.stage("insertion"):
+            # Videos added since the batch was filtered, e.g. by another rule set
+            if rule_set["keep_duplicates"] is False:
+                filters.filter_duplicates(candidates, state.content)
+
+            videos_to_add = candidates.to_add()
+            added = add_videos(
+                youtube, route.playlist_ID, videos_to_add, state, fancy, verb
+            )
+
+        for vid_ID, vid_info in added.items():
+            for key in HEAVY_FIELDS:
+                vid_info.pop(key, None)
+            route.added[vid_ID] = vid_info
+        route.rejected.update(candidates.rejected())
+        route.rejected.update(
+            {
+                vid_ID: "playlist size limit"
+                for vid_ID in videos_to_add
+                if vid_ID not in added
+            }
+        )
+
+
+def promote_pending_videos(
+    youtube,
+    pending: PendingQueue,
+    rule_sets: list[dict],
+    routes: list[RouteResult],
+    playlist_states: dict,
+    fancy: bool,
+    verb: list[str],
+    metrics: Metrics = None,
+    snapshots: SnapshotStore = None,
+    now: dt.datetime = None,
+    deadline: Deadline = None,
+) -> None:
+    """Evaluates again the queued videos that are due (see PendingQueue), adds the ones now passing the statistics thresholds, and updates the queue.
+    Only the statistics of the videos are retrieved, 50 videos per call.
+
+    Args:
+        youtube (Resource): YT API resource.
+        pending (PendingQueue): Videos rejected for their statistics by previous runs.
+        rule_sets (list[dict]): Complete parameters of each rule set.
+        routes (list[RouteResult]): Outcome of each rule set, updated in place.
+        playlist_states (dict): Playlist IDs (keys) and PlaylistState (values).
+        fancy (bool): Determines wether the text is fancyfied (emoji+color).
+        verb (list[str]): User defined verbosity.
+        metrics (Metrics): Instrumentation of the run (optional).
+        snapshots (SnapshotStore): Statistics of the videos in previous runs, for the views growth (optional).
+        now (datetime): Reference datetime of the view rates (defaults to now).
+        deadline (Deadline): Time budget of the run, the videos being evaluated again only if it leaves time for it (optional).
+
+    Returns:
+        None
+    """
+    if metrics is None:
+        metrics = Metrics()
+
+    due = pending.get_due([route.name for route in routes])
+    refreshed = VideoRecords()
+    for videos_info in due.values():
+        for vid_ID, vid_info in videos_info.items():
+            refreshed.setdefault(vid_ID, vid_info.copy())
+    if not refreshed:
+        return
+    elif deadline is not None and not deadline.fits(
+        "details", -(-len(refreshed) // DETAILS_BATCH_SIZE)
+    ):
+        deadline.skip("pending videos", len(refreshed))
+        return
+
+    thresholds = {
+        key
+        for key, param, _ in filters.THRESHOLD_FILTERS
+        if any(rule_set.get(param) for rule_set in rule_sets)
+    }
+    fetch_video_details(
+        youtube,
+        refreshed,
+        fancy,
+        verb,
+        metrics,
+        set().union(*map(filters.get_needed_information, rule_sets))
+        & (thresholds | filters.VIEW_RATES_STATISTICS),
+    )
+    if thresholds & filters.VIEW_RATES:
+        with metrics.stage("view rates"):
+            set_view_rates(refreshed, snapshots, now)
+
+    routes_candidates = []
+    for rule_set, route in zip(rule_sets, routes):
+        candidates = due[route.name]
+        for vid_ID, vid_info in candidates.items():
+            statistics = refreshed[vid_ID]
+            if statistics.rejections:
+                filters.reject(vid_info, "unavailable")
+            for key in thresholds:
+                setattr(vid_info, FIELDS[key], getattr(statistics, FIELDS[key], None))
+        with metrics.stage("filters"):
+            filters.apply_threshold_filters(
+                candidates.to_add(), rule_set, metrics, route.name
+            )
+        routes_candidates.append(candidates)
+
+    insert_batch(
+        youtube,
+        routes_candidates,
+        rule_sets,
+        routes,
+        playlist_states,
+        fancy,
+        verb,
+        metrics,
+    )
+    for route, candidates in zip(routes, routes_candidates):
+        pending.update(route.name, candidates)
+
+    helpers.print2(
+        f"{len(refreshed)} videos rejected for their statistics by previous runs were evaluated again.",
+        fancy,
+        "info",
+        ["all", "func"],
+        verb,
+    )
+
+
+def build_youtube(
+    youtube,
+    credentials,
+    quota_counter: resource.QuotaCounter,
+    metrics: Metrics,
+    middlewares: list = None,
+    cache: PublicCache = None,
+    store: VideoStore = None,
+    http_cache: HttpCache = None,
+    fancy: bool = False,
+    verb: list[str] = None,
+):
+    """Builds the YT API resource of a run, every request going through its middlewares.
+
+    Args:
+        youtube (Resource): YT API resource, or any object with the same interface (built from the credentials if None).
+        credentials (Credentials): Credentials used to build the YT API resource (loaded from token.pickle if None).
+        quota_counter (QuotaCounter): Counter of the quota used by the run.
+        metrics (Metrics): Instrumentation of the run, measuring the latencies of the requests.
+        middlewares (list): Other middlewares every API request goes through (optional).
+        cache (PublicCache): Cache of public data shared with other runs (optional).
+        store (VideoStore): Persistent store of the video details (optional).
+        http_cache (HttpCache): Cache of the subscriptions and playlists responses (optional).
+        fancy (bool): Determines wether the text is fancyfied (emoji+color).
+        verb (list[str]): User defined verbosity.
+
+    Returns:
+        (Resource): Wrapped YT API resource.
+    """
+    if youtube is None:
+        if credentials is None:
+            credentials = auth.load_credentials(fancy=fancy, verb=verb)
+        youtube = auth.build_resource(credentials)
+
+    # The cache and the store come first, so that requests they answer are not counted,
+    # and the metrics come last, so that the latencies are the ones of the API (the
+    # requests are sent from the stage threads, each with its own HTTP client)
+    return resource.wrap(
+        youtube,
+        [layer for layer in [cache, store] if layer is not None]
+        + [
+            quota_counter,
+            *(middlewares or []),
+            metrics,
+            resource.request_gzip,
+            resource.ThreadLocalHttp(
+                http_cache.build_http if http_cache is not None else None
+            ),
+        ],
+    )
+
+
+def get_playlist_states(
+    youtube,
+    rule_sets: list[dict],
+    routes: list[RouteResult],
+    fancy: bool,
+    verb: list[str],
+) -> dict:
+    """Checks that the playlists of the rule sets can be used and retrieves their state.
+
+    Args:
+        youtube (Resource): YT API resource.
+        rule_sets (list[dict]): Complete parameters of each rule set.
+        routes (list[RouteResult]): Outcome of each rule set.
+        fancy (bool): Determines wether the text is fancyfied (emoji+color).
+        verb (list[str]): User defined verbosity.
+
+    Returns:
+        playlist_states (dict): Playlist IDs (keys) and PlaylistState (values).
+
+    Raises:
+        InvalidParamsError: If a playlist cannot be used.
+    """
+    playlist_IDs = list(dict.fromkeys(route.playlist_ID for route in routes))
+
+    user_info = helpers.handle_http_errors(verb, fancy, channels.get_user_info, youtube)
+    for playlist_ID in playlist_IDs:
+        if not helpers.handle_http_errors(
+            verb,
+            fancy,
+            checks.check_playlist_id,
+            youtube,
+            user_info,
+            playlist_ID,
+        ):
+            raise helpers.InvalidParamsError(
+                f"The playlist {playlist_ID} cannot be used. Check the parameters file."
+            )
+
+    return {
+        playlist_ID: get_playlist_state(
+            youtube,
+            playlist_ID,
+            any(
+                rule_set["keep_duplicates"] is False
+                and rule_set["upload_playlist_ID"] == playlist_ID
+                for rule_set in rule_sets
+            ),
+            fancy,
+            verb,
+        )
+        for playlist_ID in playlist_IDs
+    }
+
+
+def run(
+    params: dict,
+    youtube=None,
+    credentials=None,
+    middlewares: list = None,
+    cache: PublicCache = None,
+    store: VideoStore = None,
+    http_cache: HttpCache = None,
+    negative_cache: NegativeCache = None,
+    pending: PendingQueue = None,
+    snapshots: SnapshotStore = None,
+    metrics: Metrics = None,
+    now: dt.datetime = None,
+    deadline: Deadline = None,
+    priorities: ChannelPriorities = None,
+) -> RunResult:
+    """Checks Youtube for new videos and adds a selection of these videos to playlists, based on user defined parameters.
+    With the rule_sets parameter, channels and videos are retrieved once and every rule set is applied to them.
+
+    Args:
+        params (dict): Dictionary of the user-defined parameters (same format as the user_params.json file).
+        youtube (Resource): YT API resource, or any object with the same interface (built from the credentials if None).
+        credentials (Credentials): Credentials used to build the YT API resource (loaded from token.pickle if None).
+        middlewares (list): Middlewares every API request goes through (see QTube.utils.youtube.resource).
+        cache (PublicCache): Cache of public data shared with other runs, e.g. of other accounts (optional).
+        store (VideoStore): Persistent store of the video details, kept between runs (optional).
+        http_cache (HttpCache): Cache of the subscriptions and playlists responses, revalidated with their ETags (optional).
+        negative_cache (NegativeCache): Rejections of the previous runs, skipping the videos every rule set rejected and filled with the new rejections (optional).
+        pending (PendingQueue): Videos rejected for their statistics only, evaluated again by the next runs, filled with the new ones (optional).
+        snapshots (SnapshotStore): Statistics of the videos in previous runs, for the views growth, filled with the new ones (optional, not saved).
+        metrics (Metrics): Instrumentation of the run, e.g. with a profiler (a new one is created if None).
+        now (datetime): Reference datetime of the upload date filters, e.g. the recording time of a replayed run (defaults to now).
+        deadline (Deadline): Time budget of the run: channels and optional enrichments are skipped as its end approaches, keeping the time to insert the approved videos (optional).
+        priorities (ChannelPriorities): Acceptance rates of the channels in previous runs, ordering the channels along with their configured priorities, and filled with the new ones (optional).
+
+    Returns:
+        result (RunResult): Added and rejected videos of each rule set, timings, quota used and skipped work.
+
+    Raises (with the partial RunResult as their result attribute once the run started):
+        InvalidParamsError: If the parameters are not correctly formatted or a playlist cannot be used.
+        QuotaExceededError: If the YT API quota limit has been reached.
+        APIError: If a YT API query still fails after every retry.
+    """
+    rule_sets = get_rule_sets(params)
+    if not all(checks.check_user_params(rule_set) is True for rule_set in rule_sets):
+        raise helpers.InvalidParamsError(
+            "User defined parameters are not correctly formatted. Check the template and retry."
+        )
+
+    fancy = params["fancy_mode"]
+    verb = params["verbosity"]
+
+    result = RunResult(
+        routes=[
+            RouteResult(
+                rule_set.get("name", rule_set["upload_playlist_ID"]),
+                rule_set["upload_playlist_ID"],
+            )
+            for rule_set in rule_sets
+        ],
+        metrics=metrics if metrics is not None else Metrics(),
+    )
+    metrics = result.metrics
+    quota_counter = resource.QuotaCounter()
+
+    with metrics.stage("auth"):
+        youtube = build_youtube(
+            youtube,
+            credentials,
+            quota_counter,
+            metrics,
+            middlewares,
+            cache,
+            store,
+            http_cache,
+            fancy,
+            verb,
+        )
+
+    try:
+        ## Checking the playlist IDs and playlists the videos are added to
+        with metrics.stage("playlist check"):
+            playlist_states = get_playlist_states(
+                youtube, rule_sets, result.routes, fancy, verb
+            )
+
+        ## Discovery, shared by every rule set
+        with metrics.stage("subscriptions"):
+            rule_sets_channels = get_channels(youtube, rule_sets, fancy, verb)
+            channels_info = helpers.merge_dicts(rule_sets_channels)
+
+        # Channels processed by decreasing priority, so that a run running out of quota or
+        # time spends it on the channels the videos are usually added from
+        with metrics.stage("priorities"):
+            channels_info = order_channels(
+                channels_info,
+                get_configured_weights(rule_sets),
+                (
+                    priorities.get_rates(list(channels_info.values()))
+                    if priorities is not None
+                    else None
+                ),
+            )
+
+        ## Streaming of the videos, in batches sharing their enrichment between rule sets
+        ## (channels -> upload playlists -> recent videos -> details -> enrichment -> filters -> insertion)
+        upload_playlists = iter_upload_playlists(
+            youtube, channels_info, fancy, verb, metrics
+        )
+        if (
+            deadline is not None
+        ):  # Channels are no longer checked once a batch cannot make it
+            upload_playlists = iter_within_deadline(
+                upload_playlists, deadline, "details", len(channels_info), "channels"
+            )
+        recent_videos = iter_recent_videos(
+            youtube,
+            upload_playlists,
+            max(
+                filters.get_run_frequency_days(rule_set["run_frequency"])
+                for rule_set in rule_sets
+            ),
+            fancy,
+            verb,
+            metrics,
+            now,
+        )
+        rule_sets_channels = [set(wanted) for wanted in rule_sets_channels]
+        information = set().union(*map(filters.get_needed_information, rule_sets))
+        view_rates = any(map(filters.needs_view_rates, rule_sets))
+        measure = (
+            deadline.measure
+            if deadline is not None
+            else lambda stage, items: contextlib.nullcontext()
+        )
+
+        # Videos every rule set rejected in a previous run are rejected before their details
+        screened = set()
+        if negative_cache is not None:
+            recent_videos = iter_screened_videos(
+                recent_videos, rule_sets, negative_cache, screened, metrics
+            )
+
+        def details(batch: dict) -> tuple[dict, dict, dict]:
+            videos_info = batch.to_add()
+            if not videos_info:
+                return batch, videos_info, None
+            with measure("details", 1):
+                responses = fetch_video_details(
+                    youtube, videos_info, fancy, verb, metrics, information
+                )
+            if view_rates:
+                with metrics.stage("view rates"):
+                    set_view_rates(videos_info, snapshots, now)
+            return batch, videos_info, responses
+
+        def enrichment(item: tuple) -> dict:
+            batch, videos_info, responses = item
+            if videos_info:
+                enrich_videos(
+                    youtube,
+                    videos_info,
+                    responses,
+                    rule_sets,
+                    fancy,
+                    verb,
+                    cache,
+                    metrics,
+                    deadline,
+                )
+            return batch
+
+        def filtering(batch: dict) -> list[dict]:
+            routes_candidates = filter_batch(
+                batch,
+                rule_sets,
+                rule_sets_channels,
+                result.routes,
+                playlist_states,
+                metrics,
+                now,
+            )
+            if deadline is not None:  # Time kept to insert them
+                deadline.approve(
+                    sum(len(candidates.to_add()) for candidates in routes_candidates)
+                )
+            if negative_cache is not None:
+                with metrics.stage("negative cache"):
+                    for rule_set, candidates in zip(rule_sets, routes_candidates):
+                        negative_cache.add_rejections(
+                            {
+                                vid_ID: vid_info
+                                for vid_ID, vid_info in candidates.items()
+                                if vid_ID not in screened
+                            },
+                            rule_set,
+                        )
+            return routes_candidates
+
+        def insertion(routes_candidates: list[dict]) -> None:
+            approved = sum(len(candidates.to_add()) for candidates in routes_candidates)
+            with measure("insertion", approved):
+                insert_batch(
+                    youtube,
+                    routes_candidates,
+                    rule_sets,
+                    result.routes,
+                    playlist_states,
+                    fancy,
+                    verb,
+                    metrics,
+                )
+            if deadline is not None:
+                deadline.release(approved)
+            if priorities is not None:
+                priorities.update(routes_candidates)
+            if pending is not None:
+                for route, candidates in zip(result.routes, routes_candidates):
+                    pending.update(
+                        route.name,
+                        {
+                            vid_ID: vid_info
+                            for vid_ID, vid_info in candidates.items()
+                            if vid_ID not in screened
+                        },
+                    )
+
+        # Each stage runs in its own thread, working on a batch while the previous
+        # stages already work on the next ones, unless the run is profiled (cProfile
+        # only profiles the thread a stage runs in)
+        stages = [details, enrichment, filtering, insertion]
+        if metrics.profiler is not None:
+            batches = executor.run_sequentially(
+                iter_video_batches(recent_videos), stages
+            )
+        else:
+            batches = executor.run_pipelined(
+                iter_video_batches(recent_videos), stages, name="qtube-pipeline"
+            )
+        for _ in batches:
+            pass
+
+        ## Videos too new to pass the statistics thresholds in previous runs
+        if pending is not None:
+            promote_pending_videos(
+                youtube,
+                pending,
+                rule_sets,
+                result.routes,
+                playlist_states,
+                fancy,
+                verb,
+                metrics,
+                snapshots,
+                now,
+                deadline,
+            )
+
+        if deadline is not None and deadline.skipped:
+            helpers.print2(
+                "The deadline of the run was approaching, the following work was skipped: "
+                + ", ".join(
+                    f"{stage} ({count})" for stage, count in deadline.skipped.items()
+                )
+                + ".",
+                fancy,
+                "warning",
+                ["all", "func"],
+                verb,
+            )
+
+        if screened:
+            helpers.print2(
+                f"{len(screened)} videos rejected by previous runs were skipped.",
+                fancy,
+                "info",
+                ["all", "func"],
+                verb,
+            )
+
+        for route in result.routes:
+            if not route.added:
+                helpers.print2(
+                    f"No new videos to add to the {playlist_states[route.playlist_ID].title} playlist.",
+                    fancy,
+                    "info",
+                    ["all", "videos"],
+                    verb,
+                )
+    except helpers.QTubeError as err:
+        err.result = result  # Partial outcome, e.g. to report the failed run
+        raise
+    finally:
+        result.timings = metrics.timings
+        result.quota_used = quota_counter.quota_used
+        result.api_calls = dict(quota_counter.calls)
+        if deadline is not None:
+            result.skipped = dict(deadline.skipped)
+
+    return result
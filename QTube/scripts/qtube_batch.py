@@ -0,0 +1,60 @@
+### Imports
+## Standard library modules
+import argparse
+import json
+import sys
+
+## Local modules
+import QTube.batch
+
+
+def main():
+    """Runs QTube for several accounts in one process, based on a JSON file listing their profiles."""
+    parser = argparse.ArgumentParser(
+        prog="QTube batch",
+        description="Runs QTube for several Youtube accounts, sharing public data between them.",
+        epilog="For more information, check out the Github repo at https://github.com/Killian42/QTube.",
+        usage="qtube-batch [profiles file] [options]",
+    )
+    parser.add_argument(
+        "profiles",
+        nargs="?",
+        default="profiles.json",
+        help="JSON file listing the account profiles. Default: profiles.json",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        metavar="",
+        type=int,
+        default=4,
+        help="Number of accounts processed at the same time. Default: 4",
+    )
+    args = parser.parse_args()
+
+    try:
+        profiles = json.load(open(args.profiles))
+    except FileNotFoundError:
+        print(f"Error: {args.profiles} file not found.")
+        sys.exit()
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+        sys.exit()
+
+    try:
+        results = QTube.batch.run_batch(profiles, max_workers=args.workers)
+    except ValueError as e:  # Invalid profiles file
+        print(f"Error: {e}")
+        sys.exit()
+
+    for name, result in results.items():
+        if isinstance(result, Exception):
+            print(f"{name}: failed ({result})")
+        else:
+            print(
+                f"{name}: {len(result.added)} video(s) added, {result.quota_used} quota units used."
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import os
+import pickle
+
+from google.auth.transport.requests import Request
+from google_auth_oauthlib.flow import InstalledAppFlow
+from googleapiclient.discovery import build
+
+from QTube.utils import helpers
+from QTube.utils.youtube.model import FastJsonModel
+
+SCOPES = [
+    "https://www.googleapis.com/auth/youtube",
+    "https://www.googleapis.com/auth/youtube.force-ssl",
+]
+
+
+def load_credentials(
+    token_path: str = "token.pickle",
+    client_secrets_path: str = "client_secrets.json",
+    fancy: bool = False,
+    verb: list[str] = ["none"],
+):
+    """Loads the credentials of the user, refreshing them or logging in if needed.
+
+    Args:
+        token_path (str): Path of the pickle file storing the user's credentials from previously successful logins.
+        client_secrets_path (str): Path of the client secrets file, used to log in.
+        fancy (bool): Determines wether the text is fancyfied (emoji+color).
+        verb (list[str]): User defined verbosity.
+
+    Returns:
+        credentials (Credentials): Valid credentials of the user.
+    """
+    credentials = None
+
+    ## token.pickle stores the user's credentials from previously successful logins
+    if os.path.exists(token_path):
+        helpers.print2(
+            "Loading credentials from pickle file...",
+            fancy,
+            "info",
+            ["all", "credentials"],
+            verb,
+        )
+
+        with open(token_path, "rb") as token:
+            credentials = pickle.load(token)
+
+            helpers.print2(
+                "Credentials loaded from pickle file",
+                fancy,
+                "success",
+                ["all", "credentials"],
+                verb,
+            )
+
+    ## If there are no valid credentials available, then either refresh the token or log in.
+    if not credentials or not credentials.valid:
+        if credentials and credentials.expired and credentials.refresh_token:
+            helpers.print2(
+                "Refreshing access token...",
+                fancy,
+                "info",
+                ["all", "credentials"],
+                verb,
+            )
+
+            credentials.refresh(Request())
+            helpers.print2(
+                "Access token refreshed\n",
+                fancy,
+                "success",
+                ["all", "credentials"],
+                verb,
+            )
+        else:
+            helpers.print2(
+                "Fetching New Tokens...", fancy, "info", ["all", "credentials"], verb
+            )
+            flow = InstalledAppFlow.from_client_secrets_file(
+                client_secrets_path, scopes=SCOPES
+            )
+
+            flow.run_local_server(
+                port=8080, prompt="consent", authorization_prompt_message=""
+            )
+
+            credentials = flow.credentials
+
+            helpers.print2(
+                "New token fetched\n", fancy, "success", ["all", "credentials"], verb
+            )
+
+            # Save the credentials for the next run
+            with open(token_path, "wb") as f:
+                helpers.print2(
+                    "Saving Credentials for Future Use...",
+                    fancy,
+                    "info",
+                    ["all", "credentials"],
+                    verb,
+                )
+
+                pickle.dump(credentials, f)
+                helpers.print2(
+                    "Credentials saved\n",
+                    fancy,
+                    "success",
+                    ["all", "credentials"],
+                    verb,
+                )
+
+    return credentials
+
+
+def build_resource(credentials):
+    """Builds the YT API resource.
+    Its responses are decoded with orjson when it is installed (see QTube.utils.youtube.model).
+
+    Args:
+        credentials (Credentials): Valid credentials of the user.
+
+    Returns:
+        (Resource): YT API resource.
+    """
+    return build("youtube", "v3", credentials=credentials, model=FastJsonModel())
@@ -1,7 +1,14 @@
+import importlib.metadata
+import json
 import os
 import re
+import threading
+import time
+
 import requests
 
+from QTube.utils import helpers
+
 
 def check_user_params(params_dict: dict) -> bool:
     """Checks if the user-defined parameters are correctly formatted.
@@ -349,8 +356,56 @@ def check_user_params(params_dict: dict) -> bool:
         # Comments/views ratio
         isinstance(params_dict.get("comments_to_views_ratio"), (int, float))
         and 0 <= params_dict.get("comments_to_views_ratio") <= 1,
+        # Views per hour
+        params_dict.get("views_per_hour_threshold") is None
+        or (
+            isinstance(params_dict.get("views_per_hour_threshold"), (int, float))
+            and params_dict.get("views_per_hour_threshold") >= 0
+        ),
+        # Views growth
+        params_dict.get("views_growth_threshold") is None
+        or (
+            isinstance(params_dict.get("views_growth_threshold"), (int, float))
+            and params_dict.get("views_growth_threshold") >= 0
+        ),
+        # Rate limits
+        params_dict.get("rate_limits") is None
+        or isinstance(params_dict.get("rate_limits"), dict)
+        and all(
+            destination in ["api", "web"]
+            and (rate is None or isinstance(rate, (int, float)) and rate > 0)
+            for destination, rate in params_dict.get("rate_limits").items()
+        ),
+        # Request timeouts
+        params_dict.get("request_timeouts") is None
+        or isinstance(params_dict.get("request_timeouts"), dict)
+        and all(
+            method_ID.endswith(".list")  # Requests sent again after a timeout
+            and (timeout is None or isinstance(timeout, (int, float)) and timeout > 0)
+            for method_ID, timeout in params_dict.get("request_timeouts").items()
+        ),
+        # Hedged requests
+        params_dict.get("hedging_budget") is None
+        or isinstance(params_dict.get("hedging_budget"), (int, float))
+        and 0 <= params_dict.get("hedging_budget") <= 100,
+        # Channel priorities
+        params_dict.get("channel_priorities") is None
+        or isinstance(params_dict.get("channel_priorities"), dict)
+        and all(
+            isinstance(weight, (int, float)) and weight >= 0
+            for weight in params_dict.get("channel_priorities").values()
+        ),
         # Paid promotions
         isinstance(params_dict.get("allow_paid_promotions"), bool),
+        # Rule sets
+        params_dict.get("rule_sets") is None
+        or isinstance(params_dict.get("rule_sets"), list)
+        and all(
+            isinstance(rule_set, dict)
+            and isinstance(rule_set.get("upload_playlist_ID"), str)
+            and "rule_sets" not in rule_set
+            for rule_set in params_dict.get("rule_sets")
+        ),
     ]
 
     ok = all(checks)
@@ -373,7 +428,7 @@ def check_playlist_id(youtube, user_info: dict, test_playlist_ID: str) -> bool:
 
     response = (
         youtube.playlists()
-        .list(part="snippet", id=test_playlist_ID)
+        .list(part="snippet", id=test_playlist_ID, fields="items/snippet/channelId")
         .execute(num_retries=5)
     )
 
@@ -395,28 +450,109 @@ def check_playlist_id(youtube, user_info: dict, test_playlist_ID: str) -> bool:
         return False
 
 
-def check_version() -> tuple[str]:
-    """Checks that the local software version is up to date with the latest GitHub release.
+def get_local_version() -> str:
+    """Retrieves the version of the installed QTube package.
+    Falls back on the setup.py file of the source tree when the package is not installed.
 
     Returns:
-        version, latest_release (tuple[str]): local version and latest release.
+        version (str): Local software version (without the v).
     """
-    setup_path = os.path.abspath(os.path.join("..", "setup.py"))
+    try:
+        return importlib.metadata.version("QTube")
+    except importlib.metadata.PackageNotFoundError:
+        setup_path = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "..", "..", "setup.py"
+        )
+        try:
+            with open(setup_path) as setup_file:
+                contents = setup_file.read()
+            return re.search(r"version=['\"]([^'\"]+)['\"]", contents).group(1)
+        except (OSError, AttributeError):
+            return "0.0.0"
 
-    with open(setup_path) as setup_file:
-        contents = setup_file.read()
 
-        version = re.search(r"version=['\"]([^'\"]+)['\"]", contents).group(1)
+def fetch_latest_release(timeout: float = 3.0) -> str | None:
+    """Retrieves the latest GitHub release version of the software.
 
-        github_url = "https://api.github.com/repos/Killian42/QTube/releases/latest"
+    Args:
+        timeout (float): Maximum time, in seconds, to wait for GitHub's answer.
 
-        try:
-            response = requests.get(github_url)
-            response.raise_for_status()  # Raise an error for non-200 status codes
-            tag = response.json().get("tag_name")
-            latest_release = tag.split("v")[-1]
-        except requests.RequestException as e:
-            latest_release = None
+    Returns:
+        latest_release (str|None): Latest release (without the v), or None if it could not be retrieved.
+    """
+    github_url = "https://api.github.com/repos/Killian42/QTube/releases/latest"
+
+    try:
+        response = requests.get(github_url, timeout=timeout)
+        response.raise_for_status()  # Raise an error for non-200 status codes
+        tag = response.json().get("tag_name")
+        return tag.split("v")[-1]
+    except (requests.RequestException, ValueError, AttributeError):
+        return None
+
+
+def refresh_release_cache(cache_path: str, timeout: float = 3.0) -> None:
+    """Retrieves the latest GitHub release and saves it in the release cache file.
+    Nothing is written if the release could not be retrieved.
+
+    Args:
+        cache_path (str): Path of the release cache file.
+        timeout (float): Maximum time, in seconds, to wait for GitHub's answer.
+
+    Returns:
+        None
+    """
+    latest_release = fetch_latest_release(timeout)
+    if latest_release is None:
+        return
+
+    try:
+        tmp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"latest_release": latest_release, "checked_at": time.time()}, f)
+        os.replace(
+            tmp_path, cache_path
+        )  # Atomic, so that readers never see a partial file
+    except OSError:
+        pass
+
+
+def check_version(
+    cache_path: str = None, ttl: float = 86400.0, timeout: float = 3.0
+) -> tuple[str, str | None]:
+    """Checks that the local software version is up to date with the latest GitHub release.
+    The latest release is read from a cache file and never fetched in the calling thread:
+    if the cache is missing or older than its time to live, it is refreshed in a background thread
+    and the (possibly stale) cached value is returned right away.
+
+    Args:
+        cache_path (str): Path of the release cache file (defaults to release.json in the QTube cache directory).
+        ttl (float): Time to live of the cached release, in seconds.
+        timeout (float): Maximum time, in seconds, the background thread waits for GitHub's answer.
+
+    Returns:
+        version, latest_release (tuple[str, str|None]): local version and latest release (None if unknown yet).
+    """
+    version = get_local_version()
+
+    if cache_path is None:
+        cache_path = os.path.join(helpers.get_cache_dir(), "release.json")
+
+    try:
+        with open(cache_path) as f:
+            cache = json.load(f)
+        latest_release = cache["latest_release"]
+        fresh = time.time() - cache["checked_at"] < ttl
+    except (OSError, ValueError, KeyError, TypeError):
+        latest_release, fresh = None, False
+
+    if not fresh:
+        threading.Thread(
+            target=refresh_release_cache,
+            args=(cache_path, timeout),
+            name="qtube-release-check",
+            daemon=True,
+        ).start()
 
     return version, latest_release
 
@@ -0,0 +1,165 @@
+import contextlib
+import threading
+import time
+
+# Estimated time to insert a video in a playlist before one has been measured, in seconds
+INSERTION_COST = 1.0
+
+# Share of the budget kept aside on top of the insertions, at most MAX_MARGIN seconds
+MARGIN_SHARE = 0.05
+MAX_MARGIN = 10.0
+
+# Weight of the last measure in the per-video cost estimates (exponential moving average)
+SMOOTHING = 0.3
+
+
+class Deadline:
+    """Time budget of a run, shrinking the optional work as its end approaches.
+
+    The time spent per video by each stage is measured as the run goes (see record), so
+    that the optional stages (e.g. shorts probing or caption requests) can be given only as
+    many videos as the remaining time allows (see shrink). Time is always kept aside to
+    insert the videos that were approved but not inserted yet (see approve and release),
+    along with a small margin. Skipped work is counted per stage, for the run report.
+
+    Args:
+        budget (float): Time budget of the run, in seconds, from the creation of the deadline.
+        margin (float): Time kept aside on top of the insertions, in seconds (a share of the budget if None).
+        clock (callable): Monotonic clock, in seconds.
+    """
+
+    def __init__(self, budget: float, margin: float = None, clock=time.monotonic):
+        self.budget = budget
+        self.margin = (
+            min(budget * MARGIN_SHARE, MAX_MARGIN) if margin is None else margin
+        )
+        self.skipped = {}
+        self._clock = clock
+        self._end = clock() + budget
+        self._costs = {"insertion": INSERTION_COST}
+        self._approved = 0
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        """Time left before the deadline, in seconds (negative once it passed)."""
+        return self._end - self._clock()
+
+    def reserve(self) -> float:
+        """Time kept aside to insert the approved videos, in seconds."""
+        with self._lock:
+            return self.margin + self._approved * self._costs["insertion"]
+
+    def available(self) -> float:
+        """Time left for the work that is not reserved, in seconds."""
+        return self.remaining() - self.reserve()
+
+    def record(self, stage: str, seconds: float, items: int) -> None:
+        """Updates the estimated time a stage spends per item.
+
+        Args:
+            stage (str): Name of the stage.
+            seconds (float): Time spent by the stage.
+            items (int): Number of items it processed.
+
+        Returns:
+            None
+        """
+        if items <= 0:
+            return
+        cost = seconds / items
+        with self._lock:
+            previous = self._costs.get(stage)
+            self._costs[stage] = (
+                cost
+                if previous is None
+                else SMOOTHING * cost + (1 - SMOOTHING) * previous
+            )
+
+    @contextlib.contextmanager
+    def measure(self, stage: str, items: int):
+        """Context manager recording the time its block spends on items (see record).
+
+        Args:
+            stage (str): Name of the stage.
+            items (int): Number of items processed in the block.
+        """
+        start = self._clock()
+        yield
+        self.record(stage, self._clock() - start, items)
+
+    def fits(self, stage: str, items: int = 1) -> bool:
+        """Determines if a stage can process items before the reserved time.
+        Stages that have not been measured yet fit as long as some time is available.
+
+        Args:
+            stage (str): Name of the stage.
+            items (int): Number of items.
+
+        Returns:
+            (bool): True if the estimated time of the stage fits.
+        """
+        available = self.available()
+        with self._lock:
+            cost = self._costs.get(stage, 0.0)
+        return available > 0 and cost * items <= available
+
+    def shrink(self, stage: str, items: list) -> list:
+        """Keeps the items a stage can process before the reserved time, and counts the other ones as skipped.
+
+        Args:
+            stage (str): Name of the stage.
+            items (list): Items to process, the first ones being kept.
+
+        Returns:
+            (list): Items to process.
+        """
+        available = self.available()
+        with self._lock:
+            cost = self._costs.get(stage, 0.0)
+        if available <= 0:
+            kept = 0
+        elif cost <= 0:
+            kept = len(items)
+        else:
+            kept = min(len(items), int(available / cost))
+
+        self.skip(stage, len(items) - kept)
+        return items[:kept]
+
+    def skip(self, stage: str, items: int = 1) -> None:
+        """Counts items a stage skipped.
+
+        Args:
+            stage (str): Name of the stage.
+            items (int): Number of skipped items.
+
+        Returns:
+            None
+        """
+        if items > 0:
+            with self._lock:
+                self.skipped[stage] = self.skipped.get(stage, 0) + items
+
+    def approve(self, videos: int) -> None:
+        """Reserves the time to insert approved videos.
+
+        Args:
+            videos (int): Number of approved videos.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._approved += videos
+
+    def release(self, videos: int) -> None:
+        """Releases the time reserved for approved videos once they are inserted.
+
+        Args:
+            videos (int): Number of approved videos processed by the insertion.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._approved = max(self._approved - videos, 0)
@@ -0,0 +1,123 @@
+import contextvars
+import queue
+import threading
+
+# Maximum number of items waiting between two stages
+QUEUE_SIZE = 2
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def run_sequentially(source, stages: list):
+    """Runs the iteration over a source and each stage in the calling thread, one item after another.
+    Same as run_pipelined, for the runs whose stages need to stay in one thread (e.g. profiled runs).
+
+    Args:
+        source (iterable): Items to process.
+        stages (list[callable]): Functions taking an item and returning the item given to the next stage.
+
+    Yields:
+        (any): Items returned by the last stage, in the order of the source.
+    """
+    for item in source:
+        for stage in stages:
+            item = stage(item)
+        yield item
+
+
+def run_pipelined(source, stages: list, queue_size: int = QUEUE_SIZE, name: str = None):
+    """Runs the iteration over a source and each stage in their own thread, connected by bounded queues.
+    Every stage processes the items in the order of the source, one at a time, while the other
+    stages work on the previous or next items. The total time is then close to the one of the
+    slowest stage rather than the sum of the stages, and a bounded number of items is in flight.
+
+    The threads run in a copy of the caller's context, so that context variables (e.g. the web
+    middlewares, see QTube.utils.web) apply to them. An exception raised by the source or a stage
+    stops every thread and is raised again by the returned iterator.
+
+    Args:
+        source (iterable): Items to process.
+        stages (list[callable]): Functions taking an item and returning the item given to the next stage.
+        queue_size (int): Maximum number of items waiting between two stages.
+        name (str): Prefix of the thread names (optional).
+
+    Yields:
+        (any): Items returned by the last stage, in the order of the source.
+    """
+    stop = threading.Event()
+    queues = [queue.Queue(queue_size) for _ in range(len(stages) + 1)]
+
+    def put(q: queue.Queue, item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def get(q: queue.Queue):
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return _DONE
+
+    def feed():
+        try:
+            for item in source:
+                if not put(queues[0], item):
+                    return
+        except BaseException as e:
+            put(queues[0], _Failure(e))
+        else:
+            put(queues[0], _DONE)
+
+    def work(stage, q_in: queue.Queue, q_out: queue.Queue):
+        while True:
+            item = get(q_in)
+            if item is _DONE or isinstance(item, _Failure):
+                put(q_out, item)
+                return
+            try:
+                item = stage(item)
+            except BaseException as e:
+                put(q_out, _Failure(e))
+                return
+            if not put(q_out, item):
+                return
+
+    targets = [(feed, ())] + [
+        (work, (stage, q_in, q_out))
+        for stage, q_in, q_out in zip(stages, queues, queues[1:])
+    ]
+    threads = [
+        threading.Thread(
+            target=contextvars.copy_context().run,
+            args=(target, *args),
+            name=f"{name or 'qtube-stage'}-{index}",
+            daemon=True,
+        )
+        for index, (target, args) in enumerate(targets)
+    ]
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            item = queues[-1].get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
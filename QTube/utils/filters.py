@@ -0,0 +1,585 @@
+import datetime as dt
+
+from QTube.utils import helpers
+from QTube.utils.records import FIELDS, VideoRecord
+from QTube.utils.youtube.videos import MISSING_DURATION
+
+# Statistics thresholds: video information, user parameter and name of the filter
+THRESHOLD_FILTERS = [
+    ("views", "views_threshold", "views"),
+    ("likes", "likes_threshold", "likes"),
+    ("comments", "comments_threshold", "comments"),
+    ("likes_to_views_ratio", "likes_to_views_ratio", "likes/views ratio"),
+    ("comments_to_views_ratio", "comments_to_views_ratio", "comments/views ratio"),
+    ("views_per_hour", "views_per_hour_threshold", "views/hour"),
+    ("views_growth", "views_growth_threshold", "views growth"),
+]
+
+# View rates computed from the statistics (see QTube.utils.snapshots), and the statistics
+# retrieved for them (recorded in the snapshots)
+VIEW_RATES = {"views_per_hour", "views_growth"}
+VIEW_RATES_STATISTICS = {"views", "likes", "comments"}
+
+
+def reject(vid_info: VideoRecord, reason: str) -> None:
+    """Marks a video as not to be added.
+
+    Args:
+        vid_info (VideoRecord): Record of the video.
+        reason (str): Name of the filter rejecting the video.
+
+    Returns:
+        None
+    """
+    vid_info.reject(reason)
+
+
+def filter_channels(
+    channels_info: dict, required_words: list[str], banned_words: list[str]
+) -> dict:
+    """Filters channels on their names.
+
+    Args:
+        channels_info (dict): Dictionary of channel names (keys) and channel IDs (values).
+        required_words (list[str]): Words that must be in channel names (None to disable).
+        banned_words (list[str]): Words that must not be in channel names (None to disable).
+
+    Returns:
+        (dict): Dictionary of the wanted channel names (keys) and channel IDs (values).
+    """
+    if required_words is None and banned_words is None:  # No filtering
+        return channels_info
+
+    elif required_words is not None and banned_words is None:  # Required filtering
+        return {
+            k: v
+            for k, v in channels_info.items()
+            if any(rw in k for rw in required_words)
+        }
+
+    elif required_words is None and banned_words is not None:  # Banned filtering
+        return {
+            k: v
+            for k, v in channels_info.items()
+            if not any(bw in k for bw in banned_words)
+        }
+
+    else:  # Required and banned filtering
+        return {
+            k: v
+            for k, v in channels_info.items()
+            if any(rw in k for rw in required_words)
+            and not any(bw in k for bw in banned_words)
+        }
+
+
+def get_needed_information(params: dict) -> set[str]:
+    """Determines which video information the filters enabled in the user parameters read.
+    The titles are always needed, to report the added videos.
+
+    Args:
+        params (dict): Dictionary of the user-defined parameters.
+
+    Returns:
+        information (set[str]): Video information keys (see QTube.utils.youtube.videos.VIDEO_FIELDS).
+    """
+    information = {"title"}
+
+    if params.get("allowed_durations") is not None:
+        information |= {"duration", "live status"}
+    if params["keep_shorts"] is False:
+        information.add("duration")  # Only short videos are probed
+    if params.get("preferred_languages") is not None:
+        information.add("language")
+    if params.get("lowest_definition") == "HD":
+        information.add("definition")
+    if params.get("preferred_dimensions") is not None:
+        information.add("dimension")
+    if (
+        params.get("required_in_description") is not None
+        or params.get("banned_in_description") is not None
+    ):
+        information.add("description")
+    if params.get("required_tags") is not None or params.get("banned_tags") is not None:
+        information.add("tags")
+    if params["allow_paid_promotions"] is False:
+        information.add("has_paid_ad")
+    if params["only_made_for_kids"] is True:
+        information.add("made_for_kids")
+
+    for key, param, _ in THRESHOLD_FILTERS:
+        if params.get(param):
+            information |= VIEW_RATES_STATISTICS if key in VIEW_RATES else {key}
+
+    return information
+
+
+def needs_view_rates(params: dict) -> bool:
+    """Determines if the filters enabled in the user parameters read the view rates (see QTube.utils.snapshots).
+
+    Args:
+        params (dict): Dictionary of the user-defined parameters.
+
+    Returns:
+        (bool): True if a view rate threshold is set.
+    """
+    return any(
+        params.get(param) for key, param, _ in THRESHOLD_FILTERS if key in VIEW_RATES
+    )
+
+
+def get_run_frequency_days(run_freq: str | int) -> int:
+    """Converts a run frequency to the duration, in days, of the timeframe considered by the software.
+
+    Args:
+        run_freq (str|int): Run frequency (daily, weekly, monthly or a number of days).
+
+    Returns:
+        (int): Number of days.
+    """
+    run_freq_dict = {"daily": 1, "weekly": 7, "monthly": 30}
+
+    if isinstance(run_freq, int):
+        return run_freq
+
+    return run_freq_dict[run_freq]
+
+
+def get_upload_date_threshold(run_freq: str | int, today: dt.datetime) -> dt.datetime:
+    """Computes the oldest upload datetime of the videos considered by the software.
+
+    Args:
+        run_freq (str|int): Run frequency (daily, weekly, monthly or a number of days).
+        today (datetime): Current datetime.
+
+    Returns:
+        (datetime): Oldest upload datetime considered.
+    """
+    return today - dt.timedelta(days=get_run_frequency_days(run_freq))
+
+
+def filter_upload_dates(
+    videos: dict, run_freq: str | int, today: dt.datetime = None
+) -> None:
+    """Rejects videos uploaded outside of the timeframe considered by the software.
+
+    Args:
+        videos (VideoRecords): Video IDs (keys) and records (values).
+        run_freq (str|int): Run frequency (daily, weekly, monthly or a number of days).
+        today (datetime): Current datetime (defaults to now).
+
+    Returns:
+        None
+    """
+    if today is None:
+        today = dt.datetime.now(dt.timezone.utc)
+    upload_date_threshold = get_upload_date_threshold(run_freq, today)
+
+    for vid_info in videos.values():
+        if not vid_info.rejections and not (
+            upload_date_threshold <= vid_info.upload_datetime <= today
+        ):
+            reject(vid_info, "upload date")
+
+
+def filter_channel_names(videos: dict, wanted_channel_names: set[str]) -> None:
+    """Rejects videos from channels that are not wanted.
+
+    Args:
+        videos (VideoRecords): Video IDs (keys) and records (values).
+        wanted_channel_names (set[str]): Names of the wanted channels.
+
+    Returns:
+        None
+    """
+    for vid_info in videos.values():
+        if (
+            not vid_info.rejections
+            and vid_info.channel_name not in wanted_channel_names
+        ):
+            reject(vid_info, "channel name")
+
+
+def prepare_titles(videos: dict, params: dict) -> tuple[list[str] | None]:
+    """Strips emojis, punctuation and case from video titles and title words, depending on the user parameters.
+
+    Args:
+        videos (VideoRecords): Video IDs (keys) and records (values).
+        params (dict): Dictionary of the user-defined parameters.
+
+    Returns:
+        required_title_words, banned_title_words (tuple[list[str]|None]): Prepared title words.
+    """
+    required_title_words = params.get("required_in_title")
+    banned_title_words = params.get("banned_in_title")
+
+    transforms = [
+        (params.get("ignore_title_emojis"), helpers.strip_emojis),
+        (params.get("ignore_title_punctuation"), helpers.strip_punctuation),
+        (params.get("ignore_title_case"), helpers.make_lowercase),
+    ]
+
+    for enabled, transform in transforms:
+        if not enabled:
+            continue
+        for vid_info in videos.values():
+            vid_info.title = transform(vid_info.title)
+        if required_title_words is not None:
+            required_title_words = [transform(word) for word in required_title_words]
+        if banned_title_words is not None:
+            banned_title_words = [transform(word) for word in banned_title_words]
+
+    return required_title_words, banned_title_words
+
+
+def filter_durations(videos: dict, params: dict) -> None:
+    """Rejects videos whose duration is not within the allowed durations.
+    Livestreams and premieres are kept unless they are ignored.
+
+    Args:
+        videos (VideoRecords): Video IDs (keys) and records (values).
+        params (dict): Dictionary of the user-defined parameters.
+
+    Returns:
+        None
+    """
+    min_max_durations = params.get("allowed_durations")
+    if min_max_durations is None:
+        return
+
+    ignore_livestreams = params.get("ignore_livestreams")
+    ignore_premieres = params.get("ignore_premieres")
+
+    for vid_info in videos.values():
+        if vid_info.rejections:
+            continue
+        elif vid_info.live_status == "live" and ignore_livestreams is False:
+            continue
+        elif vid_info.live_status == "upcoming" and ignore_premieres is False:
+            continue
+        elif vid_info.duration == MISSING_DURATION:
+            reject(vid_info, "duration")
+        elif (
+            min_max_durations[0] * 60.0
+            <= vid_info.duration
+            <= min_max_durations[-1] * 60.0
+        ):
+            continue
+        else:
+            reject(vid_info, "duration")
+
+
+def filter_words(
+    videos: dict,
+    key: str,
+    required_words: list[str],
+    banned_words: list[str],
+    reason: str,
+    skip_missing: bool = False,
+) -> None:
+    """Rejects videos not containing any of the required words, or containing any of the banned words.
+
+    Args:
+        videos (VideoRecords): Video IDs (keys) and records (values).
+        key (str): Video information the words are searched in (title, description or tags).
+        required_words (list[str]): Words that must be in the video information (None to disable).
+        banned_words (list[str]): Words that must not be in the video information (None to disable).
+        reason (str): Name of the filter.
+        skip_missing (bool): Determines whether videos without this information are kept.
+
+    Returns:
+        None
+    """
+    if required_words is None and banned_words is None:  # No filtering
+        return
+
+    attribute = FIELDS[key]
+    for vid_info in videos.values():
+        if vid_info.rejections:
+            continue
+        text = getattr(vid_info, attribute)
+        if text is None and skip_missing:
+            continue
+
+        has_required = required_words is None or any(
+            rw in text for rw in required_words
+        )
+        has_banned = banned_words is not None and any(bw in text for bw in banned_words)
+
+        if not has_required or has_banned:
+            reject(vid_info, reason)
+
+
+def filter_flag(videos: dict, key: str, rejected_value: bool, reason: str) -> None:
+    """Rejects videos whose boolean information has the rejected value.
+
+    Args:
+        videos (VideoRecords): Video IDs (keys) and records (values).
+        key (str): Boolean video information (is short, has_paid_ad or made_for_kids).
+        rejected_value (bool): Value of the information for which videos are rejected.
+        reason (str): Name of the filter.
+
+    Returns:
+        None
+    """
+    attribute = FIELDS[key]
+    for vid_info in videos.values():
+        if vid_info.rejections:
+            continue
+        elif bool(getattr(vid_info, attribute)) is rejected_value:
+            reject(vid_info, reason)
+
+
+def filter_duplicates(videos: dict, playlist_content: list[str] | set[str]) -> None:
+    """Rejects videos that are already in the playlist.
+
+    Args:
+        videos (VideoRecords): Video IDs (keys) and records (values).
+        playlist_content (list[str]|set[str]): IDs of the videos saved in the playlist (a set avoids converting it at each call).
+
+    Returns:
+        None
+    """
+    if not isinstance(playlist_content, (set, frozenset)):
+        playlist_content = set(playlist_content)
+
+    for vid_ID, vid_info in videos.items():
+        if not vid_info.rejections and vid_ID in playlist_content:
+            reject(vid_info, "duplicates")
+
+
+def filter_languages(videos: dict, preferred_languages: list[str]) -> None:
+    """Rejects videos not in one of the preferred languages.
+    Videos with an unknown language are kept as a precaution.
+
+    Args:
+        videos (VideoRecords): Video IDs (keys) and records (values).
+        preferred_languages (list[str]): Languages the videos need to be in (None to disable).
+
+    Returns:
+        None
+    """
+    if preferred_languages is None:
+        return
+
+    allowed_languages = set(preferred_languages) | {"unknown"}
+    for vid_info in videos.values():
+        if vid_info.rejections:
+            continue
+        elif vid_info.language not in allowed_languages:
+            reject(vid_info, "language")
+
+
+def filter_quality(videos: dict, params: dict) -> None:
+    """Rejects videos with a definition, dimension, resolution or framerate not matching the user parameters.
+
+    Args:
+        videos (VideoRecords): Video IDs (keys) and records (values).
+        params (dict): Dictionary of the user-defined parameters.
+
+    Returns:
+        None
+    """
+    lowest_definition = params.get("lowest_definition")
+    preferred_dimensions = params.get("preferred_dimensions")
+    lowest_resolution = params.get("lowest_resolution")
+    lowest_framerate = params.get("lowest_framerate")
+
+    if lowest_definition == "HD":
+        for vid_info in videos.values():
+            if not vid_info.rejections and vid_info.definition != "hd":
+                reject(vid_info, "definition")
+
+    if preferred_dimensions is not None:
+        for vid_info in videos.values():
+            if (
+                not vid_info.rejections
+                and vid_info.dimension.upper() not in preferred_dimensions
+            ):
+                reject(vid_info, "dimension")
+
+    if lowest_resolution is not None:
+        min_resolution = int(lowest_resolution.strip().split("p")[0])
+        for vid_info in videos.values():
+            if (
+                not vid_info.rejections
+                and vid_info.resolutions  # Unknown resolutions are kept
+                and max(vid_info.resolutions) < min_resolution
+            ):
+                reject(vid_info, "resolution")
+
+    if lowest_framerate is not None:
+        for vid_info in videos.values():
+            if (
+                not vid_info.rejections
+                and vid_info.framerates  # Unknown framerates are kept
+                and max(vid_info.framerates) < lowest_framerate
+            ):
+                reject(vid_info, "framerate")
+
+
+def filter_captions(videos: dict, captions_options: dict) -> None:
+    """Rejects videos without at least one caption matching the caption options.
+
+    Args:
+        videos (VideoRecords): Video IDs (keys) and records (values).
+        captions_options (dict): Caption properties.
+
+    Returns:
+        None
+    """
+    for vid_info in videos.values():
+        if vid_info.rejections:
+            continue
+
+        captions = vid_info.captions.values()
+
+        # Check that at least one caption is good
+        if not any(
+            all(
+                (
+                    caption["trackKind"] in captions_options.get("trackKind"),
+                    caption["language"] in captions_options.get("languages"),
+                    caption["audioTrackType"] in captions_options.get("audioTrackType"),
+                    caption["status"] in captions_options.get("status"),
+                    caption["isCC"] == captions_options.get("isCC"),
+                    caption["isLarge"] == captions_options.get("isLarge"),
+                    caption["isEasyReader"] == captions_options.get("isEasyReader"),
+                    caption["isAutoSynced"] == captions_options.get("isAutoSynced"),
+                )
+            )
+            for caption in captions
+        ):
+            reject(vid_info, "captions")
+
+
+def filter_threshold(
+    videos: dict, key: str, threshold: int | float, reason: str
+) -> None:
+    """Rejects videos whose statistic is below a threshold.
+
+    Args:
+        videos (VideoRecords): Video IDs (keys) and records (values).
+        key (str): Statistic (one of THRESHOLD_FILTERS, e.g. views or views_per_hour).
+        threshold (int|float): Minimum value of the statistic (0 or None to disable).
+        reason (str): Name of the filter.
+
+    Returns:
+        None
+    """
+    if not threshold:
+        return
+
+    attribute = FIELDS[key]
+    for vid_info in videos.values():
+        if vid_info.rejections:
+            continue
+        value = getattr(vid_info, attribute)
+        if value is None or value < threshold:
+            reject(vid_info, reason)
+
+
+def apply_filters(
+    videos: dict,
+    params: dict,
+    playlist_content: list[str] = None,
+    metrics=None,
+    route: str = None,
+) -> None:
+    """Applies every filter enabled in the user parameters to the videos, in place.
+    Videos are rejected by the first filter they fail.
+
+    Args:
+        videos (VideoRecords): Video IDs (keys) and records (values).
+        params (dict): Dictionary of the user-defined parameters.
+        playlist_content (list[str]): IDs of the videos saved in the playlist (needed unless duplicates are kept).
+        metrics (Metrics): Instrumentation timing each filter and counting the videos it lets through (optional).
+        route (str): Name of the rule set the parameters belong to, for the metrics (optional).
+
+    Returns:
+        None
+    """
+
+    def step(name, func, *args, **kwargs):
+        if metrics is None:
+            func(videos, *args, **kwargs)
+        else:
+            with metrics.filter(name, videos, route):
+                func(videos, *args, **kwargs)
+
+    required_title_words, banned_title_words = prepare_titles(videos, params)
+
+    step("duration", filter_durations, params)
+    step(
+        "title",
+        filter_words,
+        "title",
+        required_title_words,
+        banned_title_words,
+        "title",
+    )
+
+    if params["keep_shorts"] is False:
+        step("shorts", filter_flag, "is short", True, "shorts")
+
+    if params["keep_duplicates"] is False:
+        step("duplicates", filter_duplicates, playlist_content)
+
+    if params["allow_paid_promotions"] is False:
+        step("paid promotion", filter_flag, "has_paid_ad", True, "paid promotion")
+
+    if params["only_made_for_kids"] is True:
+        step("made for kids", filter_flag, "made_for_kids", False, "made for kids")
+
+    step("language", filter_languages, params.get("preferred_languages"))
+    step("quality", filter_quality, params)
+
+    step(
+        "description",
+        filter_words,
+        "description",
+        params.get("required_in_description"),
+        params.get("banned_in_description"),
+        "description",
+        skip_missing=True,
+    )
+    step(
+        "tags",
+        filter_words,
+        "tags",
+        params.get("required_tags"),
+        params.get("banned_tags"),
+        "tags",
+        skip_missing=True,
+    )
+
+    if params["require_captions"]:
+        step("captions", filter_captions, params.get("caption_options"))
+
+    apply_threshold_filters(videos, params, metrics, route)
+
+
+def apply_threshold_filters(
+    videos: dict,
+    params: dict,
+    metrics=None,
+    route: str = None,
+) -> None:
+    """Applies the statistics thresholds of the user parameters to the videos, in place.
+    They are the last filters, so that they can be applied again once the statistics are refreshed.
+
+    Args:
+        videos (VideoRecords): Video IDs (keys) and records (values).
+        params (dict): Dictionary of the user-defined parameters.
+        metrics (Metrics): Instrumentation timing each filter and counting the videos it lets through (optional).
+        route (str): Name of the rule set the parameters belong to, for the metrics (optional).
+
+    Returns:
+        None
+    """
+    for key, param, reason in THRESHOLD_FILTERS:
+        if metrics is None:
+            filter_threshold(videos, key, params.get(param), reason)
+        else:
+            with metrics.filter(reason, videos, route):
+                filter_threshold(videos, key, params.get(param), reason)
@@ -1,15 +1,31 @@
+import os
 import re
 import string
-import sys
 import time
 
 from googleapiclient.errors import HttpError
 from colorama import Fore, Style
 
 
+class QTubeError(Exception):
+    """Base class of the errors stopping a QTube run."""
+
+
+class InvalidParamsError(QTubeError):
+    """Raised when the user-defined parameters cannot be used."""
+
+
+class QuotaExceededError(QTubeError):
+    """Raised when the YT API quota limit has been reached."""
+
+
+class APIError(QTubeError):
+    """Raised when a YT API query still fails after every retry."""
+
+
 def handle_http_errors(verbosity: list[str], fancy, func, *args, **kwargs):
     """Handles http errors when making API queries.
-    If after 5 tries, the function could not be executed, it shuts the program down.
+    If after 5 tries, the function could not be executed, an APIError is raised.
 
     Args:
         verbosity (list[str]): User defined verbosity.
@@ -36,7 +52,8 @@ def handle_http_errors(verbosity: list[str], fancy, func, *args, **kwargs):
             return res  # Return the response if no error occurs
         except HttpError as err:
             if (
-                func.__name__ == "get_recent_videos" and err.status_code == 404
+                func.__name__ in ["get_recent_videos", "get_videos_page"]
+                and err.status_code == 404
             ):  # Channel has no videos
                 return "ignore"  # Ignore this channel in the main code
             elif (
@@ -46,10 +63,9 @@ def handle_http_errors(verbosity: list[str], fancy, func, *args, **kwargs):
                 )
                 and err.status_code == 403
             ):  # Quota limit exceeded, the program cannot continue
-                print(
+                raise QuotaExceededError(
                     "The quota limit has been reached, please try again later. Check your usage at the following urls: \nUsed quota: https://console.cloud.google.com/iam-admin/quotas?pageState=(%22allQuotasTable%22:(%22c%22:%5B%22displayDimensions%22,%22serviceName%22,%22metricName%22,%22limitName%22,%22monitoredResource%22%5D)) \nCalls made: https://console.cloud.google.com/apis/dashboard"
-                )
-                sys.exit()
+                ) from err
             else:  # General case
                 print(
                     f"During the execution of function {func.__name__}, error {err.status_code} occured: {err.reason}"
@@ -58,11 +74,26 @@ def handle_http_errors(verbosity: list[str], fancy, func, *args, **kwargs):
                     f"Retrying in {t} seconds. This was attempt number {i+1} out of 5."
                 )
                 time.sleep(t)
-        if t == 4:
-            print(
-                f"Function {func.__name__} could not be executed after 5 tries. Please check your internet connection, Youtube's API status and retry later."
-            )
-            sys.exit()  # Exit the program after 5 retries
+
+    raise APIError(
+        f"Function {func.__name__} could not be executed after 5 tries. Please check your internet connection, Youtube's API status and retry later."
+    )
+
+
+def get_cache_dir() -> str:
+    """Retrieves the directory where QTube keeps its cache files, and creates it if needed.
+    The QTUBE_CACHE_DIR environment variable takes precedence over the XDG cache directory.
+
+    Returns:
+        cache_dir (str): Path of the cache directory.
+    """
+    cache_dir = os.environ.get("QTUBE_CACHE_DIR") or os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+        "qtube",
+    )
+    os.makedirs(cache_dir, exist_ok=True)
+
+    return cache_dir
 
 
 def fancify_text(text, color, style, emoji) -> str:
@@ -0,0 +1,409 @@
+import contextlib
+import json
+import os
+import threading
+import time
+
+from collections import Counter, defaultdict
+
+from googleapiclient.errors import HttpError
+
+# Upper bounds, in seconds, of the API latency histogram buckets
+LATENCY_BUCKETS = [0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+
+def get_percentile(values: list[float], percentile: float) -> float | None:
+    """Computes a percentile of values, by nearest rank.
+
+    Args:
+        values (list[float]): Values, in any order.
+        percentile (float): Wanted percentile, between 0 and 100.
+
+    Returns:
+        (float|None): Percentile of the values, None if there are none.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(percentile / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class Metrics:
+    """Instrumentation of a QTube run.
+
+    It records:
+        - the wall and CPU time spent in each stage of the run (see the stage method),
+        - the latency of the YT API calls, per method, as it is used as a middleware
+          (see QTube.utils.youtube.resource), along with the retries and errors,
+        - the number of videos going in and out of each filter (see the filter method),
+        - the time requests waited for the rate limits, per destination (see the throttle method),
+        - the requests sent twice or timed out, per method (see the hedge method).
+
+    Args:
+        profiler (StageProfiler): Profiler each stage is run under (optional, see QTube.utils.profiling).
+    """
+
+    def __init__(self, profiler=None):
+        self.profiler = profiler
+        self.stages = {}
+        self.latencies = defaultdict(list)
+        self.retries = Counter()
+        self.errors = Counter()
+        self.filters = {}
+        self.throttling = {}
+        self.hedging = Counter()
+        self._lock = threading.Lock()
+
+    def __call__(self, request, execute):
+        method_ID = request.method_ID
+
+        # googleapiclient sleeps before each of its retries
+        wrapped_request = request.request
+        sleep = getattr(wrapped_request, "_sleep", None)
+        if sleep is not None and not hasattr(sleep, "counted_by"):
+
+            def counting_sleep(seconds):
+                with self._lock:
+                    self.retries[method_ID] += 1
+                sleep(seconds)
+
+            counting_sleep.counted_by = self
+            wrapped_request._sleep = counting_sleep
+
+        start = time.perf_counter()
+        try:
+            return execute()
+        except HttpError as err:
+            with self._lock:
+                self.errors[(method_ID, err.status_code)] += 1
+            raise
+        finally:
+            latency = time.perf_counter() - start
+            with self._lock:
+                self.latencies[method_ID].append(latency)
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """Context manager adding the wall and CPU time spent in its block to a stage.
+        The CPU time is the one of the calling thread.
+
+        Args:
+            name (str): Name of the stage.
+        """
+        profile = (
+            self.profiler.profile(name)
+            if self.profiler is not None
+            else contextlib.nullcontext()
+        )
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        try:
+            with profile:
+                yield
+        finally:
+            wall, cpu = (
+                time.perf_counter() - wall_start,
+                time.thread_time() - cpu_start,
+            )
+            with self._lock:
+                stage = self.stages.setdefault(
+                    name, {"wall_s": 0.0, "cpu_s": 0.0, "count": 0}
+                )
+                stage["wall_s"] += wall
+                stage["cpu_s"] += cpu
+                stage["count"] += 1
+
+    @contextlib.contextmanager
+    def filter(self, name: str, videos: dict, route: str = None):
+        """Context manager timing a filter (as the "filter *name*" stage) and counting the videos it lets through.
+
+        Args:
+            name (str): Name of the filter.
+            videos (VideoRecords): Video IDs (keys) and records (values) the filter is applied to.
+            route (str): Name of the rule set the filter belongs to (optional).
+        """
+        videos_in = sum(not vid_info.rejections for vid_info in videos.values())
+        with self.stage(f"filter {name}"):
+            yield
+        videos_out = sum(not vid_info.rejections for vid_info in videos.values())
+
+        with self._lock:
+            counts = self.filters.setdefault((route, name), {"in": 0, "out": 0})
+            counts["in"] += videos_in
+            counts["out"] += videos_out
+
+    def throttle(self, destination: str, seconds: float) -> None:
+        """Counts a request let through by the rate limits (see QTube.utils.ratelimit) and the time it waited.
+
+        Args:
+            destination (str): Destination of the request (api or web).
+            seconds (float): Time the request waited, in seconds.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            counts = self.throttling.setdefault(
+                destination, {"requests": 0, "throttled": 0, "wait_s": 0.0}
+            )
+            counts["requests"] += 1
+            counts["throttled"] += seconds > 0
+            counts["wait_s"] += seconds
+
+    def hedge(self, method_ID: str, outcome: str) -> None:
+        """Counts a hedged request outcome (see QTube.utils.youtube.hedging).
+
+        Args:
+            method_ID (str): Method identifier (collection.method, e.g. videos.list).
+            outcome (str): duplicates (request sent twice), duplicate_wins (duplicate answering first) or timeouts.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self.hedging[(method_ID, outcome)] += 1
+
+    def get_latencies(self, method_ID: str) -> list[float]:
+        """Retrieves the latencies recorded for a method.
+
+        Args:
+            method_ID (str): Method identifier (collection.method, e.g. videos.list).
+
+        Returns:
+            (list[float]): Latencies of the calls of the method, in seconds.
+        """
+        with self._lock:
+            return list(self.latencies.get(method_ID, []))
+
+    @property
+    def timings(self) -> dict:
+        """Stage names (keys) and wall times in seconds (values)."""
+        with self._lock:
+            return {name: stage["wall_s"] for name, stage in self.stages.items()}
+
+    def to_dict(self) -> dict:
+        """Summarizes the recorded metrics.
+
+        Returns:
+            (dict): Stages, API calls (count, latency percentiles and histogram, retries, errors and hedged requests per method), filters and rate limit waits.
+        """
+        with self._lock:
+            api = {}
+            for method_ID, latencies in sorted(self.latencies.items()):
+                api[method_ID] = {
+                    "calls": len(latencies),
+                    "latency_s": {
+                        "sum": sum(latencies),
+                        "p50": get_percentile(latencies, 50),
+                        "p95": get_percentile(latencies, 95),
+                        "max": max(latencies),
+                    },
+                    "histogram": {
+                        str(bound): sum(latency <= bound for latency in latencies)
+                        for bound in LATENCY_BUCKETS
+                    },
+                    "retries": self.retries[method_ID],
+                    "hedging": {
+                        outcome: self.hedging[(method_ID, outcome)]
+                        for outcome in ["duplicates", "duplicate_wins", "timeouts"]
+                    },
+                    "errors": {
+                        str(status): count
+                        for (error_method, status), count in self.errors.items()
+                        if error_method == method_ID
+                    },
+                }
+
+            return {
+                "stages": {name: dict(stage) for name, stage in self.stages.items()},
+                "api": api,
+                "filters": [
+                    {"route": route, "filter": name, **counts}
+                    for (route, name), counts in self.filters.items()
+                ],
+                "throttling": {
+                    destination: dict(counts)
+                    for destination, counts in self.throttling.items()
+                },
+            }
+
+
+def write_atomically(path: str, text: str) -> None:
+    """Writes a file through a temporary file, so that readers never see it half written.
+
+    Args:
+        path (str): Path of the file.
+        text (str): Content of the file.
+
+    Returns:
+        None
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def write_json_report(report: dict, path: str) -> None:
+    """Writes a run report (see RunResult.report) as JSON.
+
+    Args:
+        report (dict): Run report.
+        path (str): Path of the JSON file.
+
+    Returns:
+        None
+    """
+    write_atomically(path, json.dumps(report, indent=4, default=str))
+
+
+def format_labels(**labels) -> str:
+    """Formats the labels of a Prometheus sample, escaping their values.
+
+    Args:
+        labels (any): Label names (keywords) and values.
+
+    Returns:
+        (str): Labels in the Prometheus text format (e.g. {route="main"}), empty if there are none.
+    """
+    if not labels:
+        return ""
+    escaped = {
+        k: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        for k, v in labels.items()
+    }
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped.items()) + "}"
+
+
+def write_prometheus_textfile(report: dict, path: str) -> None:
+    """Writes a run report (see RunResult.report) in the Prometheus text format, for the node_exporter textfile collector.
+
+    Args:
+        report (dict): Run report.
+        path (str): Path of the .prom file, in the collector's directory.
+
+    Returns:
+        None
+    """
+    lines = []
+
+    def metric(name: str, kind: str, description: str, samples: list[tuple]):
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+        for suffix, labels, value in samples:
+            lines.append(f"{name}{suffix}{format_labels(**labels)} {value}")
+
+    metric(
+        "qtube_last_run_timestamp_seconds",
+        "gauge",
+        "Time the last run ended at.",
+        [("", {}, report["timestamp"])],
+    )
+    metric(
+        "qtube_quota_used",
+        "gauge",
+        "YT API quota units used by the last run.",
+        [("", {}, report["quota_used"])],
+    )
+    metric(
+        "qtube_videos",
+        "gauge",
+        "Videos added and rejected by the last run, per rule set.",
+        [
+            ("", {"route": route["name"], "outcome": outcome}, route[outcome])
+            for route in report["routes"]
+            for outcome in ["added", "rejected"]
+        ],
+    )
+    metric(
+        "qtube_stage_wall_seconds",
+        "gauge",
+        "Wall time spent in each stage of the last run.",
+        [
+            ("", {"stage": name}, stage["wall_s"])
+            for name, stage in report["stages"].items()
+        ],
+    )
+    metric(
+        "qtube_stage_cpu_seconds",
+        "gauge",
+        "CPU time spent in each stage of the last run.",
+        [
+            ("", {"stage": name}, stage["cpu_s"])
+            for name, stage in report["stages"].items()
+        ],
+    )
+
+    histogram_samples = []
+    for method_ID, api in report["api"].items():
+        for bound, count in api["histogram"].items():
+            histogram_samples.append(
+                ("_bucket", {"method": method_ID, "le": bound}, count)
+            )
+        histogram_samples.append(
+            ("_bucket", {"method": method_ID, "le": "+Inf"}, api["calls"])
+        )
+        histogram_samples.append(
+            ("_sum", {"method": method_ID}, api["latency_s"]["sum"])
+        )
+        histogram_samples.append(("_count", {"method": method_ID}, api["calls"]))
+    metric(
+        "qtube_api_request_duration_seconds",
+        "histogram",
+        "Latency of the YT API calls of the last run, per method.",
+        histogram_samples,
+    )
+    metric(
+        "qtube_api_retries",
+        "gauge",
+        "Retries of the YT API calls of the last run, per method.",
+        [("", {"method": m}, api["retries"]) for m, api in report["api"].items()],
+    )
+    metric(
+        "qtube_api_errors",
+        "gauge",
+        "Failed YT API calls of the last run, per method and HTTP status.",
+        [
+            ("", {"method": m, "status": status}, count)
+            for m, api in report["api"].items()
+            for status, count in api["errors"].items()
+        ],
+    )
+    metric(
+        "qtube_api_hedging",
+        "gauge",
+        "YT API requests of the last run sent twice, answered first by their duplicate, or timed out, per method.",
+        [
+            ("", {"method": m, "outcome": outcome}, count)
+            for m, api in report["api"].items()
+            for outcome, count in api["hedging"].items()
+        ],
+    )
+    metric(
+        "qtube_filter_videos",
+        "gauge",
+        "Videos going in and out of each filter in the last run.",
+        [
+            (
+                "",
+                {"route": f["route"] or "", "filter": f["filter"], "direction": d},
+                f[d],
+            )
+            for f in report["filters"]
+            for d in ["in", "out"]
+        ],
+    )
+
+    metric(
+        "qtube_throttle_wait_seconds",
+        "gauge",
+        "Time the requests of the last run waited for the rate limits, per destination.",
+        [
+            ("", {"destination": destination}, counts["wait_s"])
+            for destination, counts in report["throttling"].items()
+        ],
+    )
+
+    write_atomically(path, "\n".join(lines) + "\n")
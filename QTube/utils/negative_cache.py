@@ -0,0 +1,202 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from QTube.utils import helpers
+from QTube.utils.youtube.videos import MISSING_DURATION
+
+# Rejection reasons that are cached, and the user parameters the rejection depends on
+REJECTION_PARAMS = {
+    "duration": ["allowed_durations", "ignore_livestreams", "ignore_premieres"],
+    "title": [
+        "required_in_title",
+        "banned_in_title",
+        "ignore_title_emojis",
+        "ignore_title_punctuation",
+        "ignore_title_case",
+    ],
+    "shorts": ["keep_shorts"],
+    "paid promotion": ["allow_paid_promotions"],
+    "made for kids": ["only_made_for_kids"],
+    "language": ["preferred_languages"],
+    "definition": ["lowest_definition"],
+    "dimension": ["preferred_dimensions"],
+    "resolution": ["lowest_resolution"],
+    "framerate": ["lowest_framerate"],
+    "description": ["required_in_description", "banned_in_description"],
+    "tags": ["required_tags", "banned_tags"],
+    "captions": ["require_captions", "caption_options"],
+    "views": ["views_threshold"],
+    "likes": ["likes_threshold"],
+    "comments": ["comments_threshold"],
+    "likes/views ratio": ["likes_to_views_ratio"],
+    "comments/views ratio": ["comments_to_views_ratio"],
+    "views/hour": ["views_per_hour_threshold"],
+    "views growth": ["views_growth_threshold"],
+}
+
+# Rejections based on information that changes (in seconds, how long they are kept): counts
+# grow, captions are generated and higher qualities are processed hours after the upload
+EXPIRING_REJECTIONS = {
+    "definition": 6 * 3600.0,
+    "resolution": 6 * 3600.0,
+    "framerate": 6 * 3600.0,
+    "captions": 6 * 3600.0,
+    "views": 3600.0,
+    "likes": 3600.0,
+    "comments": 3600.0,
+    "likes/views ratio": 3600.0,
+    "comments/views ratio": 3600.0,
+    "views/hour": 3600.0,
+    "views growth": 3600.0,
+}
+
+# How long the other rejections are kept, in seconds (the longest named run frequency)
+PERMANENT_TTL = 31 * 86400.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rejections (
+    video_id TEXT NOT NULL,
+    reason TEXT NOT NULL,
+    params_hash TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (video_id, reason, params_hash)
+) WITHOUT ROWID
+"""
+
+
+class NegativeCache:
+    """Persistent cache of the videos rejected by the filters, in a SQLite database.
+
+    A video rejected in a run would be rejected again in the next ones while it stays in the
+    upload date window, after its details were retrieved and it was enriched again. Rejections
+    are stored with a hash of the parameters they depend on (see REJECTION_PARAMS), so that
+    changing a filter only invalidates its own rejections, and the videos every rule set
+    rejected are rejected again before their details are retrieved.
+
+    Rejections based on information that changes expire (see EXPIRING_REJECTIONS), as do
+    the duration rejections of videos without duration (livestreams and premieres). Rejections
+    that do not depend on the video alone (upload date, channel name, duplicates, ...) are not
+    cached.
+
+    Args:
+        path (str): Path of the database file (rejections.sqlite3 in the QTube cache directory if None).
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or os.path.join(helpers.get_cache_dir(), "rejections.sqlite3")
+        self.hits = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+
+        with self._lock, self._connection:
+            self._connection.execute(_SCHEMA)
+            self._connection.execute(
+                "DELETE FROM rejections WHERE expires_at < ?", (time.time(),)
+            )
+
+    @staticmethod
+    def get_params_hash(params: dict, reason: str) -> str:
+        """Hashes the user parameters a rejection depends on.
+
+        Args:
+            params (dict): Dictionary of the user-defined parameters.
+            reason (str): Rejection reason (one of REJECTION_PARAMS).
+
+        Returns:
+            (str): Hash of the parameters.
+        """
+        values = [params.get(param) for param in REJECTION_PARAMS[reason]]
+        return hashlib.sha256(json.dumps(values).encode("utf-8")).hexdigest()[:16]
+
+    def get_rejections(
+        self, video_IDs: list[str], rule_sets: list[dict]
+    ) -> dict[str, list[str]]:
+        """Retrieves the videos rejected by every rule set in a previous run.
+
+        Args:
+            video_IDs (list[str]): List of video IDs.
+            rule_sets (list[dict]): Complete parameters of each rule set.
+
+        Returns:
+            rejections (dict[str, list[str]]): Video IDs (keys) and reason each rule set rejected them for (values).
+        """
+        if not video_IDs:
+            return {}
+
+        placeholders = ",".join("?" * len(video_IDs))
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT video_id, reason, params_hash FROM rejections WHERE video_id IN ({placeholders}) AND expires_at >= ?",
+                [*video_IDs, time.time()],
+            ).fetchall()
+
+        stored = {}
+        for video_ID, reason, params_hash in rows:
+            stored.setdefault(video_ID, set()).add((reason, params_hash))
+
+        rejections = {}
+        for video_ID, entries in stored.items():
+            reasons = [
+                next(
+                    (
+                        reason
+                        for reason, params_hash in entries
+                        if params_hash == self.get_params_hash(rule_set, reason)
+                    ),
+                    None,
+                )
+                for rule_set in rule_sets
+            ]
+            if None not in reasons:
+                rejections[video_ID] = reasons
+
+        with self._lock:
+            self.hits += len(rejections)
+        return rejections
+
+    def add_rejections(self, videos: dict, params: dict) -> None:
+        """Stores the rejections of videos that can be cached.
+
+        Args:
+            videos (VideoRecords): Video IDs (keys) and records (values), filtered with the parameters.
+            params (dict): Dictionary of the user-defined parameters of the filters.
+
+        Returns:
+            None
+        """
+        now = time.time()
+        rows = []
+        for video_ID, vid_info in videos.items():
+            reason = vid_info.rejected_by
+            if reason not in REJECTION_PARAMS:
+                continue
+
+            ttl = EXPIRING_REJECTIONS.get(reason, PERMANENT_TTL)
+            if (
+                reason == "duration"
+                and getattr(vid_info, "duration", None) == MISSING_DURATION
+            ):
+                ttl = 3600.0  # Livestreams and premieres get a duration once they end
+            rows.append(
+                (video_ID, reason, self.get_params_hash(params, reason), now + ttl)
+            )
+
+        if rows:
+            with self._lock, self._connection:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO rejections VALUES (?, ?, ?, ?)", rows
+                )
+
+    def clear(self) -> None:
+        """Empties the cache."""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM rejections")
+
+    def close(self) -> None:
+        """Closes the database."""
+        with self._lock:
+            self._connection.close()
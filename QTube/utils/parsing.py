@@ -3,6 +3,26 @@ import json
 import re
 
 
+# Options controlling how the software runs, which are not user parameters
+RUNTIME_OPTIONS = [
+    "command",
+    "since",
+    "fake_api",
+    "report",
+    "prometheus",
+    "profile",
+    "record",
+    "replay",
+    "no_video_store",
+    "no_http_cache",
+    "no_negative_cache",
+    "pending_horizon",
+    "no_snapshots",
+    "deadline",
+    "no_channel_priorities",
+]
+
+
 def parse_arguments() -> dict:
     """Parses command line arguments.
 
@@ -16,7 +36,15 @@ def parse_arguments() -> dict:
         prog="QTube",
         description="Automatically add Youtube videos to a playlist.",
         epilog="For more information, check out the Github repo at https://github.com/Killian42/QTube.",
-        usage="python qtube.py [options] or qtube [options]",
+        usage="python qtube.py [options] or qtube [options] or qtube backfill --since DATE [options]",
+    )
+
+    parser.add_argument(
+        "command",
+        nargs="?",
+        choices=["run", "backfill"],
+        default="run",
+        help="run adds the videos of the run frequency timeframe, backfill the videos uploaded since the --since date, resuming an interrupted backfill. Default: run",
     )
 
     parser.add_argument(
@@ -257,6 +285,22 @@ def parse_arguments() -> dict:
         help="Minimum ratio of comments to views. Default: 0",
     )
 
+    parser.add_argument(
+        "-vph",
+        "--views_per_hour_threshold",
+        metavar="",
+        type=float,
+        help="Minimum number of views per hour since the upload. Default: None",
+    )
+
+    parser.add_argument(
+        "-vgt",
+        "--views_growth_threshold",
+        metavar="",
+        type=float,
+        help="Minimum number of views per hour since the previous run. Default: None",
+    )
+
     parser.add_argument(
         "-rf",
         "--run_frequency",
@@ -319,6 +363,88 @@ def parse_arguments() -> dict:
         help="Controls how much information is shown in the terminal. Default: None",
     )
 
+    parser.add_argument(
+        "--fake_api",
+        metavar="",
+        type=int,
+        help="Runs against a fake Youtube API with this number of synthetic subscribed channels, for load testing (no credentials needed). Default: None",
+    )
+
+    parser.add_argument(
+        "--report",
+        metavar="",
+        help="Path of the JSON report written at the end of the run (stage timings, API latencies, retries and filter counts). Default: None",
+    )
+    parser.add_argument(
+        "--prometheus",
+        metavar="",
+        help="Path of the Prometheus textfile (.prom) written at the end of the run, for the node_exporter textfile collector. Default: None",
+    )
+
+    parser.add_argument(
+        "--profile",
+        metavar="",
+        nargs="?",
+        const="profile",
+        help="Profiles each stage of the run with cProfile and tracemalloc, writing .pstats files and top allocations reports to this directory, and prints the hottest functions. Default directory: profile",
+    )
+
+    parser.add_argument(
+        "--record",
+        metavar="",
+        help="Path of a cassette file (JSON, gzipped if it ends with .gz) saving every API response, redirection probe and pytube stream list of the run. Default: None",
+    )
+    parser.add_argument(
+        "--replay",
+        metavar="",
+        help="Path of a cassette file to replay the run from, without any network access or quota cost. Default: None",
+    )
+
+    parser.add_argument(
+        "--no_video_store",
+        action="store_true",
+        help="Disables the video details store kept between runs in the cache directory (it is not used when recording or replaying a run). Default: False",
+    )
+    parser.add_argument(
+        "--no_http_cache",
+        action="store_true",
+        help="Disables the cache of the subscriptions and playlists responses, revalidated with their ETags, kept in the cache directory. Default: False",
+    )
+    parser.add_argument(
+        "--no_negative_cache",
+        action="store_true",
+        help="Disables the cache of the videos rejected by previous runs, which are otherwise not evaluated again (it is not used when recording or replaying a run). Default: False",
+    )
+    parser.add_argument(
+        "--pending_horizon",
+        metavar="",
+        type=float,
+        default=7.0,
+        help="Number of days after their upload during which videos rejected for their statistics only are evaluated again by the next runs (0 to disable it, it is not used when recording or replaying a run). Default: 7",
+    )
+    parser.add_argument(
+        "--since",
+        metavar="",
+        type=str,
+        help="Date (YYYY-MM-DD) the backfill command retrieves the videos from. Default: None",
+    )
+    parser.add_argument(
+        "--deadline",
+        metavar="",
+        type=float,
+        help="Time budget of the run, in seconds. As it runs out, channels and optional checks (shorts, resolutions, framerates, captions) are skipped, keeping the time to add the selected videos. Default: None",
+    )
+    parser.add_argument(
+        "--no_snapshots",
+        action="store_true",
+        help="Disables the snapshots of the video statistics kept in the cache directory, which the views growth filter compares the statistics to (they are not used when recording or replaying a run). Default: False",
+    )
+    parser.add_argument(
+        "--no_channel_priorities",
+        action="store_true",
+        help="Disables the acceptance rates of the channels kept in the cache directory, which order the channels along with the channel_priorities parameter (they are not used when recording or replaying a run). Default: False",
+    )
+
     return vars(parser.parse_args())
 
 
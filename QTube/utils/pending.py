@@ -0,0 +1,178 @@
+import datetime as dt
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from QTube.utils import helpers
+from QTube.utils.filters import THRESHOLD_FILTERS
+from QTube.utils.records import VideoRecord, VideoRecords
+
+# Rejection reasons of the videos that are evaluated again later
+STATISTICS_REASONS = [reason for _, _, reason in THRESHOLD_FILTERS]
+
+# Time after their upload during which videos are evaluated again, in seconds
+HORIZON = 7 * 86400.0
+
+# Delays between two evaluations of a video, in seconds (doubling from the first to the last)
+FIRST_DELAY = 3600.0
+MAX_DELAY = 86400.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pending (
+    route TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    next_check REAL NOT NULL,
+    attempts INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    record TEXT NOT NULL,
+    PRIMARY KEY (route, video_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS pending_next_check ON pending (next_check);
+"""
+
+
+class PendingQueue:
+    """Persistent priority queue of the videos rejected for their statistics only, in a SQLite database.
+
+    Videos uploaded shortly before a run have not gathered views yet, so they fail the statistics
+    thresholds and may leave the upload date window before they would pass them. Such videos are
+    queued, per rule set, with the time of their next evaluation, which is delayed further after
+    each failed one (from FIRST_DELAY up to MAX_DELAY). They are evaluated again by the next runs
+    once due, only their statistics being retrieved, until they pass or the horizon after their
+    upload is reached.
+
+    Args:
+        path (str): Path of the database file (pending.sqlite3 in the QTube cache directory if None).
+        horizon (float): Time after their upload during which videos are evaluated again, in seconds.
+    """
+
+    def __init__(self, path: str = None, horizon: float = HORIZON):
+        self.path = path or os.path.join(helpers.get_cache_dir(), "pending.sqlite3")
+        self.horizon = horizon
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+
+        with self._lock, self._connection:
+            self._connection.executescript(_SCHEMA)
+            self._connection.execute(
+                "DELETE FROM pending WHERE expires_at < ?", (time.time(),)
+            )
+
+    def update(self, route: str, videos: dict) -> None:
+        """Queues the videos of a rule set rejected for their statistics only, and removes the other evaluated ones.
+        Queued videos failing again are evaluated later than the previous time. Videos rejected
+        by the deadline of the run were not evaluated, so they are left as they are.
+
+        Args:
+            route (str): Name of the rule set.
+            videos (VideoRecords): Video IDs (keys) and records (values) filtered with the rule set.
+
+        Returns:
+            None
+        """
+        now = time.time()
+        pending, evaluated = {}, []
+        for vid_ID, vid_info in videos.items():
+            reason = vid_info.rejected_by
+            if reason in STATISTICS_REASONS:
+                expires_at = vid_info.upload_datetime.timestamp() + self.horizon
+                if expires_at > now:
+                    pending[vid_ID] = (vid_info, expires_at)
+                    continue
+            # Videos rejected before being evaluated keep their place in the queue
+            if reason not in ["upload date", "channel name", "deadline"]:
+                evaluated.append(vid_ID)
+
+        with self._lock, self._connection:
+            # Number of evaluations the videos already failed
+            attempts = dict.fromkeys(pending, 0)
+            attempts.update(
+                (vid_ID, count + 1)
+                for vid_ID, count in self._connection.execute(
+                    f"SELECT video_id, attempts FROM pending WHERE route = ? AND video_id IN ({','.join('?' * len(pending))})",
+                    [route, *pending],
+                )
+            )
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO pending VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        route,
+                        vid_ID,
+                        now + min(FIRST_DELAY * 2 ** attempts[vid_ID], MAX_DELAY),
+                        attempts[vid_ID],
+                        expires_at,
+                        json.dumps(
+                            {
+                                "title": vid_info.original_title,
+                                "channel name": vid_info.channel_name,
+                                "upload playlist": vid_info.upload_playlist,
+                                "upload datetime": vid_info.upload_datetime.isoformat(),
+                            }
+                        ),
+                    )
+                    for vid_ID, (vid_info, expires_at) in pending.items()
+                ],
+            )
+            self._connection.executemany(
+                "DELETE FROM pending WHERE route = ? AND video_id = ?",
+                [(route, vid_ID) for vid_ID in evaluated],
+            )
+
+    def get_due(self, routes: list[str]) -> dict[str, dict]:
+        """Retrieves the queued videos due for an evaluation, the longest due first.
+
+        Args:
+            routes (list[str]): Names of the rule sets.
+
+        Returns:
+            due (dict[str, VideoRecords]): Names of the rule sets (keys) and records of their due videos (values).
+        """
+        now = time.time()
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT route, video_id, record FROM pending WHERE next_check <= ? AND expires_at > ? ORDER BY next_check",
+                (now, now),
+            ).fetchall()
+
+        due = {route: VideoRecords() for route in routes}
+        for route, vid_ID, record in rows:
+            if route not in due:
+                continue
+            record = json.loads(record)
+            due[route][vid_ID] = VideoRecord(
+                title=record["title"],
+                original_title=record["title"],
+                channel_name=record["channel name"],
+                upload_playlist=record["upload playlist"],
+                upload_datetime=dt.datetime.fromisoformat(record["upload datetime"]),
+            )
+        return due
+
+    def remove(self, route: str, video_IDs: list[str]) -> None:
+        """Removes videos of a rule set from the queue.
+
+        Args:
+            route (str): Name of the rule set.
+            video_IDs (list[str]): List of video IDs.
+
+        Returns:
+            None
+        """
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "DELETE FROM pending WHERE route = ? AND video_id = ?",
+                [(route, vid_ID) for vid_ID in video_IDs],
+            )
+
+    def clear(self) -> None:
+        """Empties the queue."""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM pending")
+
+    def close(self) -> None:
+        """Closes the database."""
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,158 @@
+import os
+import sqlite3
+import threading
+
+from QTube.utils import helpers
+
+# Weight of the channels without a configured priority
+DEFAULT_WEIGHT = 1.0
+
+# Prior of the acceptance rates (accepted videos out of evaluated ones) of the channels
+# without history, so that they are tried before the channels whose videos are rejected
+PRIOR_ACCEPTED = 1.0
+PRIOR_EVALUATED = 2.0
+
+# Weight of the previous counts of a channel at each update, so that its rate follows its recent videos
+DECAY = 0.9
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS channels (
+    channel_id TEXT PRIMARY KEY,
+    evaluated REAL NOT NULL,
+    accepted REAL NOT NULL
+) WITHOUT ROWID
+"""
+
+
+def get_configured_weights(rule_sets: list[dict]) -> dict[str, float]:
+    """Merges the channel priorities of the rule sets, keeping the highest weight of each channel.
+
+    Args:
+        rule_sets (list[dict]): Complete parameters of each rule set.
+
+    Returns:
+        weights (dict[str, float]): Channel names (keys) and weights (values).
+    """
+    weights = {}
+    for rule_set in rule_sets:
+        for ch_name, weight in (rule_set.get("channel_priorities") or {}).items():
+            weights[ch_name] = max(weight, weights.get(ch_name, weight))
+    return weights
+
+
+def order_channels(
+    channels_info: dict, weights: dict, rates: dict = None
+) -> dict[str, str]:
+    """Orders channels by decreasing priority, the weight of a channel times its acceptance rate.
+    Channels with the same priority keep their order.
+
+    Args:
+        channels_info (dict): Dictionary of channel names (keys) and channel IDs (values).
+        weights (dict): Channel names (keys) and configured weights (values), DEFAULT_WEIGHT for the other channels.
+        rates (dict): Channel IDs (keys) and acceptance rates (values), 1 for every channel if None (see ChannelPriorities).
+
+    Returns:
+        (dict): Dictionary of channel names (keys) and channel IDs (values), highest priority first.
+    """
+    if not weights and rates is None:
+        return channels_info
+
+    def priority(item: tuple[str, str]) -> float:
+        ch_name, ch_ID = item
+        rate = 1.0 if rates is None else rates.get(ch_ID, 1.0)
+        return weights.get(ch_name, DEFAULT_WEIGHT) * rate
+
+    return dict(sorted(channels_info.items(), key=priority, reverse=True))
+
+
+class ChannelPriorities:
+    """Persistent acceptance rates of the channels, in a SQLite database.
+
+    The videos of some channels pass the filters more often than others. The number of videos
+    of each channel that were evaluated by the filters, and the number of them that were added,
+    are kept between runs (the previous counts weighing less at each update, see DECAY), and
+    their ratio orders the channels of the next runs (see order_channels), so that the channels
+    the videos are usually added from are processed first when a run runs out of quota or time.
+
+    Args:
+        path (str): Path of the database file (channels.sqlite3 in the QTube cache directory if None).
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or os.path.join(helpers.get_cache_dir(), "channels.sqlite3")
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+
+        with self._lock, self._connection:
+            self._connection.execute(_SCHEMA)
+
+    def get_rates(self, channel_IDs: list[str]) -> dict[str, float]:
+        """Retrieves the acceptance rates of channels, the prior for the channels without history.
+
+        Args:
+            channel_IDs (list[str]): List of channel IDs.
+
+        Returns:
+            rates (dict[str, float]): Channel IDs (keys) and acceptance rates (values).
+        """
+        with self._lock:
+            rows = {
+                channel_ID: (evaluated, accepted)
+                for channel_ID, evaluated, accepted in self._connection.execute(
+                    "SELECT channel_id, evaluated, accepted FROM channels"
+                )
+            }
+
+        rates = {}
+        for channel_ID in channel_IDs:
+            evaluated, accepted = rows.get(channel_ID, (0.0, 0.0))
+            rates[channel_ID] = (accepted + PRIOR_ACCEPTED) / (
+                evaluated + PRIOR_EVALUATED
+            )
+        return rates
+
+    def update(self, routes_candidates: list[dict]) -> None:
+        """Counts the evaluated and added videos of a batch per channel.
+
+        Args:
+            routes_candidates (list[VideoRecords]): Filtered and inserted batch of videos, one per rule set (see QTube.pipeline.insert_batch).
+
+        Returns:
+            None
+        """
+        counts = {}
+        for vid_ID in routes_candidates[0] if routes_candidates else []:
+            records = [candidates[vid_ID] for candidates in routes_candidates]
+            if all(
+                record.rejected_by in ["upload date", "channel name", "deadline"]
+                for record in records
+            ):
+                continue  # Not evaluated by the filters
+
+            channel_ID = "UC" + records[0].upload_playlist[2:]
+            evaluated, accepted = counts.get(channel_ID, (0, 0))
+            counts[channel_ID] = (
+                evaluated + 1,
+                accepted + any(record.to_add for record in records),
+            )
+
+        if counts:
+            with self._lock, self._connection:
+                self._connection.executemany(
+                    """INSERT INTO channels VALUES (?, ?, ?) ON CONFLICT (channel_id) DO UPDATE
+                    SET evaluated = evaluated * ? + excluded.evaluated, accepted = accepted * ? + excluded.accepted""",
+                    [
+                        (channel_ID, evaluated, accepted, DECAY, DECAY)
+                        for channel_ID, (evaluated, accepted) in counts.items()
+                    ],
+                )
+
+    def clear(self) -> None:
+        """Empties the database."""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM channels")
+
+    def close(self) -> None:
+        """Closes the database."""
+        with self._lock:
+            self._connection.close()
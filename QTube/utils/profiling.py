@@ -0,0 +1,194 @@
+import contextlib
+import cProfile
+import io
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+
+from QTube.utils import helpers
+
+
+class StageProfiler:
+    """Profiles the stages of a run with cProfile and tracemalloc.
+
+    For each stage, a *index*-*stage*.pstats file (readable with pstats or snakeviz) and a
+    *index*-*stage*.alloc.txt file listing the lines that allocated the most memory are written
+    to the output directory. A stage started inside another one gets its own profile, the outer
+    stage being paused meanwhile, so that the functions of a stage are only counted once (the
+    wall time and memory of the outer stage still include it).
+
+    cProfile only records the thread a stage runs in, so profiled runs process their batches
+    in a single thread (see QTube.pipeline.run). Stages started from other threads while a
+    stage is profiled are not profiled, and the work of the threads a stage starts itself
+    (e.g. concurrent requests) is not in its profile. tracemalloc traces every thread, so the
+    peak memory of a stage includes the allocations of the threads running during it.
+
+    Args:
+        output_dir (str): Directory the profiles are written to.
+        top (int): Number of allocations and functions listed in the reports and summary.
+        frames (int): Number of frames kept by tracemalloc for each allocation.
+    """
+
+    def __init__(self, output_dir: str = "profile", top: int = 10, frames: int = 1):
+        self.output_dir = output_dir
+        self.top = top
+        self.frames = frames
+        self.stages = []
+        self._lock = threading.Lock()
+        self._thread = None  # Thread whose stages are profiled
+        self._stack = []  # Stages being profiled, innermost last
+
+    @contextlib.contextmanager
+    def profile(self, name: str):
+        """Context manager profiling its block as a stage.
+
+        Args:
+            name (str): Name of the stage.
+        """
+        with self._lock:
+            if self._thread not in [None, threading.get_ident()]:
+                other_thread = True
+            else:
+                other_thread = False
+                self._thread = threading.get_ident()
+        if other_thread:
+            yield
+            return
+
+        # The stage being profiled is paused, keeping its peak memory so far
+        outer = self._stack[-1] if self._stack else None
+        if outer is not None:
+            outer["profiler"].disable()
+            outer["peak"] = max(outer["peak"], tracemalloc.get_traced_memory()[1])
+        else:
+            started_tracemalloc = not tracemalloc.is_tracing()
+            if started_tracemalloc:
+                tracemalloc.start(self.frames)
+
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        stage = {
+            "profiler": cProfile.Profile(),
+            "start_memory": tracemalloc.get_traced_memory()[0],
+            "peak": 0,
+        }
+        self._stack.append(stage)
+        start = time.perf_counter()
+        stage["profiler"].enable()
+        try:
+            yield
+        finally:
+            stage["profiler"].disable()
+            wall = time.perf_counter() - start
+            peak = max(stage["peak"], tracemalloc.get_traced_memory()[1])
+            after = tracemalloc.take_snapshot()
+            self._stack.pop()
+            self._save(
+                name,
+                stage["profiler"],
+                wall,
+                peak - stage["start_memory"],
+                after.compare_to(before, "lineno"),
+            )
+
+            # The profiling overhead is left out of the outer stage
+            if outer is not None:
+                outer["peak"] = max(outer["peak"], peak)
+                tracemalloc.reset_peak()
+                outer["profiler"].enable()
+            else:
+                if started_tracemalloc:
+                    tracemalloc.stop()
+                with self._lock:
+                    self._thread = None
+
+    def _save(self, name: str, profiler, wall: float, peak_memory: int, allocations):
+        os.makedirs(self.output_dir, exist_ok=True)
+        slug = re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_")
+        base_path = os.path.join(self.output_dir, f"{len(self.stages):02d}-{slug}")
+
+        profiler.dump_stats(f"{base_path}.pstats")
+
+        with open(f"{base_path}.alloc.txt", "w") as f:
+            f.write(f"Top {self.top} allocations of stage {name}\n")
+            for stat in allocations[: self.top]:
+                f.write(f"{stat}\n")
+
+        self.stages.append(
+            {
+                "name": name,
+                "wall_s": wall,
+                "peak_memory_bytes": max(peak_memory, 0),
+                "pstats_path": f"{base_path}.pstats",
+                "stats": pstats.Stats(profiler),
+            }
+        )
+
+    def get_hot_functions(self, stats: pstats.Stats, top: int = None) -> list[tuple]:
+        """Retrieves the functions with the highest own time in profiling statistics.
+
+        Args:
+            stats (Stats): Profiling statistics.
+            top (int): Number of functions (defaults to the profiler's top).
+
+        Returns:
+            (list[tuple]): Function names, call counts, own times and cumulative times, hottest first.
+        """
+        functions = [
+            (pstats.func_std_string(func), calls, own_time, cumulative_time)
+            for func, (_, calls, own_time, cumulative_time, _) in stats.stats.items()
+        ]
+        functions.sort(key=lambda function: function[2], reverse=True)
+        return functions[: top or self.top]
+
+    def summary(self) -> str:
+        """Builds a short summary of the profiled stages and of the hottest functions overall.
+
+        Returns:
+            (str): Summary text.
+        """
+        if not self.stages:
+            return "No stage was profiled."
+
+        text = io.StringIO()
+        text.write(
+            f"{'Stage':<24}{'Wall (s)':>10}{'Peak memory (MiB)':>19}  Hottest function\n"
+        )
+        for stage in self.stages:
+            hottest = self.get_hot_functions(stage["stats"], 1)
+            text.write(
+                f"{stage['name']:<24}{stage['wall_s']:>10.3f}"
+                f"{stage['peak_memory_bytes'] / 2**20:>19.2f}  "
+                f"{hottest[0][0] if hottest else '-'}\n"
+            )
+
+        total = pstats.Stats(*(stage["pstats_path"] for stage in self.stages))
+        text.write(f"\nTop {self.top} functions by own time, all stages:\n")
+        text.write(f"{'Own (s)':>10}{'Cumul. (s)':>12}{'Calls':>10}  Function\n")
+        for function, calls, own_time, cumulative_time in self.get_hot_functions(total):
+            text.write(
+                f"{own_time:>10.3f}{cumulative_time:>12.3f}{calls:>10}  {function}\n"
+            )
+
+        text.write(f"\nProfiles written to {os.path.abspath(self.output_dir)}")
+        return text.getvalue()
+
+    def print_summary(self, fancy: bool = False) -> None:
+        """Prints the summary of the profiled stages.
+
+        Args:
+            fancy (bool): Determines wether the text is fancyfied (emoji+color).
+
+        Returns:
+            None
+        """
+        helpers.print2(
+            "Profiling summary:\n" + self.summary(),
+            fancy,
+            "info",
+            ["internal"],
+            ["internal"],
+        )
@@ -0,0 +1,142 @@
+import asyncio
+import math
+import threading
+import time
+
+# Requests per second allowed by default to each destination: the YT API and youtube.com
+# pages (shorts probes and pytube streams), the latter being guarded against scraping
+DEFAULT_LIMITS = {"api": 20.0, "web": 5.0}
+
+
+class TokenBucket:
+    """Token bucket, letting requests through at a steady rate with bursts of a given size.
+
+    Tokens are reserved under a lock and the caller waits for its reservation outside of it,
+    so that the bucket can be shared by threads (see acquire) and by asyncio tasks (see
+    acquire_async) without waiting callers blocking each other.
+
+    Args:
+        rate (float): Tokens added per second.
+        burst (int): Capacity of the bucket, the number of requests let through at once after an idle period (one second of requests if None).
+        clock (callable): Monotonic clock, in seconds.
+    """
+
+    def __init__(self, rate: float, burst: int = None, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, math.ceil(rate))
+        self._clock = clock
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1) -> float:
+        """Takes tokens from the bucket, going into debt if there are not enough of them.
+
+        Args:
+            tokens (float): Number of tokens.
+
+        Returns:
+            (float): Time to wait before using the tokens, in seconds.
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= tokens
+            return max(0.0, -self._tokens / self.rate)
+
+    def acquire(self, tokens: float = 1) -> float:
+        """Waits until tokens are available, blocking the calling thread.
+
+        Args:
+            tokens (float): Number of tokens.
+
+        Returns:
+            (float): Time waited, in seconds.
+        """
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens: float = 1) -> float:
+        """Waits until tokens are available, without blocking the event loop.
+
+        Args:
+            tokens (float): Number of tokens.
+
+        Returns:
+            (float): Time waited, in seconds.
+        """
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+
+class RateLimiter:
+    """Rate limits of the requests of a run, one token bucket per destination.
+
+    It is used both as a YT API middleware (see QTube.utils.youtube.resource), for the "api"
+    destination, and as a web middleware (see web_middleware and QTube.utils.web), for the
+    "web" destination, so that every request of the run goes through it whatever the thread
+    or task sending it. The time requests waited is added to the metrics of the run.
+
+    Args:
+        limits (dict): Destinations (keys) and requests per second (values, None to not limit the destination), overriding DEFAULT_LIMITS.
+        metrics (Metrics): Instrumentation of the run the waits are recorded in (optional).
+    """
+
+    def __init__(self, limits: dict = None, metrics=None):
+        self.limits = {**DEFAULT_LIMITS, **(limits or {})}
+        self.metrics = metrics
+        self.buckets = {
+            destination: TokenBucket(rate)
+            for destination, rate in self.limits.items()
+            if rate is not None
+        }
+
+    def acquire(self, destination: str) -> float:
+        """Waits until a request to a destination can be sent, blocking the calling thread.
+
+        Args:
+            destination (str): Destination of the request (api or web).
+
+        Returns:
+            (float): Time waited, in seconds.
+        """
+        bucket = self.buckets.get(destination)
+        if bucket is None:
+            return 0.0
+        wait = bucket.acquire()
+        if self.metrics is not None:
+            self.metrics.throttle(destination, wait)
+        return wait
+
+    async def acquire_async(self, destination: str) -> float:
+        """Waits until a request to a destination can be sent, without blocking the event loop.
+
+        Args:
+            destination (str): Destination of the request (api or web).
+
+        Returns:
+            (float): Time waited, in seconds.
+        """
+        bucket = self.buckets.get(destination)
+        if bucket is None:
+            return 0.0
+        wait = await bucket.acquire_async()
+        if self.metrics is not None:
+            self.metrics.throttle(destination, wait)
+        return wait
+
+    def __call__(self, request, execute):
+        self.acquire("api")
+        return execute()
+
+    def web_middleware(self, kind: str, key: str, fetch):
+        """Web middleware limiting the requests to youtube.com (see QTube.utils.web)."""
+        self.acquire("web")
+        return fetch()
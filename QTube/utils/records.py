@@ -0,0 +1,299 @@
+import threading
+
+from collections.abc import MutableMapping
+
+# Keys of the video information (as in the dictionaries QTube used to pass around) and
+# the attributes of VideoRecord holding them
+FIELDS = {
+    "upload datetime": "upload_datetime",
+    "channel name": "channel_name",
+    "upload playlist": "upload_playlist",
+    "title": "title",
+    "original title": "original_title",
+    "duration": "duration",
+    "language": "language",
+    "description": "description",
+    "tags": "tags",
+    "definition": "definition",
+    "dimension": "dimension",
+    "live status": "live_status",
+    "views": "views",
+    "likes": "likes",
+    "comments": "comments",
+    "likes_to_views_ratio": "likes_to_views_ratio",
+    "comments_to_views_ratio": "comments_to_views_ratio",
+    "views_per_hour": "views_per_hour",
+    "views_growth": "views_growth",
+    "has_paid_ad": "has_paid_ad",
+    "made_for_kids": "made_for_kids",
+    "is short": "is_short",
+    "resolutions": "resolutions",
+    "framerates": "framerates",
+    "captions": "captions",
+}
+_KEYS = {attribute: key for key, attribute in FIELDS.items()}
+
+# Reasons a video can be rejected for, in the order they are checked. Each one is a bit of
+# VideoRecord.rejections, other reasons are given the next bits when first used
+REJECTION_REASONS = [
+    "upload date",
+    "channel name",
+    "unavailable",
+    "deadline",
+    "duration",
+    "title",
+    "shorts",
+    "duplicates",
+    "paid promotion",
+    "made for kids",
+    "language",
+    "definition",
+    "dimension",
+    "resolution",
+    "framerate",
+    "description",
+    "tags",
+    "captions",
+    "views",
+    "likes",
+    "comments",
+    "likes/views ratio",
+    "comments/views ratio",
+    "views/hour",
+    "views growth",
+    "playlist size limit",
+]
+_REJECTION_BITS = {reason: 1 << index for index, reason in enumerate(REJECTION_REASONS)}
+_reasons_lock = threading.Lock()
+
+
+def get_rejection_bit(reason: str) -> int:
+    """Retrieves the bit of a rejection reason in the rejection bitmasks.
+
+    Args:
+        reason (str): Rejection reason (name of the filter).
+
+    Returns:
+        (int): Bit of the reason.
+    """
+    bit = _REJECTION_BITS.get(reason)
+    if bit is None:
+        with _reasons_lock:
+            bit = _REJECTION_BITS.get(reason)
+            if bit is None:
+                REJECTION_REASONS.append(reason)
+                bit = _REJECTION_BITS[reason] = 1 << (len(REJECTION_REASONS) - 1)
+    return bit
+
+
+def get_rejection_reasons(rejections: int) -> list[str]:
+    """Retrieves the rejection reasons of a rejection bitmask.
+
+    Args:
+        rejections (int): Rejection bitmask.
+
+    Returns:
+        (list[str]): Rejection reasons, in the order they are checked.
+    """
+    return [
+        reason
+        for index, reason in enumerate(REJECTION_REASONS)
+        if rejections >> index & 1
+    ]
+
+
+class VideoRecord(MutableMapping):
+    """Information on a candidate video, stored in slots.
+
+    The information is read and written as attributes (see FIELDS for their names), and whether
+    the video is to be added is a bitmask of the reasons it was rejected for. Information that
+    has not been retrieved yet is missing (AttributeError).
+
+    For backward compatibility, a record is also a mutable mapping with the keys of the former
+    video information dictionaries (e.g. record["channel name"], record["to add"] and
+    record["rejected by"]). Keys that are not fields are kept in an extra dictionary.
+
+    Args:
+        kwargs (any): Initial attributes.
+    """
+
+    __slots__ = (*FIELDS.values(), "rejections", "_extra")
+
+    def __init__(self, **kwargs):
+        self.rejections = 0
+        self._extra = None
+        for attribute, value in kwargs.items():
+            setattr(self, attribute, value)
+
+    @classmethod
+    def from_dict(cls, vid_info: dict) -> "VideoRecord":
+        """Builds a record from a video information dictionary.
+
+        Args:
+            vid_info (dict): Dictionary of the video information.
+
+        Returns:
+            (VideoRecord): Record of the video.
+        """
+        record = cls()
+        record.update(vid_info)
+        return record
+
+    @property
+    def to_add(self) -> bool:
+        """Whether the video has not been rejected."""
+        return not self.rejections
+
+    @property
+    def rejected_by(self) -> str | None:
+        """First reason the video was rejected for (None if it was not)."""
+        if not self.rejections:
+            return None
+        lowest_bit = self.rejections & -self.rejections
+        return REJECTION_REASONS[lowest_bit.bit_length() - 1]
+
+    def reject(self, reason: str) -> None:
+        """Marks the video as not to be added.
+
+        Args:
+            reason (str): Name of the filter rejecting the video.
+
+        Returns:
+            None
+        """
+        self.rejections |= get_rejection_bit(reason)
+
+    def copy(self) -> "VideoRecord":
+        """Builds a shallow copy of the record.
+
+        Returns:
+            (VideoRecord): Copy of the record.
+        """
+        record = VideoRecord.__new__(VideoRecord)
+        for attribute in VideoRecord.__slots__:
+            try:
+                setattr(record, attribute, getattr(self, attribute))
+            except AttributeError:
+                pass
+        if self._extra is not None:
+            record._extra = dict(self._extra)
+        return record
+
+    __copy__ = copy
+
+    def __getitem__(self, key: str):
+        if key == "to add":
+            return not self.rejections
+        elif key == "rejected by":
+            if not self.rejections:
+                raise KeyError(key)
+            return self.rejected_by
+
+        attribute = FIELDS.get(key)
+        if attribute is None:
+            if self._extra is None:
+                raise KeyError(key)
+            return self._extra[key]
+        try:
+            return getattr(self, attribute)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key: str, value) -> None:
+        if key == "to add":
+            if value:
+                self.rejections = 0
+            elif not self.rejections:
+                self.reject("unknown")
+        elif key == "rejected by":
+            self.rejections = get_rejection_bit(value)
+        elif key in FIELDS:
+            setattr(self, FIELDS[key], value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        attribute = FIELDS.get(key)
+        if attribute is None:
+            if self._extra is None:
+                raise KeyError(key)
+            del self._extra[key]
+            return
+        try:
+            delattr(self, attribute)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __iter__(self):
+        for attribute in FIELDS.values():
+            if hasattr(self, attribute):
+                yield _KEYS[attribute]
+        yield "to add"
+        if self.rejections:
+            yield "rejected by"
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"VideoRecord({dict(self)!r})"
+
+
+class VideoRecords(dict):
+    """Video IDs (keys) and VideoRecord (values) of candidate videos."""
+
+    @classmethod
+    def from_dicts(cls, videos: dict) -> "VideoRecords":
+        """Builds records from video information dictionaries (records are copied).
+
+        Args:
+            videos (dict): Dictionary of video IDs (keys) and video information (values).
+
+        Returns:
+            (VideoRecords): Records of the videos.
+        """
+        return cls(
+            (
+                vid_ID,
+                (
+                    vid_info.copy()
+                    if isinstance(vid_info, VideoRecord)
+                    else VideoRecord.from_dict(vid_info)
+                ),
+            )
+            for vid_ID, vid_info in videos.items()
+        )
+
+    def copy(self) -> "VideoRecords":
+        """Builds a copy of the container and of its records, to be filtered independently.
+
+        Returns:
+            (VideoRecords): Copy of the records.
+        """
+        return VideoRecords((vid_ID, record.copy()) for vid_ID, record in self.items())
+
+    def to_add(self) -> "VideoRecords":
+        """Retrieves the records of the videos that have not been rejected (not copied).
+
+        Returns:
+            (VideoRecords): Records of the videos to add.
+        """
+        return VideoRecords(
+            (vid_ID, record) for vid_ID, record in self.items() if not record.rejections
+        )
+
+    def rejected(self) -> dict:
+        """Retrieves the reasons the rejected videos were rejected for.
+
+        Returns:
+            (dict): Video IDs (keys) and first rejection reason (values).
+        """
+        return {
+            vid_ID: record.rejected_by
+            for vid_ID, record in self.items()
+            if record.rejections
+        }
@@ -0,0 +1,277 @@
+import datetime as dt
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+from QTube.utils import helpers
+
+# Number of snapshots kept per video (the oldest ones are dropped first)
+SNAPSHOTS_PER_VIDEO = 8
+
+# Time after their last snapshot after which videos are no longer tracked, in seconds
+RETENTION = 8 * 86400.0
+
+# Maximum number of tracked videos (the least recently updated ones are dropped first)
+MAX_VIDEOS = 100_000
+
+# Minimum time between two snapshots of a video, in seconds (a newer one replaces the last one)
+MIN_INTERVAL = 600.0
+
+# Minimum age the views per hour since the upload are computed over, in seconds, so that
+# videos uploaded minutes before the run do not get huge rates out of a few views
+MIN_AGE = 3600.0
+
+# Value of the counts that are not retrieved
+MISSING_COUNT = -1
+
+
+class SnapshotStore:
+    """Persistent time series of the statistics of the tracked videos, in numpy arrays.
+
+    Each tracked video is a row of SNAPSHOTS_PER_VIDEO (timestamp, views, likes, comments)
+    snapshots, oldest first, so that the statistics of a whole batch are read and written with
+    a few array operations. The views growth of a video is the number of views per hour since
+    its previous snapshot, i.e. since a previous run, at least MIN_INTERVAL earlier.
+
+    Videos are no longer tracked once their last snapshot is older than the retention, and the
+    least recently updated ones are dropped beyond the maximum number of videos. The arrays are
+    saved in a single .npz file (see save).
+
+    Args:
+        path (str): Path of the .npz file (snapshots.npz in the QTube cache directory if None).
+        retention (float): Time after their last snapshot after which videos are no longer tracked, in seconds.
+        max_videos (int): Maximum number of tracked videos.
+    """
+
+    def __init__(
+        self,
+        path: str = None,
+        retention: float = RETENTION,
+        max_videos: int = MAX_VIDEOS,
+    ):
+        self.path = path or os.path.join(helpers.get_cache_dir(), "snapshots.npz")
+        self.retention = retention
+        self.max_videos = max_videos
+        self._lock = threading.Lock()
+        self._reset()
+
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                ids, times, counts = data["ids"], data["times"], data["counts"]
+        except (OSError, KeyError, ValueError):
+            return
+        if times.shape[1:] != (SNAPSHOTS_PER_VIDEO,) or counts.shape[1:] != (
+            SNAPSHOTS_PER_VIDEO,
+            3,
+        ):
+            return  # Saved with another number of snapshots per video
+
+        self._ids, self._times, self._counts = ids.astype("U16"), times, counts
+        self._size = len(ids)
+        self._index = {vid_ID: row for row, vid_ID in enumerate(ids.tolist())}
+        with self._lock:
+            self._prune(time.time())
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _reset(self) -> None:
+        """Empties the arrays."""
+        self._ids = np.empty(0, dtype="U16")
+        self._times = np.full((0, SNAPSHOTS_PER_VIDEO), np.nan)
+        self._counts = np.full((0, SNAPSHOTS_PER_VIDEO, 3), MISSING_COUNT, np.int64)
+        self._size = 0
+        self._index = {}
+
+    def _get_rows(self, video_IDs: list[str]) -> np.ndarray:
+        """Rows of videos, new videos being given rows at the end of the arrays (grown if needed)."""
+        for vid_ID in video_IDs:
+            if vid_ID not in self._index:
+                self._index[vid_ID] = len(self._index)
+
+        size = len(self._index)
+        if size > len(self._ids):
+            capacity = max(size, 2 * len(self._ids), 1024)
+            extra = capacity - len(self._ids)
+            self._ids = np.concatenate([self._ids, np.empty(extra, dtype="U16")])
+            self._times = np.concatenate(
+                [self._times, np.full((extra, SNAPSHOTS_PER_VIDEO), np.nan)]
+            )
+            self._counts = np.concatenate(
+                [
+                    self._counts,
+                    np.full((extra, SNAPSHOTS_PER_VIDEO, 3), MISSING_COUNT, np.int64),
+                ]
+            )
+
+        rows = np.fromiter(
+            (self._index[vid_ID] for vid_ID in video_IDs), np.intp, len(video_IDs)
+        )
+        self._ids[rows] = video_IDs
+        self._size = size
+        return rows
+
+    def _prune(self, now: float) -> None:
+        """Drops the videos past the retention and the least recently updated ones beyond the maximum number of videos."""
+        last = np.fmax.reduce(self._times[: self._size], axis=1, initial=-np.inf)
+        kept = np.flatnonzero(last >= now - self.retention)
+        if len(kept) > self.max_videos:
+            kept = np.sort(kept[np.argsort(last[kept])[-self.max_videos :]])
+        if len(kept) == self._size:
+            return
+
+        self._ids = self._ids[kept]
+        self._times = self._times[kept]
+        self._counts = self._counts[kept]
+        self._size = len(kept)
+        self._index = {vid_ID: row for row, vid_ID in enumerate(self._ids.tolist())}
+
+    def observe(
+        self,
+        video_IDs: list[str],
+        views: np.ndarray,
+        likes: np.ndarray,
+        comments: np.ndarray,
+        now: float = None,
+    ) -> np.ndarray:
+        """Computes the views growth of videos, then records their snapshots.
+
+        Args:
+            video_IDs (list[str]): List of video IDs.
+            views (np.ndarray): Number of views of the videos.
+            likes (np.ndarray): Number of likes of the videos (MISSING_COUNT if not retrieved).
+            comments (np.ndarray): Number of comments of the videos (MISSING_COUNT if not retrieved).
+            now (float): Timestamp of the snapshots (defaults to now).
+
+        Returns:
+            growth (np.ndarray): Views per hour since the previous snapshot of each video (NaN if it has none).
+        """
+        if now is None:
+            now = time.time()
+        views = np.asarray(views, np.int64)
+        counts = np.stack(
+            [views, np.asarray(likes, np.int64), np.asarray(comments, np.int64)],
+            axis=1,
+        )
+        positions = np.arange(len(video_IDs))
+
+        with self._lock:
+            rows = self._get_rows(video_IDs)
+            times = self._times[rows]
+
+            # Previous snapshot: the last one taken at least MIN_INTERVAL earlier
+            previous = times <= now - MIN_INTERVAL  # False for the empty slots (NaN)
+            has_previous = previous.any(axis=1)
+            last = SNAPSHOTS_PER_VIDEO - 1 - np.argmax(previous[:, ::-1], axis=1)
+            previous_times = times[positions, last]
+            previous_views = self._counts[rows, last, 0]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                growth = np.where(
+                    has_previous & (previous_views != MISSING_COUNT),
+                    (views - previous_views) / ((now - previous_times) / 3600),
+                    np.nan,
+                )
+
+            # Recording, in place of the last snapshot if it is too recent
+            filled = np.count_nonzero(~np.isnan(times), axis=1)
+            too_recent = (filled > 0) & (
+                times[positions, np.maximum(filled - 1, 0)] > now - MIN_INTERVAL
+            )
+            slots = filled - too_recent
+            full = slots == SNAPSHOTS_PER_VIDEO
+            if full.any():  # The oldest snapshot is dropped
+                full_rows = rows[full]
+                self._times[full_rows, :-1] = self._times[full_rows, 1:]
+                self._counts[full_rows, :-1] = self._counts[full_rows, 1:]
+                slots[full] -= 1
+            self._times[rows, slots] = now
+            self._counts[rows, slots] = counts
+
+        return growth
+
+    def save(self, now: float = None) -> None:
+        """Drops the videos no longer tracked and saves the arrays.
+
+        Args:
+            now (float): Timestamp the retention is computed from (defaults to now).
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._prune(time.time() if now is None else now)
+            tmp_path = f"{self.path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez(
+                    f,
+                    ids=self._ids[: self._size],
+                    times=self._times[: self._size],
+                    counts=self._counts[: self._size],
+                )
+            os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        """Empties the store."""
+        with self._lock:
+            self._reset()
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+def set_view_rates(
+    videos_info: dict, snapshots: SnapshotStore = None, now: dt.datetime = None
+) -> None:
+    """Computes the views per hour since their upload and the views growth of videos, and adds them to the videos' information, in place.
+    Both are None for the videos without views, and the growth is None for the videos without a previous snapshot.
+
+    Args:
+        videos_info (VideoRecords): Video IDs (keys) and records (values), with their statistics.
+        snapshots (SnapshotStore): Statistics of the previous runs, recording the new ones (growths are None if None).
+        now (datetime): Reference datetime, e.g. the recording time of a replayed run (defaults to now).
+
+    Returns:
+        None
+    """
+    now = (now or dt.datetime.now(dt.timezone.utc)).timestamp()
+
+    records = {}
+    for vid_ID, vid_info in videos_info.items():
+        vid_info.views_per_hour = vid_info.views_growth = None
+        if getattr(vid_info, "views", None) is not None:
+            records[vid_ID] = vid_info
+    if not records:
+        return
+
+    def counts(attribute: str) -> np.ndarray:
+        values = (getattr(vid_info, attribute, None) for vid_info in records.values())
+        return np.fromiter(
+            (MISSING_COUNT if value is None else value for value in values),
+            np.int64,
+            len(records),
+        )
+
+    views = counts("views")
+    uploads = np.fromiter(
+        (vid_info.upload_datetime.timestamp() for vid_info in records.values()),
+        np.float64,
+        len(records),
+    )
+    views_per_hour = views / (np.maximum(now - uploads, MIN_AGE) / 3600)
+
+    if snapshots is None:
+        growth = np.full(len(records), np.nan)
+    else:
+        growth = snapshots.observe(
+            list(records), views, counts("likes"), counts("comments"), now
+        )
+
+    for vid_info, rate, growth_rate in zip(
+        records.values(), views_per_hour.tolist(), growth.tolist()
+    ):
+        vid_info.views_per_hour = rate
+        vid_info.views_growth = None if math.isnan(growth_rate) else growth_rate
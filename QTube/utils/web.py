@@ -0,0 +1,86 @@
+import contextlib
+import contextvars
+
+from pytube import YouTube
+
+from QTube.utils import checks
+
+# Web middlewares active in the current context, outermost first
+_middlewares = contextvars.ContextVar("qtube_web_middlewares", default=())
+
+
+@contextlib.contextmanager
+def use_middlewares(*middlewares):
+    """Context manager making the requests to youtube.com (outside of the YT API) go through middlewares.
+
+    A web middleware is a callable taking the kind of request (redirect or streams), its key
+    (URL or video ID) and a function executing the rest of the chain, and returning the result:
+
+        def middleware(kind, key, fetch):
+            return fetch()
+
+    The middlewares apply to the current context, so threads started inside the block need
+    to run in a copy of it (contextvars.copy_context).
+
+    Args:
+        middlewares (callable): Web middlewares, outermost first.
+    """
+    token = _middlewares.set(_middlewares.get() + middlewares)
+    try:
+        yield
+    finally:
+        _middlewares.reset(token)
+
+
+def call(kind: str, key: str, fetch):
+    """Runs a request to youtube.com through the active web middlewares.
+
+    Args:
+        kind (str): Kind of request (redirect or streams).
+        key (str): Identifier of the request (URL or video ID).
+        fetch (function): Function making the request.
+
+    Returns:
+        (any): Result of the request.
+    """
+    middlewares = _middlewares.get()
+
+    def chain(index):
+        if index == len(middlewares):
+            return fetch()
+        return middlewares[index](kind, key, lambda: chain(index + 1))
+
+    return chain(0)
+
+
+def check_URL_redirect(url: str, redirect_code: int) -> bool:
+    """Checks if the provided URL redirects to another page, through the web middlewares.
+
+    Args:
+        url (str): URL to check for redirection
+        redirect_code (int): Status code to check for (3xx)
+
+    Returns:
+        (bool): True if the URL redirects to another page with the correct status code, False otherwise.
+    """
+    return call("redirect", url, lambda: checks.check_URL_redirect(url, redirect_code))
+
+
+def get_streams(video_ID: str) -> list[dict]:
+    """Retrieves the video streams of a YT video with pytube, through the web middlewares.
+
+    Args:
+        video_ID (str): Video ID.
+
+    Returns:
+        (list[dict]): Resolution (e.g. 1080p, None if unknown) and framerate of each video stream.
+    """
+
+    def fetch():
+        yt = YouTube(f"http://youtube.com/watch?v={video_ID}")
+        return [
+            {"resolution": stream.resolution, "fps": stream.fps}
+            for stream in yt.streams.filter(type="video")
+        ]
+
+    return call("streams", video_ID, fetch)
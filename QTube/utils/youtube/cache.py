@@ -0,0 +1,151 @@
+import threading
+import time
+
+from QTube.utils.youtube.resource import RequestWrapper
+
+
+class PublicCache:
+    """In-memory cache of the public YT API data, shareable between the runs of several accounts.
+
+    It is used as a middleware (see QTube.utils.youtube.resource) and only caches data that does not
+    depend on the logged-in user:
+        - channels.list and videos.list items requested by ID, cached per item, so that batches
+          of IDs that differ between accounts still reuse each other's items,
+        - channels.list responses requested by handle,
+        - playlistItems.list responses of channel uploads playlists,
+        - captions.list responses.
+    Subscriptions, user playlists and any request made with mine=True are never cached.
+
+    The shorts attribute caches the result of the youtube.com/shorts redirection probes.
+    Expired data is dropped as new data is stored, at most every half time to live.
+
+    Args:
+        ttl (float): Time to live of the cached data, in seconds.
+    """
+
+    def __init__(self, ttl: float = 3600.0):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.shorts = {}
+        self._items = {}
+        self._responses = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._evicted_at = time.monotonic()
+
+    def __call__(self, request: RequestWrapper, execute):
+        params = request.params
+
+        if request.narrowed:
+            return execute()  # Items missing from a cache, already counted
+        elif params.get("mine") or params.get("myRating"):
+            return execute()
+        elif request.method_ID in ["videos.list", "channels.list"] and "id" in params:
+            return self._execute_per_item(request, execute)
+        elif (
+            request.method_ID == "channels.list"
+            and "forHandle" in params
+            or request.method_ID == "playlistItems.list"
+            and str(params.get("playlistId", "")).startswith("UU")  # Uploads playlist
+            or request.method_ID == "captions.list"
+        ):
+            return self._execute_whole(request, execute)
+        else:
+            return execute()
+
+    def _get(self, store: dict, key):
+        entry = store.get(key)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            return None
+        return entry
+
+    def _store(self, store: dict, entries: dict) -> None:
+        now = time.monotonic()
+        with self._lock:
+            store.update((key, (now, value)) for key, value in entries.items())
+            if now - self._evicted_at < self.ttl / 2:
+                return
+
+            self._evicted_at = now
+            for cached in [self._items, self._responses]:
+                for key in [k for k, (t, _) in cached.items() if now - t > self.ttl]:
+                    del cached[key]
+            for key in [
+                k
+                for k, lock in self._key_locks.items()
+                if k not in self._responses and not lock.locked()
+            ]:
+                del self._key_locks[key]
+
+    def _key_lock(self, key) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _execute_whole(self, request: RequestWrapper, execute):
+        key = (request.method_ID, tuple(sorted(request.params.items())))
+
+        # Concurrent runs needing the same response wait for the first one to fetch it
+        with self._key_lock(key):
+            entry = self._get(self._responses, key)
+            with self._lock:
+                if entry is not None:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+            if entry is not None:
+                return entry[1]
+
+            response = execute()
+            self._store(self._responses, {key: response})
+
+        return response
+
+    def _execute_per_item(self, request: RequestWrapper, execute):
+        params = request.params
+        item_IDs = [item_ID for item_ID in str(params["id"]).split(",") if item_ID]
+        other_params = tuple(sorted((k, v) for k, v in params.items() if k != "id"))
+
+        def key(item_ID):
+            return (request.method_ID, other_params, item_ID)
+
+        cached = {}
+        for item_ID in item_IDs:
+            entry = self._get(self._items, key(item_ID))
+            if entry is not None:
+                cached[item_ID] = entry[1]
+
+        missing_IDs = [item_ID for item_ID in item_IDs if item_ID not in cached]
+        with self._lock:
+            self.hits += len(cached)
+            self.misses += len(missing_IDs)
+
+        if not missing_IDs:
+            response = {}
+        elif not cached:
+            response = execute()
+        else:
+            narrowed = request.replace(id=",".join(missing_IDs))
+            narrowed.narrowed = True
+            response = narrowed.execute(**request.execute_kwargs)
+
+        fetched = {item["id"]: item for item in response.get("items", [])}
+        for item_ID in missing_IDs:
+            # Items the API does not return (private or deleted) are cached as None
+            cached[item_ID] = fetched.get(item_ID)
+        self._store(
+            self._items, {key(item_ID): cached[item_ID] for item_ID in missing_IDs}
+        )
+
+        return {
+            **{k: v for k, v in response.items() if k not in ["items", "pageInfo"]},
+            "items": [cached[item_ID] for item_ID in item_IDs if cached[item_ID]],
+        }
+
+    def clear(self) -> None:
+        """Empties the cache."""
+        with self._lock:
+            self._items.clear()
+            self._responses.clear()
+            self._key_locks.clear()
+            self.shorts.clear()
@@ -1,3 +1,7 @@
+# Partial response of the captions.list requests, with the properties the captions filter reads
+CAPTION_FIELDS = "items(id,snippet(trackKind,language,audioTrackType,status,isCC,isLarge,isEasyReader,isAutoSynced))"
+
+
 def make_caption_requests(youtube, video_IDs: list[str]) -> dict[dict]:
     """Retrieves API caption responses of a list of YT videos.
 
@@ -10,7 +14,7 @@ def make_caption_requests(youtube, video_IDs: list[str]) -> dict[dict]:
     """
     responses_dict = {
         video_ID: youtube.captions()
-        .list(part="snippet", videoId=video_ID)
+        .list(part="snippet", videoId=video_ID, fields=CAPTION_FIELDS)
         .execute(num_retries=5)
         for video_ID in video_IDs
     }
@@ -0,0 +1,203 @@
+import datetime as dt
+import gzip
+import json
+import os
+import threading
+
+from collections import defaultdict
+
+import httplib2
+
+from googleapiclient.errors import HttpError
+
+from QTube.utils import helpers
+from QTube.utils.metrics import write_atomically
+from QTube.utils.youtube.model import loads
+
+CASSETTE_VERSION = 1
+
+
+class CassetteMissError(helpers.QTubeError):
+    """Raised when a replayed run makes a request that was not recorded."""
+
+
+def get_request_key(method_ID: str, params: dict) -> str:
+    """Builds the cassette key of a YT API request.
+
+    Args:
+        method_ID (str): Method identifier (collection.method, e.g. videos.list).
+        params (dict): Request parameters.
+
+    Returns:
+        (str): Key of the request.
+    """
+    return f"{method_ID} {json.dumps(params, sort_keys=True, default=str)}"
+
+
+class Cassette:
+    """Recording of the responses to every request a run makes, replayable without any network access.
+
+    It is used both as a YT API middleware (see QTube.utils.youtube.resource) and as a web
+    middleware (see QTube.utils.web), so that it covers the API responses and errors, the
+    youtube.com/shorts redirection probes and the pytube stream lists.
+
+    When replaying, requests made several times get their recorded responses in the same order
+    (the last one being repeated), writes that were not recorded (e.g. insertions of videos that
+    the recorded run rejected) succeed without doing anything, and any other request that was not
+    recorded raises a CassetteMissError.
+
+    Args:
+        path (str): Path of the cassette file (gzipped JSON if it ends with .gz).
+        mode (str): record or replay.
+    """
+
+    def __init__(self, path: str, mode: str = "replay"):
+        if mode not in ["record", "replay"]:
+            raise ValueError(f"Unknown cassette mode: {mode}")
+
+        self.path = path
+        self.mode = mode
+        self.recorded_at = dt.datetime.now(dt.timezone.utc)
+        self.api = defaultdict(list)
+        self.web = defaultdict(list)
+        self._positions = defaultdict(int)
+        self._lock = threading.Lock()
+
+        if mode == "replay":
+            self.load()
+
+    def load(self) -> None:
+        """Loads the cassette file."""
+        opener = gzip.open if self.path.endswith(".gz") else open
+        with opener(self.path, "rb") as f:
+            data = loads(f.read())
+
+        if data.get("version") != CASSETTE_VERSION:
+            raise helpers.QTubeError(
+                f"The cassette {self.path} was recorded with an incompatible version."
+            )
+        self.recorded_at = dt.datetime.fromisoformat(data["recorded_at"])
+        self.api.update(data["api"])
+        self.web.update(data["web"])
+
+    def save(self) -> None:
+        """Writes the recorded responses to the cassette file."""
+        with self._lock:
+            data = {
+                "version": CASSETTE_VERSION,
+                "recorded_at": self.recorded_at.isoformat(),
+                "api": dict(self.api),
+                "web": dict(self.web),
+            }
+        text = json.dumps(data, separators=(",", ":"))
+
+        if self.path.endswith(".gz"):
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, self.path)
+        else:
+            write_atomically(self.path, text)
+
+    def _replay(self, store: dict, key: str):
+        with self._lock:
+            entries = store.get(key)
+            if not entries:
+                return None
+            position = self._positions[key]
+            self._positions[key] = position + 1
+            return entries[min(position, len(entries) - 1)]
+
+    def __call__(self, request, execute):
+        key = get_request_key(request.method_ID, request.params)
+
+        if self.mode == "replay":
+            entry = self._replay(self.api, key)
+            if entry is None:
+                if request.method_ID.split(".")[-1] in ["insert", "update", "delete"]:
+                    return {}
+                raise CassetteMissError(
+                    f"The request {key} is not in the cassette {self.path}. Record the run again with the current parameters."
+                )
+            if "error" in entry:
+                error = entry["error"]
+                raise HttpError(
+                    httplib2.Response({"status": error["status"]}),
+                    error["content"].encode("utf-8"),
+                    uri=error["uri"],
+                )
+            return entry["response"]
+
+        try:
+            response = execute()
+        except HttpError as err:
+            with self._lock:
+                self.api[key].append(
+                    {
+                        "error": {
+                            "status": err.resp.status,
+                            "content": err.content.decode("utf-8", "replace"),
+                            "uri": err.uri,
+                        }
+                    }
+                )
+            raise
+
+        with self._lock:
+            self.api[key].append({"response": response})
+        return response
+
+    def web_middleware(self, kind: str, key: str, fetch):
+        """Web middleware recording or replaying requests to youtube.com (see QTube.utils.web)."""
+        web_key = f"{kind} {key}"
+
+        if self.mode == "replay":
+            entry = self._replay(self.web, web_key)
+            if entry is None:
+                raise CassetteMissError(
+                    f"The {kind} request {key} is not in the cassette {self.path}. Record the run again with the current parameters."
+                )
+            if "error" in entry:
+                raise RuntimeError(entry["error"])
+            return entry["result"]
+
+        try:
+            result = fetch()
+        except Exception as e:
+            with self._lock:
+                self.web[web_key].append({"error": str(e)})
+            raise
+
+        with self._lock:
+            self.web[web_key].append({"result": result})
+        return result
+
+
+class ReplayResource:
+    """YT API resource building requests that are never sent, for runs replayed from a cassette."""
+
+    def __getattr__(self, collection: str):
+        if collection.startswith("_"):
+            raise AttributeError(collection)
+        return lambda: _ReplayCollection(collection)
+
+
+class _ReplayCollection:
+    def __init__(self, name: str):
+        self._name = name
+
+    def __getattr__(self, method: str):
+        if method.startswith("_"):
+            raise AttributeError(method)
+        return lambda **params: _ReplayRequest(f"{self._name}.{method}")
+
+
+class _ReplayRequest:
+    def __init__(self, method_ID: str):
+        self.method_ID = method_ID
+
+    def execute(self, **kwargs):
+        raise CassetteMissError(
+            f"The {self.method_ID} request reached the network during a replayed run."
+        )
@@ -19,6 +19,7 @@ def get_subscriptions(youtube, next_page_token=None) -> dict:
                 maxResults=50,
                 order="alphabetical",
                 pageToken=next_page_token,
+                fields="nextPageToken,items/snippet(title,resourceId/channelId)",
             )
             .execute(num_retries=5)
         )
@@ -49,7 +50,9 @@ def get_channel_info(youtube, handle: str) -> dict:
     channel = {}
 
     response = (
-        youtube.channels().list(part="snippet", forHandle=handle).execute(num_retries=5)
+        youtube.channels()
+        .list(part="snippet", forHandle=handle, fields="items(id,snippet/title)")
+        .execute(num_retries=5)
     )
 
     if "items" in response.keys():
@@ -77,7 +80,11 @@ def get_uploads_playlists(youtube, channel_IDs: list[str]) -> list[str]:
     channel_IDs_str = ",".join(channel_IDs)
     response = (
         youtube.channels()
-        .list(part="contentDetails", id=channel_IDs_str)
+        .list(
+            part="contentDetails",
+            id=channel_IDs_str,
+            fields="items(id,contentDetails/relatedPlaylists/uploads)",
+        )
         .execute(num_retries=5)
     )
     # Create a dictionary to store the mapping between channel IDs and upload playlist IDs
@@ -99,11 +106,11 @@ def get_user_info(youtube) -> dict:
         youtube (Resource): YT API resource.
 
     Returns:
-        response (dict): Dictionary containing information on the logged-in user channel.
+        response (dict): Dictionary containing the ID and title of the logged-in user channel.
     """
     response = (
         youtube.channels()
-        .list(part="snippet,contentDetails,statistics", mine=True)
+        .list(part="snippet", mine=True, fields="items(id,snippet/title)")
         .execute(num_retries=5)
     )
 
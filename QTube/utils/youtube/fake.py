@@ -0,0 +1,692 @@
+import base64
+import datetime as dt
+import json
+import random
+import threading
+import time
+
+from collections import Counter
+
+import httplib2
+
+from googleapiclient.errors import HttpError
+
+from QTube.utils.youtube.resource import apply_fields, get_quota_cost, parse_fields
+
+WORDS = [
+    "music", "official", "video", "live", "talk", "tutorial", "review", "news", "gaming",
+    "vlog", "highlights", "podcast", "episode", "trailer", "remix", "cover", "guide",
+    "how", "to", "the", "best", "new", "python", "cooking", "science", "history", "week",
+    "update", "reaction", "challenge", "interview", "documentary", "conference", "lesson",
+]  # fmt: skip
+LANGUAGES = ["en", "en-US", "fr", "de", "es", "ja", "pt-BR", None]
+ERRORS = {
+    "quota": (
+        403,
+        "quotaExceeded",
+        "The request cannot be completed because you have exceeded your quota.",
+    ),
+    "rate_limit": (
+        403,
+        "rateLimitExceeded",
+        "The request cannot be completed because the rate limit was exceeded.",
+    ),
+    "not_found": (404, "notFound", "The requested resource could not be found."),
+    "server": (503, "backendError", "The service is currently unavailable."),
+}
+
+
+def make_http_error(kind: str, uri: str = None) -> HttpError:
+    """Builds an HTTP error like the ones raised by the YT API client.
+
+    Args:
+        kind (str): Kind of error (quota, rate_limit, not_found or server).
+        uri (str): URI of the failing request (optional).
+
+    Returns:
+        (HttpError): HTTP error.
+    """
+    status, reason, message = ERRORS[kind]
+    content = json.dumps(
+        {
+            "error": {
+                "code": status,
+                "message": message,
+                "errors": [{"message": message, "domain": "youtube", "reason": reason}],
+            }
+        }
+    ).encode("utf-8")
+    resp = httplib2.Response({"status": status})
+    resp.reason = message
+
+    return HttpError(resp, content, uri=uri)
+
+
+def encode_page_token(offset: int) -> str:
+    """Encodes a pagination offset into an opaque page token."""
+    return base64.urlsafe_b64encode(f"offset:{offset}".encode()).decode().rstrip("=")
+
+
+def decode_page_token(token: str | None) -> int:
+    """Decodes a page token into a pagination offset."""
+    if not token:
+        return 0
+    padded = token + "=" * (-len(token) % 4)
+    return int(base64.urlsafe_b64decode(padded).decode().split(":")[1])
+
+
+class FakeDataset:
+    """Synthetic YT account, subscribed to a number of channels uploading videos at random intervals.
+    Channels and videos are generated lazily and deterministically from the seed, so that accounts
+    with tens of thousands of channels stay cheap to build.
+
+    Args:
+        n_channels (int): Number of subscribed channels.
+        videos_per_channel (int): Number of videos uploaded by each channel.
+        seed (int): Seed of the random generation.
+        now (datetime): Reference datetime of the uploads (defaults to now).
+        empty_channel_ratio (float): Share of channels without any public video.
+    """
+
+    def __init__(
+        self,
+        n_channels: int = 1000,
+        videos_per_channel: int = 20,
+        seed: int = 0,
+        now: dt.datetime = None,
+        empty_channel_ratio: float = 0.02,
+    ):
+        self.n_channels = n_channels
+        self.videos_per_channel = videos_per_channel
+        self.seed = seed
+        self.now = now or dt.datetime.now(dt.timezone.utc).replace(microsecond=0)
+        self.empty_channel_ratio = empty_channel_ratio
+        self.user_channel_ID = "UC" + "f" * 22
+        self.playlists = {}  # User playlists, created on first use
+        self._alphabetical_order = None
+        self._lock = threading.Lock()
+
+    def _random(self, *keys) -> random.Random:
+        return random.Random(":".join(str(k) for k in (self.seed, *keys)))
+
+    def channel_ID(self, index: int) -> str:
+        return f"UC{index:022x}"
+
+    def channel_index(self, channel_ID: str) -> int | None:
+        try:
+            index = int(channel_ID[2:], 16)
+        except ValueError:
+            return None
+        return index if 0 <= index < self.n_channels else None
+
+    def channel_title(self, index: int) -> str:
+        rng = self._random("channel", index)
+        return (
+            f"{rng.choice(WORDS).capitalize()} {rng.choice(WORDS).capitalize()} {index}"
+        )
+
+    def alphabetical_order(self) -> list[int]:
+        """Channel indexes sorted by channel title, computed once."""
+        with self._lock:
+            if self._alphabetical_order is None:
+                self._alphabetical_order = sorted(
+                    range(self.n_channels), key=self.channel_title
+                )
+            return self._alphabetical_order
+
+    def channel_handle(self, index: int) -> str:
+        return f"@channel{index}"
+
+    def upload_times(self, index: int) -> list[dt.datetime]:
+        """Upload datetimes of a channel's videos, newest first."""
+        rng = self._random("uploads", index)
+        if rng.random() < self.empty_channel_ratio:
+            return []
+        interval = rng.uniform(2.0, 24.0 * 14)  # Hours between two uploads
+        offset = rng.uniform(0.0, interval)
+        return [
+            self.now - dt.timedelta(hours=offset + j * interval)
+            for j in range(self.videos_per_channel)
+        ]
+
+    def video_ID(self, index: int, position: int) -> str:
+        return f"{index:07x}{position:04x}"
+
+    def video(self, video_ID: str) -> dict | None:
+        """Complete videos.list resource of a video, or None if it does not exist."""
+        try:
+            index, position = int(video_ID[:7], 16), int(video_ID[7:], 16)
+        except ValueError:
+            return None
+        if len(video_ID) != 11 or index >= self.n_channels:
+            return None
+        upload_times = self.upload_times(index)
+        if position >= len(upload_times):
+            return None
+
+        rng = self._random("video", video_ID)
+        live_status = rng.choices(["none", "live", "upcoming"], [0.97, 0.02, 0.01])[0]
+        is_short = rng.random() < 0.15
+        duration = rng.randint(5, 59) if is_short else int(rng.lognormvariate(6.5, 0.9))
+        views = int(rng.lognormvariate(8.0, 2.0))
+        language = rng.choice(LANGUAGES)
+
+        snippet = {
+            "publishedAt": upload_times[position].isoformat().replace("+00:00", "Z"),
+            "channelId": self.channel_ID(index),
+            "title": " ".join(
+                rng.choice(WORDS) for _ in range(rng.randint(3, 9))
+            ).capitalize(),
+            "description": " ".join(
+                rng.choice(WORDS) for _ in range(rng.randint(0, 300))
+            ),
+            "thumbnails": {
+                size: {
+                    "url": f"https://i.ytimg.com/vi/{video_ID}/{size}.jpg",
+                    "width": w,
+                    "height": h,
+                }
+                for size, w, h in [
+                    ("default", 120, 90),
+                    ("medium", 320, 180),
+                    ("high", 480, 360),
+                ]
+            },
+            "channelTitle": self.channel_title(index),
+            "categoryId": str(rng.randint(1, 30)),
+            "liveBroadcastContent": live_status,
+        }
+        if rng.random() < 0.7:
+            snippet["tags"] = rng.sample(WORDS, rng.randint(1, 8))
+        if language is not None:
+            snippet["defaultAudioLanguage"] = language
+        snippet["localized"] = {
+            "title": snippet["title"],
+            "description": snippet["description"],
+        }
+
+        content_details = {
+            "dimension": "3d" if rng.random() < 0.01 else "2d",
+            "definition": "hd" if rng.random() < 0.85 else "sd",
+            "caption": "true" if rng.random() < 0.3 else "false",
+            "licensedContent": rng.random() < 0.5,
+            "contentRating": {},
+            "projection": "360" if rng.random() < 0.01 else "rectangular",
+        }
+        if live_status == "none":  # Livestreams and premieres have no duration yet
+            content_details["duration"] = (
+                f"PT{duration // 3600}H{duration % 3600 // 60}M{duration % 60}S"
+                if duration >= 3600
+                else f"PT{duration // 60}M{duration % 60}S"
+            )
+
+        statistics = {"viewCount": str(views), "favoriteCount": "0"}
+        if rng.random() < 0.97:  # Likes can be hidden
+            statistics["likeCount"] = str(int(views * rng.uniform(0.0, 0.08)))
+        if rng.random() < 0.95:  # Comments can be disabled
+            statistics["commentCount"] = str(int(views * rng.uniform(0.0, 0.01)))
+
+        return {
+            "kind": "youtube#video",
+            "etag": f"etag-{video_ID}",
+            "id": video_ID,
+            "snippet": snippet,
+            "contentDetails": content_details,
+            "statistics": statistics,
+            "status": {
+                "uploadStatus": "processed",
+                "privacyStatus": "public",
+                "license": "youtube",
+                "embeddable": True,
+                "publicStatsViewable": True,
+                "madeForKids": rng.random() < 0.03,
+            },
+            "paidProductPlacementDetails": {
+                "hasPaidProductPlacement": rng.random() < 0.1
+            },
+        }
+
+    def captions(self, video_ID: str) -> list[dict]:
+        """captions.list items of a video."""
+        video = self.video(video_ID)
+        if video is None or video["contentDetails"]["caption"] == "false":
+            return []
+        rng = self._random("captions", video_ID)
+        return [
+            {
+                "kind": "youtube#caption",
+                "etag": f"etag-{video_ID}-{i}",
+                "id": f"caption-{video_ID}-{i}",
+                "snippet": {
+                    "videoId": video_ID,
+                    "lastUpdated": video["snippet"]["publishedAt"],
+                    "trackKind": rng.choice(["standard", "asr", "forced"]),
+                    "language": rng.choice(["en", "fr", "de", "es"]),
+                    "name": "",
+                    "audioTrackType": rng.choice(["unknown", "primary", "commentary"]),
+                    "isCC": rng.random() < 0.2,
+                    "isLarge": False,
+                    "isEasyReader": False,
+                    "isDraft": False,
+                    "isAutoSynced": rng.random() < 0.5,
+                    "status": "serving",
+                },
+            }
+            for i in range(rng.randint(1, 3))
+        ]
+
+    def is_short(self, video_ID: str) -> bool:
+        """True if the video is a short, i.e. if youtube.com/shorts/*video_ID* does not redirect."""
+        if self.video(video_ID) is None:
+            return False
+        rng = self._random("video", video_ID)  # Same draws as in video()
+        rng.choices(["none", "live", "upcoming"], [0.97, 0.02, 0.01])
+        return rng.random() < 0.15
+
+    def streams(self, video_ID: str) -> list[dict]:
+        """Video streams of a video, as listed by pytube (see QTube.utils.web.get_streams)."""
+        video = self.video(video_ID)
+        if video is None:
+            raise ValueError(f"{video_ID} is unavailable")
+
+        rng = self._random("streams", video_ID)
+        highest = (
+            rng.choice([720, 1080, 1440, 2160])
+            if video["contentDetails"]["definition"] == "hd"
+            else rng.choice([360, 480])
+        )
+        framerates = [30, 60] if rng.random() < 0.3 else [30]
+        return [
+            {"resolution": f"{resolution}p", "fps": fps}
+            for resolution in [144, 240, 360, 480, 720, 1080, 1440, 2160]
+            if resolution <= highest
+            for fps in (framerates if resolution >= 720 else [30])
+        ]
+
+    def user_playlist(self, playlist_ID: str) -> list[str]:
+        """Video IDs of a user playlist, created empty on first use."""
+        with self._lock:
+            return self.playlists.setdefault(playlist_ID, [])
+
+
+def generate_dataset(
+    n_channels: int = 10000, videos_per_channel: int = 20, seed: int = 0, **kwargs
+) -> FakeDataset:
+    """Generates a synthetic YT account, typically to reproduce production scale locally.
+
+    Args:
+        n_channels (int): Number of subscribed channels (10-50k for large accounts).
+        videos_per_channel (int): Number of videos uploaded by each channel.
+        seed (int): Seed of the random generation.
+        kwargs (any): Other FakeDataset arguments.
+
+    Returns:
+        (FakeDataset): Synthetic account.
+    """
+    return FakeDataset(n_channels, videos_per_channel, seed, **kwargs)
+
+
+class FakeShortsProbes(dict):
+    """Results of the youtube.com/shorts redirection probes of a synthetic dataset, computed on access.
+    It replaces the probe cache of the shorts detection (see PublicCache.shorts), so that no web request is made.
+    """
+
+    def __init__(self, dataset: FakeDataset):
+        super().__init__()
+        self.dataset = dataset
+
+    def __contains__(self, video_ID) -> bool:
+        return True
+
+    def __missing__(self, video_ID: str) -> bool:
+        redirects = not self.dataset.is_short(video_ID)
+        self[video_ID] = redirects
+        return redirects
+
+
+class FakeRequest:
+    """Request of the fake YT API, executed like a googleapiclient HttpRequest.
+    As the injected latency already simulates the network, the backoff between retries does not actually sleep.
+    """
+
+    def __init__(self, api, method_ID: str, handler, params: dict):
+        self.api = api
+        self.methodId = method_ID
+        self.handler = handler
+        self.params = params
+        self.uri = (
+            f"https://youtube.googleapis.com/youtube/v3/{method_ID.replace('.', '/')}"
+        )
+        self._rand = random.random
+        self._sleep = lambda seconds: None
+
+    def execute(self, http=None, num_retries: int = 0):
+        for attempt in range(num_retries + 1):
+            if attempt > 0:
+                self._sleep(self._rand() * 2**attempt)
+            try:
+                return self.api._execute(self)
+            except HttpError as err:
+                # Same retry policy as googleapiclient: server errors and rate limits only
+                if attempt == num_retries or not (
+                    err.status_code >= 500 or "rate limit" in err.reason
+                ):
+                    raise
+
+
+class FakeCollection:
+    def __init__(self, api, name: str):
+        self._api = api
+        self._name = name
+
+    def __getattr__(self, method: str):
+        handler = getattr(self._api, f"_{self._name}_{method}", None)
+        if handler is None:
+            raise AttributeError(
+                f"{self._name}.{method} is not implemented by the fake YT API"
+            )
+        return lambda **params: FakeRequest(
+            self._api, f"{self._name}.{method}", handler, params
+        )
+
+
+class FakeYouTube:
+    """Fake YT API resource, to be injected instead of the real one (e.g. QTube.run(params, youtube=FakeYouTube())).
+    It implements subscriptions.list, channels.list, playlistItems.list/insert, playlists.list,
+    videos.list and captions.list over a synthetic dataset, with the API's pagination, partial
+    responses (fields parameter), optional
+    latency and error injection.
+
+    Args:
+        dataset (FakeDataset): Synthetic account (a 1000 channels one is generated if None).
+        latency (float|tuple[float]): Latency of each call in seconds, or (minimum, maximum) latencies.
+        error_rates (dict[str, float]): Probability of each call failing, per kind of error (quota, rate_limit, not_found or server).
+        quota_limit (int): Quota units after which every call fails with a quota error (optional).
+        seed (int): Seed of the latency and error draws.
+    """
+
+    def __init__(
+        self,
+        dataset: FakeDataset = None,
+        latency: float | tuple[float] = 0.0,
+        error_rates: dict = None,
+        quota_limit: int = None,
+        seed: int = 0,
+    ):
+        self.dataset = dataset or generate_dataset(1000)
+        self.latency = latency
+        self.error_rates = error_rates or {}
+        self.quota_limit = quota_limit
+        self.calls = Counter()
+        self.quota_used = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def shorts_probes(self) -> FakeShortsProbes:
+        """Redirection probe results of the dataset's videos, to be used as PublicCache.shorts."""
+        return FakeShortsProbes(self.dataset)
+
+    def web_middleware(self, kind: str, key: str, fetch):
+        """Web middleware answering the requests to youtube.com from the dataset (see QTube.utils.web)."""
+        if kind == "redirect":
+            return not self.dataset.is_short(key.rsplit("/", 1)[-1])
+        elif kind == "streams":
+            return self.dataset.streams(key)
+        return fetch()
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return lambda: FakeCollection(self, name)
+
+    def _execute(self, request: FakeRequest) -> dict:
+        with self._lock:
+            self.calls[request.methodId] += 1
+            self.quota_used += get_quota_cost(request.methodId)
+            over_quota = (
+                self.quota_limit is not None and self.quota_used > self.quota_limit
+            )
+            draws = {kind: self._rng.random() for kind in self.error_rates}
+            latency = (
+                self._rng.uniform(*self.latency)
+                if isinstance(self.latency, (tuple, list))
+                else self.latency
+            )
+
+        if latency:
+            time.sleep(latency)
+        if over_quota:
+            raise make_http_error("quota", request.uri)
+        for kind, rate in self.error_rates.items():
+            if draws[kind] < rate:
+                raise make_http_error(kind, request.uri)
+
+        response = request.handler(**request.params)
+        if request.params.get("fields"):
+            response = apply_fields(response, parse_fields(request.params["fields"]))
+        return response
+
+    @staticmethod
+    def _page(
+        items: list, page_token: str, max_results: int, kind: str, build=None
+    ) -> dict:
+        # Items can be given as keys, only the ones of the page being built
+        offset = decode_page_token(page_token)
+        page = items[offset : offset + max_results]
+        response = {
+            "kind": kind,
+            "etag": f"etag-{offset}-{len(items)}",
+            "pageInfo": {"totalResults": len(items), "resultsPerPage": max_results},
+            "items": list(map(build, page)) if build is not None else page,
+        }
+        if offset + max_results < len(items):
+            response["nextPageToken"] = encode_page_token(offset + max_results)
+        if offset > 0:
+            response["prevPageToken"] = encode_page_token(max(offset - max_results, 0))
+        return response
+
+    @staticmethod
+    def _parts(resource: dict, part: str) -> dict:
+        parts = set(part.split(","))
+        return {
+            k: v for k, v in resource.items() if k in parts | {"kind", "etag", "id"}
+        }
+
+    def _subscriptions_list(
+        self, part, mine=None, maxResults=5, order="relevance", pageToken=None, **kwargs
+    ):
+        data = self.dataset
+        indexes = range(data.n_channels)
+        if order == "alphabetical":
+            indexes = data.alphabetical_order()
+
+        def build(i):
+            return {
+                "kind": "youtube#subscription",
+                "etag": f"etag-sub-{i}",
+                "id": f"sub-{i}",
+                "snippet": {
+                    "title": data.channel_title(i),
+                    "resourceId": {
+                        "kind": "youtube#channel",
+                        "channelId": data.channel_ID(i),
+                    },
+                    "channelId": data.user_channel_ID,
+                },
+            }
+
+        return self._page(
+            indexes,
+            pageToken,
+            min(maxResults, 50),
+            "youtube#subscriptionListResponse",
+            build,
+        )
+
+    def _channels_list(self, part, id=None, forHandle=None, mine=None, **kwargs):
+        data = self.dataset
+        if mine:
+            resources = [
+                {
+                    "id": data.user_channel_ID,
+                    "snippet": {"title": "Fake user"},
+                    "contentDetails": {
+                        "relatedPlaylists": {"uploads": "UU" + "f" * 22}
+                    },
+                    "statistics": {"subscriberCount": "0", "videoCount": "0"},
+                }
+            ]
+        elif forHandle is not None:
+            indexes = (
+                [int(forHandle.lstrip("@")[len("channel") :])]
+                if forHandle.lstrip("@").startswith("channel")
+                else []
+            )
+            resources = [
+                {"id": data.channel_ID(i), "snippet": {"title": data.channel_title(i)}}
+                for i in indexes
+                if i < data.n_channels
+            ]
+        else:
+            indexes = [data.channel_index(channel_ID) for channel_ID in id.split(",")]
+            resources = [
+                {
+                    "id": data.channel_ID(i),
+                    "snippet": {
+                        "title": data.channel_title(i),
+                        "customUrl": data.channel_handle(i),
+                    },
+                    "contentDetails": {
+                        "relatedPlaylists": {"uploads": "UU" + data.channel_ID(i)[2:]}
+                    },
+                }
+                for i in indexes
+                if i is not None
+            ]
+
+        response = {"kind": "youtube#channelListResponse", "etag": "etag-channels"}
+        if resources:  # Like the real API, items is missing when nothing is found
+            response["items"] = [
+                {
+                    "kind": "youtube#channel",
+                    "etag": f"etag-{r['id']}",
+                    **self._parts(r, part),
+                }
+                for r in resources
+            ]
+        return response
+
+    def _playlistItems_list(
+        self, part, playlistId, maxResults=5, pageToken=None, **kwargs
+    ):
+        data = self.dataset
+        if playlistId.startswith("UU"):
+            index = data.channel_index("UC" + playlistId[2:])
+            upload_times = data.upload_times(index) if index is not None else []
+            if (
+                not upload_times
+            ):  # Channels without public videos have no uploads playlist
+                raise make_http_error("not_found")
+            entries = [(data.video_ID(index, j), t) for j, t in enumerate(upload_times)]
+        else:
+            entries = [
+                (
+                    video_ID,
+                    dt.datetime.fromisoformat(
+                        data.video(video_ID)["snippet"]["publishedAt"].replace(
+                            "Z", "+00:00"
+                        )
+                    ),
+                )
+                for video_ID in data.user_playlist(playlistId)
+            ]
+
+        items = [
+            {
+                "kind": "youtube#playlistItem",
+                "etag": f"etag-{playlistId}-{video_ID}",
+                "id": f"item-{playlistId}-{video_ID}",
+                "snippet": {
+                    "playlistId": playlistId,
+                    "position": position,
+                    "resourceId": {"kind": "youtube#video", "videoId": video_ID},
+                },
+                "contentDetails": {
+                    "videoId": video_ID,
+                    "videoPublishedAt": published_at.isoformat().replace("+00:00", "Z"),
+                },
+            }
+            for position, (video_ID, published_at) in enumerate(entries)
+        ]
+        page = self._page(
+            items, pageToken, min(maxResults, 50), "youtube#playlistItemListResponse"
+        )
+        page["items"] = [self._parts(item, part) for item in page["items"]]
+        return page
+
+    def _playlistItems_insert(self, part, body, **kwargs):
+        snippet = body["snippet"]
+        video_ID = snippet["resourceId"]["videoId"]
+        if snippet["playlistId"].startswith("UU"):
+            raise make_http_error("not_found")
+        if self.dataset.video(video_ID) is None:
+            raise make_http_error("not_found")
+
+        playlist = self.dataset.user_playlist(snippet["playlistId"])
+        with self._lock:
+            playlist.append(video_ID)
+            position = len(playlist) - 1
+        return {
+            "kind": "youtube#playlistItem",
+            "id": f"item-{snippet['playlistId']}-{video_ID}",
+            "snippet": {**snippet, "position": position},
+        }
+
+    def _playlists_list(self, part, id=None, mine=None, **kwargs):
+        data = self.dataset
+        playlist_IDs = list(data.playlists) if mine else id.split(",")
+        items = [
+            self._parts(
+                {
+                    "kind": "youtube#playlist",
+                    "etag": f"etag-{playlist_ID}",
+                    "id": playlist_ID,
+                    "snippet": {
+                        "channelId": data.user_channel_ID,
+                        "title": f"Playlist {playlist_ID}",
+                    },
+                    "contentDetails": {
+                        "itemCount": len(data.user_playlist(playlist_ID))
+                    },
+                },
+                part,
+            )
+            for playlist_ID in playlist_IDs
+            if not playlist_ID.startswith("UU")
+        ]
+        return {
+            "kind": "youtube#playlistListResponse",
+            "etag": "etag-playlists",
+            "items": items,
+        }
+
+    def _videos_list(self, part, id, **kwargs):
+        video_IDs = id.split(",") if isinstance(id, str) else list(id)
+        resources = [self.dataset.video(video_ID) for video_ID in video_IDs[:50]]
+        items = [self._parts(r, part) for r in resources if r is not None]
+        return {
+            "kind": "youtube#videoListResponse",
+            "etag": "etag-videos",
+            "items": items,
+            "pageInfo": {"totalResults": len(items), "resultsPerPage": len(items)},
+        }
+
+    def _captions_list(self, part, videoId, **kwargs):
+        if self.dataset.video(videoId) is None:
+            raise make_http_error("not_found")
+        return {
+            "kind": "youtube#captionListResponse",
+            "etag": f"etag-captions-{videoId}",
+            "items": [self._parts(c, part) for c in self.dataset.captions(videoId)],
+        }
@@ -0,0 +1,192 @@
+import concurrent.futures
+import contextvars
+import threading
+
+import httplib2
+
+from googleapiclient.errors import HttpError
+
+from QTube.utils.metrics import get_percentile
+
+# Time each HTTP attempt of the read (list) requests is given before failing, per method, in seconds
+DEFAULT_TIMEOUTS = {"videos.list": 30.0, "playlistItems.list": 30.0}
+DEFAULT_TIMEOUT = 60.0
+
+# Latency percentile of a method after which a read request is sent again, and the number of
+# latencies it needs before requests are hedged, along with the shortest delay
+HEDGING_PERCENTILE = 95
+MIN_SAMPLES = 20
+MIN_DELAY = 0.1
+
+# Hedged requests executed at once (hung requests keep their thread until their connection times out)
+MAX_WORKERS = 32
+
+
+def is_read(method_ID: str) -> bool:
+    """Determines if a YT API method only reads data, so that its requests can safely be sent twice.
+
+    Args:
+        method_ID (str): Method identifier (collection.method, e.g. videos.list).
+
+    Returns:
+        (bool): True for list methods.
+    """
+    return method_ID.endswith(".list")
+
+
+class HedgedRequests:
+    """Middleware giving the YT API read requests a timeout, and sending slow ones again.
+
+    Read requests (list methods, which can safely be sent twice) are given the timeout of their
+    method, which resource.ThreadLocalHttp applies to the sockets of their HTTP client: each
+    HTTP attempt times out on its own, googleapiclient retrying it with its usual backoff, and
+    a request whose attempts all timed out fails with a 408 HttpError, which
+    helpers.handle_http_errors retries like any failed request. Other requests (e.g.
+    playlistItems.insert) keep the default timeout of googleapiclient, as a timed out attempt
+    may still have been applied.
+
+    With a hedging budget, read requests are executed on worker threads, and one still running
+    after the 95th percentile of the latencies of its method (see Metrics) is sent a second
+    time, through every middleware (its quota is counted), and the first response is used, the
+    other request being cancelled if it has not started yet. Duplicates are capped at a share
+    of the read requests, and counted in the metrics of the run (see Metrics.hedge) along with
+    the ones answering first, so that the quota they cost can be weighed against the time saved.
+
+    Args:
+        metrics (Metrics): Instrumentation of the run, giving the latencies of the methods and recording the duplicates and timeouts.
+        timeouts (dict): IDs of list methods (keys) and timeouts of each HTTP attempt in seconds (values, None for googleapiclient's default), overriding DEFAULT_TIMEOUTS.
+        budget (float): Maximum share of the read requests sent twice, in percent (no hedging if 0).
+
+    Raises:
+        ValueError: If a timeout is given for a method other than a list method.
+    """
+
+    def __init__(self, metrics, timeouts: dict = None, budget: float = 0):
+        writes = [method_ID for method_ID in timeouts or {} if not is_read(method_ID)]
+        if writes:
+            raise ValueError(
+                f"Only list methods can be given a timeout, not {', '.join(writes)}."
+            )
+
+        self.metrics = metrics
+        self.timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+        self.budget = budget
+        self.requests = 0
+        self.duplicates = 0
+        self._delays = {}
+        self._lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=MAX_WORKERS, thread_name_prefix="qtube-request"
+        )
+
+    def get_timeout(self, method_ID: str) -> float | None:
+        """Retrieves the timeout of each HTTP attempt of a method.
+
+        Args:
+            method_ID (str): Method identifier (collection.method, e.g. videos.list).
+
+        Returns:
+            (float|None): Timeout in seconds, None for googleapiclient's default (always for methods other than list methods).
+        """
+        if not is_read(method_ID):
+            return None
+        return self.timeouts.get(method_ID, DEFAULT_TIMEOUT)
+
+    def get_delay(self, method_ID: str) -> float | None:
+        """Retrieves the time after which a read request of a method is sent again.
+        The percentile is computed again every MIN_SAMPLES latencies.
+
+        Args:
+            method_ID (str): Method identifier (collection.method, e.g. videos.list).
+
+        Returns:
+            (float|None): Delay in seconds, None if there are not enough latencies yet.
+        """
+        latencies = self.metrics.get_latencies(method_ID)
+        if len(latencies) < MIN_SAMPLES:
+            return None
+        with self._lock:
+            computed_at, delay = self._delays.get(method_ID, (0, None))
+        if len(latencies) - computed_at < MIN_SAMPLES:
+            return delay
+
+        delay = max(MIN_DELAY, get_percentile(latencies, HEDGING_PERCENTILE))
+        with self._lock:
+            self._delays[method_ID] = (len(latencies), delay)
+        return delay
+
+    def allow_duplicate(self) -> bool:
+        """Determines if a read request can be sent again without exceeding the hedging budget."""
+        with self._lock:
+            if self.duplicates + 1 > self.budget / 100 * self.requests:
+                return False
+            self.duplicates += 1
+            return True
+
+    def __call__(self, request, execute):
+        method_ID = request.method_ID
+        if not is_read(method_ID):
+            return execute()
+
+        request.timeout = self.get_timeout(method_ID)  # See resource.ThreadLocalHttp
+        if getattr(request, "hedged", False):
+            return self._execute(
+                method_ID, execute
+            )  # Waited for by the original request
+
+        delay = None
+        if self.budget > 0:
+            with self._lock:
+                self.requests += 1
+            delay = self.get_delay(method_ID)
+        if delay is None:
+            return self._execute(method_ID, execute)
+
+        futures = [
+            self._executor.submit(
+                contextvars.copy_context().run, self._execute, method_ID, execute
+            )
+        ]
+        duplicate_future = None
+        done, _ = concurrent.futures.wait(futures, timeout=delay)
+        if not done and self.allow_duplicate():
+            duplicate = request.replace()
+            duplicate.hedged = True
+            duplicate_future = self._executor.submit(
+                contextvars.copy_context().run,
+                lambda: duplicate.execute(**request.execute_kwargs),
+            )
+            futures.append(duplicate_future)
+            self.metrics.hedge(method_ID, "duplicates")
+
+        try:
+            error = None
+            while futures:
+                done, pending = concurrent.futures.wait(
+                    futures, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    if future.exception() is None:
+                        if future is duplicate_future:
+                            self.metrics.hedge(method_ID, "duplicate_wins")
+                        return future.result()
+                    error = future.exception()
+                futures = [future for future in futures if future in pending]
+            raise error
+        finally:
+            for future in futures:  # Not sent if still queued
+                future.cancel()
+
+    def _execute(self, method_ID: str, execute):
+        try:
+            return execute()
+        except TimeoutError as err:  # Every HTTP attempt timed out
+            self.metrics.hedge(method_ID, "timeouts")
+            raise HttpError(
+                httplib2.Response({"status": 408}),
+                b'{"error": {"message": "Request timed out."}}',
+            ) from err
+
+    def close(self) -> None:
+        """Stops the worker threads once their requests end, without waiting for them."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,223 @@
+import collections
+import hashlib
+import json
+import os
+import threading
+import urllib.parse
+
+import httplib2
+
+from QTube.utils import helpers
+from QTube.utils.youtube import resource
+
+# Methods of the YT API whose responses are cached (paths of their endpoints)
+CACHED_ENDPOINTS = ["subscriptions", "playlists", "playlistItems"]
+
+# Maximum size of the cache directory, in bytes
+MAX_SIZE = 64 * 1024 * 1024
+
+
+class HttpCache:
+    """Cache of the YT API responses on disk, revalidated with their ETags.
+
+    Responses of the list methods of CACHED_ENDPOINTS are stored with their ETag, keyed by
+    request URL. The next identical request is sent with an If-None-Match header, and when the
+    API answers that the response did not change (304 Not Modified), the stored response is
+    served instead of being downloaded again. Stored responses are never served without this
+    revalidation, so responses of the requests made for another account (mine=True) are only
+    served if the API confirms that they are unchanged for the current one.
+
+    The least recently used responses are evicted once the cache exceeds its maximum size.
+    The cache is used through the HTTP clients it builds (see build_http), e.g. with
+    resource.ThreadLocalHttp(http_factory=cache.build_http).
+
+    Args:
+        directory (str): Directory of the cached responses (http in the QTube cache directory if None).
+        max_size (int): Maximum size of the cached responses, in bytes.
+    """
+
+    def __init__(self, directory: str = None, max_size: int = MAX_SIZE):
+        self.directory = directory or os.path.join(helpers.get_cache_dir(), "http")
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Sizes of the cached responses, least recently used first
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".cache"):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, name[: -len(".cache")], stat.st_size))
+        self._sizes = collections.OrderedDict(
+            (key, size) for _, key, size in sorted(entries)
+        )
+        self._size = sum(self._sizes.values())
+
+    def build_http(self, timeout: float = None) -> "CachingHttp":
+        """Builds an HTTP client going through the cache (not thread-safe, like httplib2 clients).
+
+        Args:
+            timeout (float): Socket timeout of the client, in seconds (googleapiclient's default if None).
+
+        Returns:
+            (CachingHttp): HTTP client.
+        """
+        return CachingHttp(resource.build_http(timeout), self)
+
+    @staticmethod
+    def is_cached(uri: str, method: str) -> bool:
+        """Determines if the response of a request is cached.
+
+        Args:
+            uri (str): URL of the request.
+            method (str): HTTP method of the request.
+
+        Returns:
+            (bool): True if the request is a GET request to one of CACHED_ENDPOINTS.
+        """
+        path = urllib.parse.urlsplit(uri).path
+        return method == "GET" and path.rsplit("/", 1)[-1] in CACHED_ENDPOINTS
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.cache")
+
+    def get(self, uri: str) -> tuple[dict, bytes] | None:
+        """Retrieves the stored response of a request.
+
+        Args:
+            uri (str): URL of the request.
+
+        Returns:
+            (tuple[dict, bytes]|None): Headers and content of the response, None if it is not stored.
+        """
+        key = hashlib.sha256(uri.encode("utf-8")).hexdigest()
+        try:
+            with open(self._path(key), "rb") as f:
+                headers = json.loads(f.readline())
+                content = f.read()
+        except (OSError, ValueError):
+            return None
+
+        with self._lock:
+            if key in self._sizes:
+                self._sizes.move_to_end(key)
+        try:
+            os.utime(self._path(key))  # Recency kept for the next runs
+        except OSError:
+            pass
+        return headers, content
+
+    def count(self, hit: bool) -> None:
+        """Counts a cache hit (response revalidated) or miss (response downloaded).
+
+        Args:
+            hit (bool): True for a hit, False for a miss.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def put(self, uri: str, headers: dict, content: bytes) -> None:
+        """Stores the response of a request, evicting the least recently used ones if needed.
+
+        Args:
+            uri (str): URL of the request.
+            headers (dict): Headers of the response (with its ETag).
+            content (bytes): Content of the response.
+
+        Returns:
+            None
+        """
+        key = hashlib.sha256(uri.encode("utf-8")).hexdigest()
+        data = json.dumps(headers).encode("utf-8") + b"\n" + content
+        if len(data) > self.max_size:
+            return
+
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._size += len(data) - self._sizes.pop(key, 0)
+            self._sizes[key] = len(data)
+            while self._size > self.max_size:
+                evicted, size = self._sizes.popitem(last=False)
+                self._size -= size
+                try:
+                    os.remove(self._path(evicted))
+                except OSError:
+                    pass
+
+    def clear(self) -> None:
+        """Empties the cache."""
+        with self._lock:
+            for key in self._sizes:
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+            self._sizes.clear()
+            self._size = 0
+
+
+class CachingHttp:
+    """httplib2 client revalidating the responses stored in an HttpCache (see HttpCache).
+
+    Args:
+        http (httplib2.Http): Wrapped HTTP client.
+        cache (HttpCache): Cache of the responses.
+    """
+
+    def __init__(self, http: httplib2.Http, cache: HttpCache):
+        self.http = http
+        self.cache = cache
+
+    def __getattr__(self, name: str):
+        return getattr(self.http, name)
+
+    def request(
+        self,
+        uri,
+        method="GET",
+        body=None,
+        headers=None,
+        redirections=httplib2.DEFAULT_MAX_REDIRECTS,
+        connection_type=None,
+    ):
+        """Implementation of httplib2's Http.request."""
+        stored = self.cache.get(uri) if self.cache.is_cached(uri, method) else None
+        if stored is not None:
+            headers = {**(headers or {}), "if-none-match": stored[0]["etag"]}
+
+        response, content = self.http.request(
+            uri,
+            method,
+            body=body,
+            headers=headers,
+            redirections=redirections,
+            connection_type=connection_type,
+        )
+
+        if stored is not None and response.status == 304:
+            self.cache.count(hit=True)
+            return httplib2.Response(stored[0]), stored[1]
+
+        if self.cache.is_cached(uri, method):
+            self.cache.count(hit=False)
+            if response.status == 200 and "etag" in response:
+                self.cache.put(
+                    uri,
+                    {k: v for k, v in response.items() if not k.startswith("-")},
+                    content,
+                )
+
+        return response, content
@@ -0,0 +1,43 @@
+import json
+
+from googleapiclient.model import JsonModel
+
+try:
+    import orjson
+except ImportError:  # Optional dependency (pip install QTube[fast])
+    orjson = None
+
+
+def loads(content: bytes | str):
+    """Decodes a JSON document, with orjson if it is installed and the json module otherwise.
+
+    Args:
+        content (bytes|str): JSON document.
+
+    Returns:
+        (any): Decoded document.
+
+    Raises:
+        ValueError: If the document is not valid JSON.
+    """
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+class FastJsonModel(JsonModel):
+    """Model of a googleapiclient resource decoding the YT API responses with orjson, when it is installed.
+    It behaves like googleapiclient's default JSON model otherwise.
+    """
+
+    def deserialize(self, content):
+        try:
+            body = loads(content)
+        except ValueError:  # Not JSON, returned as text like the default model does
+            if isinstance(content, bytes):
+                content = content.decode("utf-8")
+            return content
+
+        if self._data_wrapper and isinstance(body, dict) and "data" in body:
+            body = body["data"]
+        return body
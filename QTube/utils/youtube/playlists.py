@@ -13,7 +13,12 @@ def get_recent_videos(youtube, playlist_ID: str) -> dict:
     """
     response = (
         youtube.playlistItems()
-        .list(part="contentDetails", playlistId=playlist_ID, maxResults=5)
+        .list(
+            part="contentDetails",
+            playlistId=playlist_ID,
+            maxResults=5,
+            fields="items/contentDetails(videoId,videoPublishedAt)",
+        )
         .execute(num_retries=5)
     )
 
@@ -29,6 +34,45 @@ def get_recent_videos(youtube, playlist_ID: str) -> dict:
     return recent_vids
 
 
+def get_videos_page(
+    youtube, playlist_ID: str, page_token: str = None
+) -> tuple[dict, str | None]:
+    """Retrieves a page of 50 videos of a YT playlist.
+
+    Args:
+        youtube (Resource): YT API resource.
+        playlist_ID (str): ID of the playlist.
+        page_token (str): Token of the page (first page if None).
+
+    Returns:
+        videos (dict): Dictionary containing the ID (keys) and upload date (values) of the videos of the page.
+        next_page_token (str|None): Token of the next page (None if it is the last one).
+    """
+    response = (
+        youtube.playlistItems()
+        .list(
+            part="contentDetails",
+            playlistId=playlist_ID,
+            maxResults=50,
+            pageToken=page_token,
+            fields="nextPageToken,items/contentDetails(videoId,videoPublishedAt)",
+        )
+        .execute(num_retries=5)
+    )
+
+    videos = {
+        item["contentDetails"]["videoId"]: {
+            "upload datetime": dt.datetime.fromisoformat(
+                item["contentDetails"]["videoPublishedAt"]
+            )
+        }
+        for item in response.get("items", [])
+        if "videoPublishedAt" in item["contentDetails"]  # Private videos
+    }
+
+    return videos, response.get("nextPageToken")
+
+
 def get_playlist_content(youtube, playlist_ID: str) -> list[str]:
     """Retrieves the IDs of videos saved in a YT playlist.
 
@@ -49,6 +93,7 @@ def get_playlist_content(youtube, playlist_ID: str) -> list[str]:
                 playlistId=playlist_ID,
                 maxResults=50,
                 pageToken=next_page_token,
+                fields="nextPageToken,items/contentDetails/videoId",
             )
             .execute(num_retries=5)
         )
@@ -79,7 +124,7 @@ def get_playlists_titles(youtube=None, playlist_IDs: list[str] = None) -> list[s
     playlist_IDs_str = ",".join(playlist_IDs)
     response = (
         youtube.playlists()
-        .list(part="snippet", id=playlist_IDs_str)
+        .list(part="snippet", id=playlist_IDs_str, fields="items/snippet/title")
         .execute(num_retries=5)
     )
 
@@ -103,7 +148,11 @@ def get_playlists_video_counts(
     playlist_IDs_str = ",".join(playlist_IDs)
     response = (
         youtube.playlists()
-        .list(part="contentDetails", id=playlist_IDs_str)
+        .list(
+            part="contentDetails",
+            id=playlist_IDs_str,
+            fields="items/contentDetails/itemCount",
+        )
         .execute(num_retries=5)
     )
 
@@ -0,0 +1,334 @@
+import functools
+import re
+import threading
+
+from collections import Counter
+
+import google_auth_httplib2
+import googleapiclient.http
+
+# Quota cost of the YT API methods, in units (https://developers.google.com/youtube/v3/determine_quota_cost)
+QUOTA_COSTS = {
+    "captions.list": 50,
+    "search.list": 100,
+}
+WRITE_QUOTA_COST = 50  # insert, update and delete methods
+DEFAULT_QUOTA_COST = 1  # list methods
+
+
+def get_quota_cost(method_ID: str) -> int:
+    """Retrieves the quota cost of a YT API method.
+
+    Args:
+        method_ID (str): Method identifier (collection.method, e.g. videos.list).
+
+    Returns:
+        (int): Number of quota units charged for one call of the method.
+    """
+    if method_ID in QUOTA_COSTS:
+        return QUOTA_COSTS[method_ID]
+    elif method_ID.split(".")[-1] in ["insert", "update", "delete"]:
+        return WRITE_QUOTA_COST
+    else:
+        return DEFAULT_QUOTA_COST
+
+
+class ResourceWrapper:
+    """Wraps a YT API resource (or anything with the same interface) so that every request
+    made through it goes through a chain of middlewares.
+
+    A middleware is a callable taking the request (a RequestWrapper) and a function executing
+    the rest of the chain, and returning the API response:
+
+        def middleware(request, execute):
+            return execute()
+
+    Keyword arguments given to execute are forwarded to the request's execute method.
+    """
+
+    def __init__(self, resource, middlewares: list = None, collection: str = None):
+        self._resource = resource
+        self._middlewares = list(middlewares or [])
+        self._collection = collection
+
+    def __getattr__(self, name):
+        attr = getattr(self._resource, name)
+        if not callable(attr):
+            return attr
+
+        def method(*args, **kwargs):
+            res = attr(*args, **kwargs)
+            if res is None:  # e.g. list_next on the last page
+                return None
+            elif self._collection is not None and hasattr(res, "execute"):
+                return RequestWrapper(
+                    res, self._middlewares, f"{self._collection}.{name}", kwargs, attr
+                )
+            else:  # Collection, e.g. youtube.videos()
+                return ResourceWrapper(res, self._middlewares, name)
+
+        return method
+
+    @property
+    def resource(self):
+        """Wrapped YT API resource."""
+        return self._resource
+
+    @property
+    def middlewares(self) -> list:
+        """Middlewares every request goes through, outermost first."""
+        return self._middlewares
+
+
+@functools.lru_cache(maxsize=64)
+def parse_fields(fields: str) -> dict:
+    """Parses the fields parameter of a partial response request (e.g. items(id,snippet/title)).
+
+    Args:
+        fields (str): Fields parameter.
+
+    Returns:
+        (dict): Selected field names (keys) and selected subfields (values, None for the whole field).
+    """
+    tokens = re.findall(r"[^,/()]+|[,/()]", fields.replace(" ", ""))
+    position = 0
+
+    def merge(tree: dict, other: dict) -> None:
+        for name, subtree in other.items():
+            if name in tree and tree[name] is not None and subtree is not None:
+                merge(tree[name], subtree)
+            else:
+                tree[name] = None if name in tree and tree[name] is None else subtree
+
+    def parse_selection() -> dict:
+        nonlocal position
+        tree = {}
+        while position < len(tokens) and tokens[position] != ")":
+            if tokens[position] == ",":
+                position += 1
+            else:
+                merge(tree, parse_path())
+        return tree
+
+    def parse_path() -> dict:
+        nonlocal position
+        name = tokens[position]
+        position += 1
+        if position < len(tokens) and tokens[position] == "/":
+            position += 1
+            return {name: parse_path()}
+        if position < len(tokens) and tokens[position] == "(":
+            position += 1
+            subtree = parse_selection()
+            position += 1  # Closing parenthesis
+            return {name: subtree}
+        return {name: None}
+
+    return parse_selection()
+
+
+def apply_fields(value, tree: dict | None):
+    """Keeps the selected fields of a response, as the YT API does for partial responses.
+
+    Args:
+        value (any): Response, or part of it.
+        tree (dict|None): Selected fields (see parse_fields, None for everything).
+
+    Returns:
+        (any): Partial response.
+    """
+    if tree is None:
+        return value
+    if isinstance(value, list):
+        return [apply_fields(item, tree) for item in value]
+    if isinstance(value, dict):
+        return {
+            name: apply_fields(value[name], subtree)
+            for name, subtree in tree.items()
+            if name in value
+        }
+    return value
+
+
+class RequestWrapper:
+    """YT API request whose execution goes through a chain of middlewares.
+
+    A middleware answering part of a request (e.g. a cache) sends a request for the rest with
+    replace, and marks it as narrowed, so that the middlewares that already counted its items
+    as missing can let it through.
+    """
+
+    def __init__(
+        self,
+        request,
+        middlewares: list,
+        method_ID: str,
+        params: dict,
+        factory=None,
+    ):
+        self.request = request
+        self.method_ID = method_ID
+        self.params = params
+        self._middlewares = middlewares
+        self._factory = factory
+        self.execute_kwargs = {}
+        self.narrowed = False
+
+    def replace(self, **params):
+        """Builds the same request with some parameters replaced.
+        The new request goes through every middleware when executed, and should be executed
+        with the keyword arguments of the original one (execute_kwargs).
+
+        Args:
+            params (any): Request parameters to replace.
+
+        Returns:
+            (RequestWrapper): New request.
+        """
+        new_params = {**self.params, **params}
+        return RequestWrapper(
+            self._factory(**new_params),
+            self._middlewares,
+            self.method_ID,
+            new_params,
+            self._factory,
+        )
+
+    def execute(self, **kwargs):
+        """Executes the request through the middlewares.
+
+        Args:
+            kwargs (any): Keyword arguments of the wrapped request's execute method (num_retries, http).
+
+        Returns:
+            (dict): YT API response.
+        """
+        self.execute_kwargs = kwargs
+
+        def call(index, execute_kwargs):
+            if index == len(self._middlewares):
+                return self.request.execute(**execute_kwargs)
+            return self._middlewares[index](
+                self, lambda **kw: call(index + 1, {**execute_kwargs, **kw})
+            )
+
+        return call(0, kwargs)
+
+
+class QuotaCounter:
+    """Middleware counting the API calls made and the quota units they cost."""
+
+    def __init__(self):
+        self.calls = Counter()
+        self.quota_used = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, request: RequestWrapper, execute):
+        # Quota is charged even if the request fails, so it is counted beforehand
+        with self._lock:
+            self.calls[request.method_ID] += 1
+            self.quota_used += get_quota_cost(request.method_ID)
+
+        return execute()
+
+
+def build_http(timeout: float = None):
+    """Builds an httplib2 client like googleapiclient does, with a socket timeout.
+
+    Args:
+        timeout (float): Time each HTTP attempt is given, in seconds (googleapiclient's default if None).
+
+    Returns:
+        (httplib2.Http): HTTP client.
+    """
+    http = googleapiclient.http.build_http()
+    if timeout is not None:
+        http.timeout = timeout
+    return http
+
+
+class ThreadLocalHttp:
+    """Middleware executing each request with an HTTP client of the calling thread.
+    httplib2 is not thread-safe, and every request of a googleapiclient resource uses the
+    resource's client by default, so the resource cannot be shared between threads without it.
+    Only the requests of resources authorized with credentials get their own clients, built
+    with the same credentials; other requests (e.g. of the fake API or of resources built
+    with a custom HTTP client) are left as they are.
+
+    A request with a timeout attribute (see QTube.utils.youtube.hedging) is sent with a client
+    whose sockets time out after it, so that each HTTP attempt of googleapiclient's retries
+    gets the timeout. A thread keeps a client per timeout.
+
+    Args:
+        http_factory (callable): Function building the httplib2 client of a thread from a timeout (build_http by default).
+    """
+
+    def __init__(self, http_factory=None):
+        self.http_factory = http_factory or build_http
+        self._local = threading.local()
+
+    def get_http(self, credentials, timeout: float = None):
+        """Retrieves the HTTP client of the calling thread, building it on the first call.
+
+        Args:
+            credentials (Credentials): Credentials the client is authorized with.
+            timeout (float): Socket timeout of the client, in seconds (the factory's default if None).
+
+        Returns:
+            (AuthorizedHttp): HTTP client of the calling thread.
+        """
+        clients = getattr(self._local, "clients", None)
+        if clients is None:
+            clients = self._local.clients = {}
+        http = clients.get(timeout)
+        if http is None or http.credentials is not credentials:
+            http = google_auth_httplib2.AuthorizedHttp(
+                credentials, http=self.http_factory(timeout=timeout)
+            )
+            clients[timeout] = http
+        return http
+
+    def __call__(self, request: RequestWrapper, execute):
+        template = getattr(request.request, "http", None)
+        if (
+            not isinstance(template, google_auth_httplib2.AuthorizedHttp)
+            or "http" in request.execute_kwargs
+        ):
+            return execute()
+        return execute(
+            http=self.get_http(template.credentials, getattr(request, "timeout", None))
+        )
+
+
+def request_gzip(request: RequestWrapper, execute):
+    """Middleware asking for gzip-compressed responses.
+    Google APIs only compress the responses of clients whose user agent contains gzip.
+    Requests without headers (e.g. of the fake API) are left as they are.
+    """
+    headers = getattr(request.request, "headers", None)
+    if headers is not None:
+        headers["accept-encoding"] = "gzip"
+        user_agent = headers.get("user-agent", "")
+        if "gzip" not in user_agent:
+            headers["user-agent"] = f"{user_agent} (gzip)".strip()
+
+    return execute()
+
+
+def wrap(youtube, middlewares: list = None) -> ResourceWrapper:
+    """Wraps a YT API resource with middlewares.
+    Wrapping an already wrapped resource adds the new middlewares after the existing ones.
+
+    Args:
+        youtube (Resource): YT API resource, or an already wrapped resource.
+        middlewares (list): Middlewares every request goes through, outermost first.
+
+    Returns:
+        (ResourceWrapper): Wrapped YT API resource.
+    """
+    if isinstance(youtube, ResourceWrapper):
+        return ResourceWrapper(
+            youtube.resource, youtube.middlewares + list(middlewares or [])
+        )
+
+    return ResourceWrapper(youtube, middlewares)
@@ -0,0 +1,250 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from QTube.utils import helpers
+from QTube.utils.youtube.model import loads
+from QTube.utils.youtube.resource import RequestWrapper, parse_fields
+
+# Time to live of the parts of the videos.list items, in seconds. Durations, definitions and
+# dimensions do not change, languages rarely do, titles and descriptions sometimes do, and
+# view, like and comment counts change all the time
+PART_TTLS = {
+    "contentDetails": 30 * 86400.0,
+    "snippet": 2 * 86400.0,
+    "status": 86400.0,
+    "paidProductPlacementDetails": 86400.0,
+    "statistics": 3600.0,
+}
+DEFAULT_PART_TTL = 3600.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS video_parts (
+    video_id TEXT NOT NULL,
+    part TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    fields TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (video_id, part)
+) WITHOUT ROWID
+"""
+
+
+class VideoStore:
+    """Persistent store of the videos.list items, in a SQLite database keyed by video ID and part.
+
+    It is used as a middleware (see QTube.utils.youtube.resource). Videos stay in the upload date
+    window for several runs, so their items are kept between runs, each part with its own time
+    to live (see PART_TTLS): the immutable contentDetails are kept for a long time while the
+    statistics are soon refreshed. A request is only sent for the videos and parts that are not
+    stored, expired or stored with fewer fields than requested, in as few calls as possible (e.g.
+    a single statistics call for a whole batch whose other parts are stored).
+
+    Items of livestreams and premieres are not stored, since their information changes once they
+    end, and neither are the videos the API does not return (private or deleted).
+
+    Args:
+        path (str): Path of the database file (videos.sqlite3 in the QTube cache directory if None).
+        ttls (dict): Time to live of some parts, in seconds, replacing the ones of PART_TTLS (optional).
+    """
+
+    def __init__(self, path: str = None, ttls: dict = None):
+        self.path = path or os.path.join(helpers.get_cache_dir(), "videos.sqlite3")
+        self.ttls = {**PART_TTLS, **(ttls or {})}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+
+        with self._lock, self._connection:
+            self._connection.execute(_SCHEMA)
+            self._connection.execute(
+                "DELETE FROM video_parts WHERE fetched_at < ?",
+                (time.time() - max(self.ttls.values(), default=DEFAULT_PART_TTL),),
+            )
+
+    def __call__(self, request: RequestWrapper, execute):
+        params = request.params
+        if request.method_ID != "videos.list" or "id" not in params:
+            return execute()
+
+        parts = [part for part in str(params["part"]).split(",") if part != "id"]
+        selections = self._get_selections(parts, params.get("fields"))
+        if selections is None:  # Partial response the store cannot build
+            return execute()
+
+        video_IDs = [video_ID for video_ID in str(params["id"]).split(",") if video_ID]
+        if not video_IDs:
+            return execute()
+        stored = self._load(video_IDs, selections)
+
+        # A single request for the videos missing parts, with every part one of them misses
+        # (the YT API quota is spent per request, not per part)
+        missing_IDs = [
+            video_ID
+            for video_ID in video_IDs
+            if len(stored.get(video_ID, {})) < len(selections)
+        ]
+        missing_parts = frozenset().union(
+            *(
+                set(selections) - set(stored.get(video_ID, {}))
+                for video_ID in missing_IDs
+            )
+        )
+        with self._lock:
+            self.hits += len(video_IDs) - len(missing_IDs)
+
+        response = {}
+        if len(missing_IDs) == len(video_IDs) and len(missing_parts) == len(selections):
+            with self._lock:
+                self.misses += len(missing_IDs)
+            response = execute()
+        elif missing_IDs:
+            # The narrower request goes through the store again, as a miss, but not through
+            # the public cache, which already counted the missing videos
+            narrowed = request.replace(
+                id=",".join(missing_IDs),
+                **self._get_mask(missing_parts, selections, params),
+            )
+            narrowed.narrowed = True
+            response = narrowed.execute(**request.execute_kwargs)
+
+        items = response.get("items", [])
+        self._save(items, {part: selections[part] for part in missing_parts})
+        for item in items:
+            stored.setdefault(item["id"], {}).update(
+                (part, item.get(part, {})) for part in missing_parts
+            )
+
+        items = []
+        for video_ID in video_IDs:
+            if video_ID in stored:
+                items.append(
+                    {
+                        "id": video_ID,
+                        **{
+                            part: data
+                            for part, data in stored[video_ID].items()
+                            if data
+                        },
+                    }
+                )
+
+        return {
+            **{k: v for k, v in response.items() if k not in ["items", "pageInfo"]},
+            "items": items,
+        }
+
+    @staticmethod
+    def _get_selections(parts: list[str], fields: str = None) -> dict | None:
+        """Fields of each part selected by a request (None values for whole parts), None if the store cannot answer it."""
+        if fields is None:
+            return dict.fromkeys(parts)
+
+        tree = parse_fields(fields)
+        if set(tree) != {"items"} or tree["items"] is None:
+            return None
+        items_tree = tree["items"]
+        if not set(items_tree) <= {"id", *parts}:
+            return None
+
+        selections = {}
+        for part in parts:
+            if part not in items_tree:
+                continue
+            elif items_tree[part] is None:
+                selections[part] = None
+            elif any(subtree is not None for subtree in items_tree[part].values()):
+                return None  # Nested selections are not stored
+            else:
+                selections[part] = frozenset(items_tree[part])
+        return selections
+
+    @staticmethod
+    def _get_mask(parts: frozenset, selections: dict, params: dict) -> dict:
+        """part and fields parameters requesting some of the parts of a request."""
+        mask = {"part": ",".join(sorted(parts))}
+        if "fields" in params:
+            mask["fields"] = "items(id,{})".format(
+                ",".join(
+                    (
+                        part
+                        if selections[part] is None
+                        else f"{part}({','.join(sorted(selections[part]))})"
+                    )
+                    for part in sorted(parts)
+                )
+            )
+        return mask
+
+    def _load(self, video_IDs: list[str], selections: dict) -> dict:
+        """Stored parts of videos that are fresh and hold the selected fields, keeping only these fields."""
+        placeholders = ",".join("?" * len(video_IDs))
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT video_id, part, fetched_at, fields, data FROM video_parts WHERE video_id IN ({placeholders})",
+                video_IDs,
+            ).fetchall()
+
+        now = time.time()
+        stored = {}
+        for video_ID, part, fetched_at, fields, data in rows:
+            if part not in selections:
+                continue
+            elif now - fetched_at > self.ttls.get(part, DEFAULT_PART_TTL):
+                continue
+
+            selection = selections[part]
+            if fields is not None and (
+                selection is None or not selection <= set(loads(fields))
+            ):
+                continue
+
+            data = loads(data)
+            if selection is not None:
+                data = {k: v for k, v in data.items() if k in selection}
+            stored.setdefault(video_ID, {})[part] = data
+
+        return stored
+
+    def _save(self, items: list[dict], selections: dict) -> None:
+        """Stores the parts of items, except the ones of livestreams and premieres."""
+        now = time.time()
+        rows = []
+        for item in items:
+            live_status = item.get("snippet", {}).get("liveBroadcastContent")
+            if live_status in ["live", "upcoming"] or (
+                "contentDetails" in selections
+                and "duration" in (selections["contentDetails"] or ["duration"])
+                and "duration" not in item.get("contentDetails", {})
+            ):
+                continue
+
+            for part, selection in selections.items():
+                rows.append(
+                    (
+                        item["id"],
+                        part,
+                        now,
+                        None if selection is None else json.dumps(sorted(selection)),
+                        json.dumps(item.get(part, {})),  # Omitted if it has no field
+                    )
+                )
+
+        if rows:
+            with self._lock, self._connection:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO video_parts VALUES (?, ?, ?, ?, ?)", rows
+                )
+
+    def clear(self) -> None:
+        """Empties the store."""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM video_parts")
+
+    def close(self) -> None:
+        """Closes the database."""
+        with self._lock:
+            self._connection.close()
@@ -1,29 +1,86 @@
-import isodate
+import functools
+import re
+
+from QTube.utils import helpers, web
+
+# Duration of the videos whose contentDetails have none (livestreams, premieres, ...)
+MISSING_DURATION = -1
+
+# Restricted ISO 8601 grammar of contentDetails.duration (e.g. PT1H2M3S, P1DT2H, P0D)
+_DURATION_PATTERN = re.compile(
+    r"P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)(?:\.\d*)?S)?)?"
+)
+
+# Video information (keys), and the videos.list part and fields it is read from (values)
+VIDEO_FIELDS = {
+    "title": ("snippet", ["title"]),
+    "description": ("snippet", ["description"]),
+    "tags": ("snippet", ["tags"]),
+    "language": ("snippet", ["defaultAudioLanguage", "defaultLanguage"]),
+    "live status": ("snippet", ["liveBroadcastContent"]),
+    "duration": ("contentDetails", ["duration"]),
+    "definition": ("contentDetails", ["definition"]),
+    "dimension": ("contentDetails", ["dimension"]),
+    "projection": ("contentDetails", ["projection"]),
+    "has captions": ("contentDetails", ["caption"]),
+    "views": ("statistics", ["viewCount"]),
+    "likes": ("statistics", ["likeCount"]),
+    "comments": ("statistics", ["commentCount"]),
+    "likes_to_views_ratio": ("statistics", ["likeCount", "viewCount"]),
+    "comments_to_views_ratio": ("statistics", ["commentCount", "viewCount"]),
+    "has_paid_ad": ("paidProductPlacementDetails", ["hasPaidProductPlacement"]),
+    "made_for_kids": ("status", ["madeForKids"]),
+}
+
+
+def get_request_mask(information: list[str]) -> tuple[str, str]:
+    """Builds the part and fields (partial response) parameters of a videos.list request retrieving only some information.
 
-from pytube import YouTube
+    Args:
+        information (list[str]): Video information needed (keys of VIDEO_FIELDS).
+
+    Returns:
+        part, fields (tuple[str, str]): Parts and fields parameters.
+    """
+    parts = {}
+    for key in information:
+        part, fields = VIDEO_FIELDS[key]
+        parts.setdefault(part, set()).update(fields)
+
+    if not parts:
+        return "id", "items/id"
 
-from QTube.utils import helpers, checks
+    part = ",".join(sorted(parts))
+    fields = ",".join(
+        f"{part_name}({','.join(sorted(parts[part_name]))})" for part_name in sorted(parts)
+    )
+    return part, f"items(id,{fields})"
 
 
-def make_video_requests(youtube, video_IDs: list[str]) -> dict:
+def make_video_requests(
+    youtube, video_IDs: list[str], information: list[str] = None
+) -> dict:
     """Retrieves information on a list of YT videos.
 
     Args:
         youtube (Resource): YT API resource.
         video_IDs (list[str]): List of video IDs.
+        information (list[str]): Video information needed (keys of VIDEO_FIELDS), to only request the parts and fields it is read from (None for complete parts).
 
     Returns:
         response (dict[dict]): YT API response.
     """
     video_IDs_str = ",".join(video_IDs)
-    response = (
-        youtube.videos()
-        .list(
+    if information is None:
+        request = youtube.videos().list(
             part="snippet,contentDetails,statistics,paidProductPlacementDetails,status",
             id=video_IDs_str,
         )
-        .execute(num_retries=5)
-    )
+    else:
+        part, fields = get_request_mask(information)
+        request = youtube.videos().list(part=part, id=video_IDs_str, fields=fields)
+
+    response = request.execute(num_retries=5)
     return response
 
 
@@ -45,12 +102,7 @@ def get_titles(
         titles (list[str]): List of YT videos titles.
     """
     if use_API:
-        video_IDs_str = ",".join(video_IDs)
-        response = (
-            youtube.videos()
-            .list(part="snippet", id=video_IDs_str)
-            .execute(num_retries=5)
-        )
+        response = make_video_requests(youtube, video_IDs, ["title"])
 
     titles = [vid["snippet"]["title"] for vid in response["items"]]
 
@@ -75,12 +127,7 @@ def get_tags(
         tags (list[list[str]|None]): List of YT videos tags, or None if there are no tags for this video.
     """
     if use_API:
-        video_IDs_str = ",".join(video_IDs)
-        response = (
-            youtube.videos()
-            .list(part="snippet", id=video_IDs_str)
-            .execute(num_retries=5)
-        )
+        response = make_video_requests(youtube, video_IDs, ["tags"])
 
     tags = [
         vid["snippet"]["tags"] if "tags" in vid["snippet"] else None
@@ -108,12 +155,7 @@ def get_descriptions(
         description (list[str]): YT videos descriptions.
     """
     if use_API:
-        video_IDs_str = ",".join(video_IDs)  # Join the video IDs with commas
-        response = (
-            youtube.videos()
-            .list(part="snippet", id=video_IDs_str)
-            .execute(num_retries=5)
-        )
+        response = make_video_requests(youtube, video_IDs, ["description"])
 
     descriptions = [vid["snippet"]["description"] for vid in response.get("items", [])]
     return descriptions
@@ -124,7 +166,7 @@ def get_durations(
     response: dict = None,
     video_IDs: list[str] = None,
     use_API: bool = False,
-) -> list[float]:
+) -> list[int]:
     """Retrieves the duration of YT videos.
 
     Args:
@@ -134,24 +176,43 @@ def get_durations(
         use_API (bool): Determines if a new API request is made or if the response dictionary is used.
 
     Returns:
-        durations (list[float]): List of YT videos durations in seconds.
+        durations (list[int]): List of YT videos durations in seconds (MISSING_DURATION for videos without one).
     """
     if use_API:
-        video_IDs_str = ",".join(video_IDs)
-        response = (
-            youtube.videos()
-            .list(part="contentDetails", id=video_IDs_str)
-            .execute(num_retries=5)
-        )
+        response = make_video_requests(youtube, video_IDs, ["duration"])
 
-    durations_iso = [
-        vid["contentDetails"].get("duration", "PT0M3.14159265S")
+    durations = [
+        parse_duration(vid["contentDetails"].get("duration"))
         for vid in response["items"]
-    ]  # Set the duration of videos without duration info to pi seconds to identify them without breaking the iso conversion
-    durations = [isodate.parse_duration(d).total_seconds() for d in durations_iso]
+    ]
     return durations
 
 
+@functools.lru_cache(maxsize=4096)
+def parse_duration(duration: str) -> int:
+    """Converts a YT API duration (restricted ISO 8601 format PnWnDTnHnMnS) to seconds.
+    The values are memoized, since many videos share the same duration.
+
+    Args:
+        duration (str): Duration from the contentDetails of a video (may be None).
+
+    Returns:
+        (int): Duration in seconds, MISSING_DURATION if the duration is None.
+
+    Raises:
+        ValueError: If the duration is not in the expected format.
+    """
+    if duration is None:
+        return MISSING_DURATION
+
+    match = _DURATION_PATTERN.fullmatch(duration)
+    if match is None or duration.endswith(("P", "T")):
+        raise ValueError(f"Invalid video duration: {duration!r}")
+
+    weeks, days, hours, minutes, seconds = (int(value or 0) for value in match.groups())
+    return (((weeks * 7 + days) * 24 + hours) * 60 + minutes) * 60 + seconds
+
+
 def get_languages(
     youtube=None,
     response: dict = None,
@@ -170,12 +231,7 @@ def get_languages(
         languages (list[str]): List of YT videos languages.
     """
     if use_API:
-        video_IDs_str = ",".join(video_IDs)
-        response = (
-            youtube.videos()
-            .list(part="snippet", id=video_IDs_str)
-            .execute(num_retries=5)
-        )
+        response = make_video_requests(youtube, video_IDs, ["language"])
 
     languages = [
         (
@@ -213,12 +269,7 @@ def get_dimensions(
         dimensions (list[str]): List of YT videos dimensions.
     """
     if use_API:
-        video_IDs_str = ",".join(video_IDs)
-        response = (
-            youtube.videos()
-            .list(part="contentDetails", id=video_IDs_str)
-            .execute(num_retries=5)
-        )
+        response = make_video_requests(youtube, video_IDs, ["dimension"])
 
     dimensions = [vid["contentDetails"]["dimension"] for vid in response["items"]]
     return dimensions
@@ -242,12 +293,7 @@ def get_definitions(
         definitions (list[str]): List of YT videos definitions.
     """
     if use_API:
-        video_IDs_str = ",".join(video_IDs)
-        response = (
-            youtube.videos()
-            .list(part="contentDetails", id=video_IDs_str)
-            .execute(num_retries=5)
-        )
+        response = make_video_requests(youtube, video_IDs, ["definition"])
 
     definitions = [vid["contentDetails"]["definition"] for vid in response["items"]]
     return definitions
@@ -264,18 +310,14 @@ def get_resolutions(video_IDs: list[str] = None) -> dict[str, list[int]]:
     Returns:
         resolutions (dict[str, list[int]]): Dictionary mapping video IDs to the resolutions.
     """
-    base_url = "http://youtube.com/watch?v"
     resolutions = {}
 
     for vid_ID in video_IDs:
-        url = f"{base_url}={vid_ID}"
-
         try:
-            yt = YouTube(url)
             vid_resolutions = list(
                 {
-                    int(stream.resolution.split("p")[0])
-                    for stream in yt.streams.filter(type="video")
+                    int(stream["resolution"].split("p")[0])
+                    for stream in web.get_streams(vid_ID)
                 }
             )
             resolutions[vid_ID] = vid_resolutions
@@ -296,17 +338,11 @@ def get_framerates(video_IDs: list[str] = None) -> dict[str, list[int]]:
     Returns:
         framerates (dict[str, list[int]]): Dictionary mapping video IDs to the framerates.
     """
-    base_url = "http://youtube.com/watch?v"
     framerates = {}
 
     for vid_ID in video_IDs:
-        url = f"{base_url}={vid_ID}"
-
         try:
-            yt = YouTube(url)
-            vid_framerates = list(
-                {stream.fps for stream in yt.streams.filter(type="video")}
-            )
+            vid_framerates = list({stream["fps"] for stream in web.get_streams(vid_ID)})
             framerates[vid_ID] = vid_framerates
         except Exception as e:
             print(f"Error processing video {vid_ID}: {e}")
@@ -332,12 +368,7 @@ def get_projections(
         projections (list[str]): List of YT videos projections.
     """
     if use_API:
-        video_IDs_str = ",".join(video_IDs)
-        response = (
-            youtube.videos()
-            .list(part="contentDetails", id=video_IDs_str)
-            .execute(num_retries=5)
-        )
+        response = make_video_requests(youtube, video_IDs, ["projection"])
 
     projections = [vid["contentDetails"]["projection"] for vid in response["items"]]
     return projections
@@ -361,14 +392,9 @@ def get_view_counts(
         views (list[int]): List of YT videos views.
     """
     if use_API:
-        video_IDs_str = ",".join(video_IDs)
-        response = (
-            youtube.videos()
-            .list(part="statistics", id=video_IDs_str)
-            .execute(num_retries=5)
-        )
+        response = make_video_requests(youtube, video_IDs, ["views"])
 
-    views = [int(vid["statistics"]["viewCount"]) for vid in response["items"]]
+    views = [int(vid.get("statistics", {}).get("viewCount", 0)) for vid in response["items"]]
 
     return views
 
@@ -388,17 +414,12 @@ def get_like_counts(
         use_API (bool): Determines if a new API request is made or if the response dictionary is used.
 
     Returns:
-        likes (list[int]): List of YT videos likes.
+        likes (list[int]): List of YT videos likes (0 if the likes are hidden).
     """
     if use_API:
-        video_IDs_str = ",".join(video_IDs)
-        response = (
-            youtube.videos()
-            .list(part="statistics", id=video_IDs_str)
-            .execute(num_retries=5)
-        )
+        response = make_video_requests(youtube, video_IDs, ["likes"])
 
-    likes = [int(vid["statistics"]["likeCount"]) for vid in response["items"]]
+    likes = [int(vid.get("statistics", {}).get("likeCount", 0)) for vid in response["items"]]
 
     return likes
 
@@ -418,18 +439,13 @@ def get_comment_counts(
         use_API (bool): Determines if a new API request is made or if the response dictionary is used.
 
     Returns:
-        comment_counts (list[int]): List of YT videos comment counts.
+        comment_counts (list[int]): List of YT videos comment counts (0 if the comments are disabled).
     """
     if use_API:
-        video_IDs_str = ",".join(video_IDs)
-        response = (
-            youtube.videos()
-            .list(part="statistics", id=video_IDs_str)
-            .execute(num_retries=5)
-        )
+        response = make_video_requests(youtube, video_IDs, ["comments"])
 
     comment_counts = [
-        int(vid["statistics"]["commentCount"]) for vid in response["items"]
+        int(vid.get("statistics", {}).get("commentCount", 0)) for vid in response["items"]
     ]
 
     return comment_counts
@@ -466,7 +482,7 @@ def get_likes_to_views_ratio(
 
 
 def get_comments_to_views_ratio(
-    likes,
+    comments,
     views,
     youtube=None,
     response: dict = None,
@@ -513,12 +529,7 @@ def has_captions(
         captions (list[bool]): True if the video has captions, False otherwise.
     """
     if use_API:
-        video_IDs_str = ",".join(video_IDs)
-        response = (
-            youtube.videos()
-            .list(part="contentDetails", id=video_IDs_str)
-            .execute(num_retries=5)
-        )
+        response = make_video_requests(youtube, video_IDs, ["has captions"])
 
     captions = [vid["contentDetails"]["caption"] for vid in response["items"]]
     return captions
@@ -529,30 +540,37 @@ def is_short(
     response: dict = None,
     video_IDs: list[str] = None,
     use_API: bool = False,
+    probe_cache: dict = None,
 ) -> list[bool]:
     """Determines if videos are a short or not by putting a threshold on video duration and checking for a redirection at the youtube.com/shorts/*vid_ID* URL.
+    Only videos short enough to be shorts are checked for a redirection.
 
     Args:
         youtube (Resource): YT API resource.
         response (dict[dict]): YT API response from the make_video_request function.
         video_IDs (list[str]): List of video IDs.
         use_API (bool): Determines if a new API request is made or if the response dictionary is used.
+        probe_cache (dict): Dictionary of video IDs (keys) and redirection probe results (values), reused and filled (optional).
 
     Returns:
         is_a_short (list[bool]): True if the video is shorter than 181 seconds and there is no URL redirection, False otherwise.
     """
     durations = get_durations(youtube, response, video_IDs, use_API=use_API)
+    if probe_cache is None:
+        probe_cache = {}
+
+    is_a_short = []
+    for vid_ID, length in zip(video_IDs, durations):
+        if length > 181:  # Shorts cannot last over 3 minutes.
+            is_a_short.append(False)
+            continue
+
+        if vid_ID not in probe_cache:
+            probe_cache[vid_ID] = web.check_URL_redirect(
+                "https://www.youtube.com/shorts/" + vid_ID, 303
+            )
+        is_a_short.append(not probe_cache[vid_ID])  # Shorts do not trigger a redirection.
 
-    is_short_vid = [
-        True if length <= 181 else False for length in durations
-    ]  # Shorts cannot last over 3 minutes.
-
-    is_not_redirected = [
-        not checks.check_URL_redirect("https://www.youtube.com/shorts/" + vid_ID, 303)
-        for vid_ID in video_IDs
-    ]  # Shorts do not trigger a redirection.
-
-    is_a_short = is_short_vid and is_not_redirected
     return is_a_short
 
 
@@ -574,12 +592,7 @@ def is_live(
         live_statuses (list[str]): live if the video is live, upcoming if it is a premiere and none otherwise.
     """
     if use_API:
-        video_IDs_str = ",".join(video_IDs)
-        response = (
-            youtube.videos()
-            .list(part="snippet", id=video_IDs_str)
-            .execute(num_retries=5)
-        )
+        response = make_video_requests(youtube, video_IDs, ["live status"])
 
     live_statuses = [
         vid["snippet"]["liveBroadcastContent"] for vid in response["items"]
@@ -607,12 +620,7 @@ def has_paid_advertising(
     """
 
     if use_API:
-        video_IDs_str = ",".join(video_IDs)
-        response = (
-            youtube.videos()
-            .list(part="paidProductPlacementDetails", id=video_IDs_str)
-            .execute(num_retries=5)
-        )
+        response = make_video_requests(youtube, video_IDs, ["has_paid_ad"])
 
     return [
         vid["paidProductPlacementDetails"]["hasPaidProductPlacement"]
@@ -639,11 +647,6 @@ def is_made_for_kids(
     """
 
     if use_API:
-        video_IDs_str = ",".join(video_IDs)
-        response = (
-            youtube.videos()
-            .list(part="status", id=video_IDs_str)
-            .execute(num_retries=5)
-        )
+        response = make_video_requests(youtube, video_IDs, ["made_for_kids"])
 
     return [vid["status"]["madeForKids"] for vid in response["items"]]
@@ -0,0 +1,586 @@
+"""Benchmarks of the QTube pipeline stages and filters, run against synthetic or recorded API payloads.
+
+Usage:
+    python benchmarks/bench.py run [--channels N] [--videos N] [--repeat N] [--only NAME] [--payload FILE] [--output FILE] [--baseline FILE]
+    python benchmarks/bench.py compare BASELINE.json RESULTS.json [--threshold 0.1]
+"""
+
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from QTube import pipeline  # noqa: E402
+from QTube.utils import filters, helpers  # noqa: E402
+from QTube.utils.records import VideoRecord, VideoRecords  # noqa: E402
+from QTube.utils.youtube import videos  # noqa: E402
+from QTube.utils.youtube.cache import PublicCache  # noqa: E402
+from QTube.utils.youtube.fake import FakeYouTube, generate_dataset  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+TEMPLATE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "docs",
+    "user_params_template.json",
+)
+DECORATIONS = ["", "", "!", "?!", " 🎵", " 🔥🔥", " (official)", " - part 2", " 😂!!"]
+
+# Extractors reading the videos.list response (get_resolutions and get_framerates scrape
+# youtube.com through pytube, so they are not benchmarked offline)
+EXTRACTORS = [
+    videos.get_titles,
+    videos.get_tags,
+    videos.get_descriptions,
+    videos.get_durations,
+    videos.get_languages,
+    videos.get_dimensions,
+    videos.get_definitions,
+    videos.get_projections,
+    videos.get_view_counts,
+    videos.get_like_counts,
+    videos.get_comment_counts,
+    videos.has_captions,
+    videos.is_live,
+    videos.has_paid_advertising,
+    videos.is_made_for_kids,
+]
+
+
+def get_params(**overrides) -> dict:
+    """User parameters enabling every offline filter, so that each of them has work to do."""
+    with open(TEMPLATE_PATH) as f:
+        params = json.load(f)
+
+    params.update(
+        required_in_channel_name=None,
+        banned_in_channel_name=None,
+        include_extra_channels=False,
+        extra_channel_handles=None,
+        required_in_title=["music", "live", "review", "new"],
+        banned_in_title=["trailer"],
+        ignore_title_emojis=True,
+        ignore_title_punctuation=True,
+        ignore_title_case=True,
+        required_in_description=["python", "science", "history"],
+        banned_in_description=["reaction"],
+        required_tags=["music", "news", "guide", "vlog"],
+        banned_tags=["remix"],
+        preferred_languages=["en", "fr"],
+        require_captions=True,
+        caption_options={
+            "trackKind": ["standard", "asr"],
+            "languages": ["en", "fr"],
+            "audioTrackType": ["primary", "unknown"],
+            "isCC": False,
+            "isLarge": False,
+            "isEasyReader": False,
+            "isAutoSynced": False,
+            "status": ["serving"],
+        },
+        allowed_durations=[1, 60],
+        ignore_livestreams=True,
+        ignore_premieres=True,
+        lowest_definition="HD",
+        views_threshold=500,
+        likes_threshold=10,
+        comments_threshold=1,
+        likes_to_views_ratio=0.01,
+        comments_to_views_ratio=0.001,
+        run_frequency="monthly",
+        keep_shorts=False,
+        allow_paid_promotions=False,
+        only_made_for_kids=False,
+        keep_duplicates=False,
+        upload_playlist_ID="PLbenchmark",
+        fancy_mode=False,
+        verbosity=["none"],
+    )
+    params.update(overrides)
+    return params
+
+
+class RecordedVideos:
+    """Minimal YT API resource answering videos.list requests from a recorded response."""
+
+    def __init__(self, response: dict):
+        self.items = {item["id"]: item for item in response["items"]}
+        self._IDs = []
+
+    def videos(self):
+        return self
+
+    def list(self, part: str, id: str, **kwargs):
+        self._IDs = id.split(",")
+        return self
+
+    def execute(self, **kwargs) -> dict:
+        return {"items": [self.items[i] for i in self._IDs if i in self.items]}
+
+
+class Inputs:
+    """Inputs shared by the benchmarks, built once from a synthetic dataset or a recorded response.
+
+    Args:
+        n_channels (int): Number of channels of the synthetic dataset.
+        n_videos (int): Number of videos the stage benchmarks work on.
+        payload (str): Path of a recorded videos.list response ({"items": [...]}) used instead of the synthetic videos (optional).
+    """
+
+    def __init__(self, n_channels: int, n_videos: int, payload: str = None):
+        self.dataset = generate_dataset(n_channels, videos_per_channel=20, seed=42)
+        self.recorded = payload is not None
+
+        if self.recorded:
+            with open(payload) as f:
+                self.response = json.load(f)
+            youtube = RecordedVideos(self.response)
+        else:
+            IDs = [
+                self.dataset.video_ID(index, position)
+                for position in range(self.dataset.videos_per_channel)
+                for index in range(n_channels)
+            ]
+            self.response = {
+                "items": [
+                    item
+                    for item in map(self.dataset.video, IDs[: n_videos * 2])
+                    if item is not None
+                ][:n_videos]
+            }
+            youtube = FakeYouTube(self.dataset)
+
+        now = dt.datetime.now(dt.timezone.utc)
+        rng = random.Random(42)
+        self.videos = VideoRecords(
+            (
+                item["id"],
+                VideoRecord(
+                    upload_datetime=now - dt.timedelta(hours=rng.uniform(0, 24 * 40)),
+                    channel_name=item["snippet"]["channelTitle"],
+                    upload_playlist="UU" + item["snippet"]["channelId"][2:],
+                ),
+            )
+            for item in self.response["items"]
+        )
+
+        # Same enrichment as a run, without the web probes
+        self.params = get_params(require_captions=not self.recorded)
+        cache = PublicCache()
+        cache.shorts = (
+            youtube.shorts_probes
+            if not self.recorded
+            else dict.fromkeys(self.videos, True)
+        )
+        # Every filter is benchmarked, so every information is retrieved (only_made_for_kids
+        # is the one filter the parameters leave disabled)
+        pipeline.get_video_details(
+            youtube,
+            self.videos,
+            [dict(self.params, only_made_for_kids=True)],
+            False,
+            ["none"],
+            cache,
+        )
+
+        self.channels = {
+            self.dataset.channel_title(index): self.dataset.channel_ID(index)
+            for index in range(n_channels)
+        }
+        self.titles = [
+            vid_info.original_title + rng.choice(DECORATIONS)
+            for vid_info in self.videos.values()
+        ]
+        self.playlist_content = rng.sample(list(self.videos), len(self.videos) // 10)
+
+    def fresh_videos(self) -> VideoRecords:
+        """Copy of the enriched videos, all still to be added."""
+        videos = self.videos.copy()
+        for vid_info in videos.values():
+            vid_info.rejections = 0
+        return videos
+
+
+def get_benchmarks(inputs: Inputs) -> dict:
+    """Builds the benchmarks, as names (keys) and (unit, items, setup, func) tuples (values).
+    func(*setup()) is the measured call, setup is not measured.
+    """
+    params = inputs.params
+    n_videos = len(inputs.videos)
+    benchmarks = {}
+
+    ## Channel-name filters
+    benchmarks["filters.filter_channels"] = (
+        "channels",
+        len(inputs.channels),
+        lambda: (inputs.channels, ["Music", "News", "Python"], ["Vlog"]),
+        filters.filter_channels,
+    )
+    wanted_names = set(list(inputs.channels)[::2])
+    benchmarks["filters.filter_channel_names"] = (
+        "videos",
+        n_videos,
+        lambda: (inputs.fresh_videos(), wanted_names),
+        filters.filter_channel_names,
+    )
+
+    ## Extractors
+    for extractor in EXTRACTORS:
+        benchmarks[f"videos.{extractor.__name__}"] = (
+            "videos",
+            n_videos,
+            lambda: (),
+            lambda extractor=extractor: extractor(response=inputs.response),
+        )
+    view_counts = videos.get_view_counts(response=inputs.response)
+    like_counts = videos.get_like_counts(response=inputs.response)
+    comment_counts = videos.get_comment_counts(response=inputs.response)
+    benchmarks["videos.get_likes_to_views_ratio"] = (
+        "videos",
+        n_videos,
+        lambda: (like_counts, view_counts),
+        videos.get_likes_to_views_ratio,
+    )
+    benchmarks["videos.get_comments_to_views_ratio"] = (
+        "videos",
+        n_videos,
+        lambda: (comment_counts, view_counts),
+        videos.get_comments_to_views_ratio,
+    )
+    video_IDs = list(inputs.videos)
+    all_probed = dict.fromkeys(video_IDs, True)
+    benchmarks["videos.is_short"] = (
+        "videos",
+        n_videos,
+        lambda: (),
+        lambda: videos.is_short(
+            response=inputs.response, video_IDs=video_IDs, probe_cache=all_probed
+        ),
+    )
+
+    ## Filter blocks, in the order they are applied
+    blocks = {
+        "upload_dates": lambda v: filters.filter_upload_dates(
+            v, params["run_frequency"]
+        ),
+        "titles": lambda v: filters.filter_words(
+            v, "title", *filters.prepare_titles(v, params), "title"
+        ),
+        "durations": lambda v: filters.filter_durations(v, params),
+        "shorts": lambda v: filters.filter_flag(v, "is short", True, "shorts"),
+        "duplicates": lambda v: filters.filter_duplicates(v, inputs.playlist_content),
+        "paid_promotions": lambda v: filters.filter_flag(
+            v, "has_paid_ad", True, "paid promotion"
+        ),
+        "made_for_kids": lambda v: filters.filter_flag(
+            v, "made_for_kids", False, "made for kids"
+        ),
+        "languages": lambda v: filters.filter_languages(
+            v, params["preferred_languages"]
+        ),
+        "quality": lambda v: filters.filter_quality(v, params),
+        "descriptions": lambda v: filters.filter_words(
+            v,
+            "description",
+            params["required_in_description"],
+            params["banned_in_description"],
+            "description",
+            skip_missing=True,
+        ),
+        "tags": lambda v: filters.filter_words(
+            v,
+            "tags",
+            params["required_tags"],
+            params["banned_tags"],
+            "tags",
+            skip_missing=True,
+        ),
+        "captions": lambda v: filters.filter_captions(v, params["caption_options"]),
+        "thresholds": lambda v: [
+            filters.filter_threshold(v, key, params[param], key)
+            for key, param in [
+                ("views", "views_threshold"),
+                ("likes", "likes_threshold"),
+                ("comments", "comments_threshold"),
+                ("likes_to_views_ratio", "likes_to_views_ratio"),
+                ("comments_to_views_ratio", "comments_to_views_ratio"),
+            ]
+        ],
+        "all": lambda v: filters.apply_filters(v, params, inputs.playlist_content),
+    }
+    if inputs.recorded:  # Recorded payloads have no captions.list responses
+        del blocks["captions"]
+    for name, block in blocks.items():
+        benchmarks[f"filters.{name}"] = (
+            "videos",
+            n_videos,
+            lambda: (inputs.fresh_videos(),),
+            block,
+        )
+
+    ## Helpers
+    benchmarks["helpers.strip_emojis"] = (
+        "titles",
+        len(inputs.titles),
+        lambda: (),
+        lambda: [helpers.strip_emojis(title) for title in inputs.titles],
+    )
+    benchmarks["helpers.strip_punctuation"] = (
+        "titles",
+        len(inputs.titles),
+        lambda: (),
+        lambda: [helpers.strip_punctuation(title) for title in inputs.titles],
+    )
+    benchmarks["helpers.split_dict"] = (
+        "videos",
+        n_videos,
+        lambda: (inputs.videos, 50),
+        helpers.split_dict,
+    )
+    chunks = helpers.split_dict(inputs.videos, 50)
+    benchmarks["helpers.merge_dicts"] = (
+        "videos",
+        n_videos,
+        lambda: (chunks,),
+        helpers.merge_dicts,
+    )
+
+    ## Stages and end-to-end runs, against the fake API
+    if not inputs.recorded:
+        benchmarks["pipeline.get_video_details"] = (
+            "videos",
+            n_videos,
+            lambda: (
+                FakeYouTube(inputs.dataset),
+                inputs.fresh_videos(),
+                [params],
+                False,
+                ["none"],
+                fake_cache(inputs.dataset),
+            ),
+            pipeline.get_video_details,
+        )
+        benchmarks["pipeline.run"] = (
+            "videos",
+            None,  # Number of videos discovered by the run
+            lambda: (FakeYouTube(inputs.dataset),),
+            lambda youtube: pipeline.run(
+                params, youtube=youtube, cache=fake_cache(inputs.dataset)
+            ),
+        )
+
+    return benchmarks
+
+
+def fake_cache(dataset) -> PublicCache:
+    """Empty public cache answering the shorts probes from the dataset."""
+    cache = PublicCache()
+    cache.shorts = FakeYouTube(dataset).shorts_probes
+    return cache
+
+
+def measure(unit: str, items: int, setup, func, repeat: int) -> dict:
+    """Times a benchmark and measures its peak memory (in a separate call, as tracemalloc slows it down)."""
+    durations = []
+    api_calls = quota_used = None
+    for _ in range(repeat):
+        args = setup()
+        start = time.perf_counter()
+        output = func(*args)
+        durations.append(time.perf_counter() - start)
+
+    if isinstance(output, pipeline.RunResult):
+        api_calls = sum(output.api_calls.values())
+        quota_used = output.quota_used
+        items = len(output.added) + len(output.rejected)
+    elif args and isinstance(args[0], FakeYouTube):
+        api_calls = sum(args[0].calls.values())
+        quota_used = args[0].quota_used
+
+    args = setup()
+    tracemalloc.start()
+    func(*args)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    median = statistics.median(durations)
+    return {
+        "unit": unit,
+        "items": items,
+        "time_s": median,
+        "min_time_s": min(durations),
+        "throughput": items / median if median else None,
+        "peak_memory_bytes": peak_memory,
+        "api_calls": api_calls,
+        "quota_used": quota_used,
+    }
+
+
+def get_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args) -> dict:
+    print(f"Building the inputs ({args.channels} channels, {args.videos} videos)...")
+    inputs = Inputs(args.channels, args.videos, args.payload)
+    benchmarks = get_benchmarks(inputs)
+
+    results = {
+        "commit": get_commit(),
+        "date": dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "channels": args.channels,
+            "videos": len(inputs.videos),
+            "repeat": args.repeat,
+            "payload": args.payload,
+        },
+        "benchmarks": {},
+    }
+    for name, (unit, items, setup, func) in benchmarks.items():
+        if args.only and not any(pattern in name for pattern in args.only):
+            continue
+        repeat = 1 if name.startswith("pipeline.") else args.repeat
+        result = measure(unit, items, setup, func, repeat)
+        results["benchmarks"][name] = result
+        print(format_result(name, result))
+
+    return results
+
+
+def format_result(name: str, result: dict) -> str:
+    line = (
+        f"{name:<40} {result['time_s'] * 1000:>10.2f} ms"
+        f" {result['throughput'] or 0:>14,.0f} {result['unit']}/s"
+        f" {result['peak_memory_bytes'] / 2**20:>9.2f} MiB"
+    )
+    if result["api_calls"] is not None:
+        line += f" {result['api_calls']:>7} calls {result['quota_used']:>7} quota"
+    return line
+
+
+def compare(baseline: dict, results: dict, threshold: float) -> bool:
+    """Prints the time and memory changes between two benchmark results.
+
+    Returns:
+        (bool): True if no benchmark got slower than the threshold allows.
+    """
+    print(f"Baseline: {baseline['commit']} ({baseline['date']})")
+    print(f"Results:  {results['commit']} ({results['date']})\n")
+
+    ok = True
+    for name, new in results["benchmarks"].items():
+        old = baseline["benchmarks"].get(name)
+        if old is None:
+            print(f"{name:<40} (new)")
+            continue
+
+        # Throughput is compared when available, since end-to-end runs may process different numbers of videos
+        if old["throughput"] and new["throughput"]:
+            time_change = old["throughput"] / new["throughput"] - 1
+        else:
+            time_change = new["time_s"] / old["time_s"] - 1
+        memory_change = (
+            new["peak_memory_bytes"] / old["peak_memory_bytes"] - 1
+            if old["peak_memory_bytes"]
+            else 0.0
+        )
+        regression = time_change > threshold
+        ok &= not regression
+
+        line = f"{name:<40} time {time_change:>+8.1%}  memory {memory_change:>+8.1%}"
+        if old["api_calls"] is not None and new["api_calls"] is not None:
+            line += f"  calls {new['api_calls'] - old['api_calls']:>+6}"
+        print(line + ("  REGRESSION" if regression else ""))
+
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Runs the benchmarks.")
+    run_parser.add_argument(
+        "--channels", type=int, default=2000, help="Channels of the synthetic account."
+    )
+    run_parser.add_argument(
+        "--videos", type=int, default=5000, help="Videos the stages work on."
+    )
+    run_parser.add_argument(
+        "--repeat", type=int, default=5, help="Timed calls per benchmark."
+    )
+    run_parser.add_argument(
+        "--only", nargs="+", help="Only runs the benchmarks containing these names."
+    )
+    run_parser.add_argument(
+        "--payload",
+        help="Recorded videos.list response to use instead of synthetic videos.",
+    )
+    run_parser.add_argument(
+        "--output", help="JSON results file (default: results/<commit>.json)."
+    )
+    run_parser.add_argument(
+        "--baseline", help="JSON results file to compare the results to."
+    )
+    run_parser.add_argument(
+        "--threshold", type=float, default=0.1, help="Tolerated slowdown (0.1 = 10%%)."
+    )
+
+    compare_parser = subparsers.add_parser(
+        "compare", help="Compares two JSON results files."
+    )
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("results")
+    compare_parser.add_argument(
+        "--threshold", type=float, default=0.1, help="Tolerated slowdown (0.1 = 10%%)."
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        results = run(args)
+
+        output = args.output or os.path.join(
+            RESULTS_DIR, f"{results['commit'] or 'results'}.json"
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "w") as f:
+            json.dump(results, f, indent=4)
+        print(f"\nResults saved to {output}")
+
+        if args.baseline is None:
+            return
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.results) as f:
+            results = json.load(f)
+
+    print()
+    if not compare(baseline, results, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
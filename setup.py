@@ -17,7 +17,9 @@ setup(
     entry_points={
         "console_scripts": [
             "qtube = QTube.scripts.qtube:main",
+            "qtube-batch = QTube.scripts.qtube_batch:main",
         ]
     },
+    extras_require={"fast": ["orjson>=3.9"]},
     packages=find_packages(exclude=("QTube.tests",)),
 )